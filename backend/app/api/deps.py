@@ -3,29 +3,87 @@ Vita - API Dependencies
 Dependências compartilhadas para injeção nas rotas.
 """
 
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Iterable, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.db.database import get_db
+from app.db.database import ShardMovingError, get_db, session_scope, shard_router
+from app.core.config import settings
 from app.core.security import verify_token
+from app.core.shared_cache import shared_cache
 from app.models import User
+from app.services.patient_ownership import ownership_cache
 
 # Security scheme
 security = HTTPBearer()
 
+# Scope key carrying the principal already authenticated by /api/batch
+BATCH_PRINCIPAL_KEY = "vita.principal"
+
+# User columns kept in the shared cache (never the password hash)
+PRINCIPAL_FIELDS = (
+    "id", "email", "full_name", "crm", "specialty", "role",
+    "is_active", "avatar_url", "created_at", "updated_at",
+)
+
+# Built once: its compiled-cache key is memoized on the construct
+PRINCIPAL_QUERY = select(User).where(User.id == bindparam("user_id"))
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[User]:
+    """
+    Carrega o usuário do token, passando pelo cache compartilhado entre
+    workers (`PRINCIPAL_CACHE_TTL_SECONDS`).
+
+    Um acerto no cache reconstrói o usuário e o anexa à sessão sem consultar
+    o banco.
+
+    Args:
+        db: Sessão do banco de dados
+        user_id: ID do usuário
+
+    Returns:
+        Optional[User]: Usuário, ou None se não existir
+    """
+    scope = ("principal", user_id)
+    cached = shared_cache.get(scope, scope)
+    if cached is not None:
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    generation = shared_cache.generation(scope)
+    result = await db.execute(PRINCIPAL_QUERY, {"user_id": user_id})
+    user = result.scalar_one_or_none()
+
+    if user is not None:
+        shared_cache.put(
+            scope,
+            scope,
+            {field: getattr(user, field) for field in PRINCIPAL_FIELDS},
+            settings.PRINCIPAL_CACHE_TTL_SECONDS,
+            generation,
+        )
+    return user
+
 
 async def get_current_user(
+    request: Request,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ) -> User:
     """
     Dependency que extrai e valida o usuário atual do token JWT.
 
+    Sub-requisições despachadas em processo por `/api/batch` reutilizam o
+    usuário já autenticado pela requisição do lote.
+
     Args:
+        request: Requisição atual
         credentials: Credenciais do header Authorization
         db: Sessão do banco de dados
 
@@ -35,6 +93,10 @@ async def get_current_user(
     Raises:
         HTTPException: Se o token for inválido ou usuário não encontrado
     """
+    principal = request.scope.get(BATCH_PRINCIPAL_KEY)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
@@ -56,8 +118,7 @@ async def get_current_user(
     except (ValueError, TypeError):
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await load_principal(db, user_id)
 
     if user is None:
         raise credentials_exception
@@ -97,7 +158,121 @@ async def get_current_active_doctor(
     return current_user
 
 
+async def get_current_admin(
+    current_user: Annotated[User, Depends(get_current_user)]
+) -> User:
+    """
+    Dependency que verifica se o usuário é administrador.
+
+    Args:
+        current_user: Usuário atual autenticado
+
+    Returns:
+        User: Administrador autenticado
+
+    Raises:
+        HTTPException: Se o usuário não for administrador
+    """
+    from app.models import UserRole
+
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores"
+        )
+
+    return current_user
+
+
+async def get_shard_db(
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> AsyncIterator[AsyncSession]:
+    """
+    Dependency que fornece a sessão do shard com os dados do usuário
+    autenticado. Sem sharding, é a própria sessão do banco principal.
+
+    Args:
+        current_user: Usuário autenticado
+        db: Sessão do banco principal
+
+    Yields:
+        AsyncSession: Sessão do shard
+
+    Raises:
+        HTTPException: Se os dados do médico estiverem mudando de shard
+    """
+    if not shard_router.enabled:
+        yield db
+        return
+
+    try:
+        shard = await shard_router.shard_for(current_user.id)
+    except ShardMovingError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Dados em migração entre servidores; tente novamente em instantes",
+            headers={"Retry-After": "5"},
+        )
+
+    async with session_scope(shard_router.session_makers[shard]) as session:
+        yield session
+
+
 # Type aliases para uso nas rotas
 DbSession = Annotated[AsyncSession, Depends(get_db)]
+ShardDb = Annotated[AsyncSession, Depends(get_shard_db)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
 CurrentDoctor = Annotated[User, Depends(get_current_active_doctor)]
+CurrentAdmin = Annotated[User, Depends(get_current_admin)]
+
+
+async def verify_patient_ownership(
+    db: AsyncSession,
+    doctor: User,
+    patient_ids: Iterable[int],
+) -> None:
+    """
+    Verifica se os pacientes pertencem ao médico, usando o cache de
+    propriedade (sem carregar `Patient`).
+
+    Args:
+        db: Sessão do banco de dados
+        doctor: Médico autenticado
+        patient_ids: IDs dos pacientes
+
+    Raises:
+        HTTPException: Se algum paciente não for encontrado
+    """
+    if not await ownership_cache.owns(db, doctor.id, patient_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado"
+        )
+
+
+async def get_owned_patient_id(
+    patient_id: int,
+    current_user: CurrentDoctor,
+    db: ShardDb,
+) -> int:
+    """
+    Dependency que valida o `patient_id` da rota contra os pacientes do
+    médico autenticado.
+
+    Args:
+        patient_id: ID do paciente (parâmetro de caminho)
+        current_user: Médico autenticado
+        db: Sessão do shard do médico
+
+    Returns:
+        int: ID do paciente verificado
+
+    Raises:
+        HTTPException: Se o paciente não for encontrado
+    """
+    await verify_patient_ownership(db, current_user, [patient_id])
+    return patient_id
+
+
+OwnedPatientId = Annotated[int, Depends(get_owned_patient_id)]
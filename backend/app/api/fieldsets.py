@@ -0,0 +1,102 @@
+"""
+Vita - Sparse Fieldsets
+Parâmetro `fields` para rotas de listagem e detalhe.
+
+O cliente informa os campos desejados separados por vírgula
+(`?fields=id,full_name,phone`). Os nomes são validados contra os campos
+do schema de resposta da rota; `id` é sempre incluído. A seleção vale
+tanto para o SELECT (colunas fora do conjunto não são carregadas, via
+`load_only`) quanto para o JSON serializado.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy.orm import load_only
+
+
+@lru_cache(maxsize=256)
+def _subset_model(schema: type[BaseModel], names: tuple[str, ...]) -> type[BaseModel]:
+    """Schema derivado com apenas os campos pedidos (mesmos tipos e validações)."""
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (schema.model_fields[name].annotation, schema.model_fields[name])
+            for name in names
+        },
+    )
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    """Campos selecionados de um schema de resposta."""
+    schema: type[BaseModel]
+    names: tuple[str, ...]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def load_only(self, model: Any, *required: str):
+        """
+        Opção `load_only` com as colunas do modelo presentes no conjunto.
+
+        Args:
+            model: Modelo ORM consultado
+            required: Colunas extras necessárias à rota (ex.: ordenação em memória)
+        """
+        columns = model.__table__.columns
+        return load_only(*(
+            getattr(model, name)
+            for name in dict.fromkeys((*self.names, *required))
+            if name in columns
+        ))
+
+    def dump(self, obj: Any, **values: Any) -> dict:
+        """
+        Serializa apenas os campos selecionados de um objeto.
+
+        Args:
+            obj: Objeto ORM (ou schema) de origem
+            values: Valores de campos que não são atributos de `obj`
+        """
+        data = {
+            name: values[name] if name in values else getattr(obj, name)
+            for name in self.names
+        }
+        return _subset_model(self.schema, self.names).model_validate(data).model_dump(mode="json")
+
+    def response(self, items: list, **envelope: Any) -> JSONResponse:
+        """Resposta de listagem com os itens reduzidos e os metadados da página."""
+        return JSONResponse({"items": [self.dump(item) for item in items], **envelope})
+
+
+class SparseFields:
+    """Dependency que lê e valida o parâmetro `fields` contra um schema."""
+
+    def __init__(self, schema: type[BaseModel], always: tuple[str, ...] = ("id",)):
+        self.schema = schema
+        self.always = always
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(
+            None, description="Campos separados por vírgula (padrão: todos)"
+        ),
+    ) -> Optional[Fieldset]:
+        if not fields:
+            return None
+
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        invalid = [name for name in requested if name not in self.schema.model_fields]
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campo inválido: {', '.join(invalid)}"
+            )
+
+        return Fieldset(self.schema, tuple(dict.fromkeys((*self.always, *requested))))
@@ -0,0 +1,178 @@
+"""
+Vita - Admin Routes
+Rotas administrativas que consultam todos os shards.
+"""
+
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db, shard_router
+from app.models import Appointment, MaintenanceRun, Patient, VitalSign
+from app.schemas import (
+    MaintenanceRunCreate, MaintenanceRunResponse, MaintenanceTaskResult,
+    ShardStats, ShardStatsResponse
+)
+from app.api.deps import CurrentAdmin
+from app.services import db_maintenance
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+async def _shard_counts(db: AsyncSession) -> tuple[int, int, int]:
+    patients = await db.scalar(select(func.count(Patient.id)))
+    vital_signs = await db.scalar(select(func.count(VitalSign.id)))
+    appointments = await db.scalar(select(func.count(Appointment.id)))
+    return patients or 0, vital_signs or 0, appointments or 0
+
+
+@router.get("/shards", response_model=ShardStatsResponse)
+async def get_shard_stats(
+    current_user: CurrentAdmin,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> ShardStatsResponse:
+    """
+    Retorna o volume de dados de cada shard. As contagens são feitas em
+    todos os shards em paralelo.
+
+    Args:
+        current_user: Administrador autenticado
+        db: Sessão do banco principal (diretório)
+
+    Returns:
+        ShardStatsResponse: Médicos, pacientes, sinais vitais e consultas por shard
+    """
+    counts = await shard_router.fan_out(_shard_counts)
+
+    doctors = await shard_router.doctors_per_shard(db)
+
+    shards = [
+        ShardStats(
+            shard=shard,
+            doctors=doctors.get(shard, 0),
+            patients=patients,
+            vital_signs=vital_signs,
+            appointments=appointments,
+        )
+        for shard, (patients, vital_signs, appointments) in enumerate(counts)
+    ]
+
+    return ShardStatsResponse(
+        shards=shards,
+        total_patients=sum(stats.patients for stats in shards),
+        total_vital_signs=sum(stats.vital_signs for stats in shards),
+        total_appointments=sum(stats.appointments for stats in shards),
+    )
+
+
+def _run_response(run: MaintenanceRun) -> MaintenanceRunResponse:
+    """Monta a resposta de uma execução da manutenção."""
+    return MaintenanceRunResponse(
+        id=run.id,
+        trigger=run.trigger,
+        tasks=run.tasks.split(","),
+        shard=run.shard,
+        status=run.status,
+        error=run.error,
+        duration_ms=run.duration_ms,
+        created_at=run.created_at,
+        started_at=run.started_at,
+        finished_at=run.finished_at,
+        results=[MaintenanceTaskResult(**result) for result in json.loads(run.results or "[]")],
+    )
+
+
+@router.post(
+    "/maintenance",
+    response_model=MaintenanceRunResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def request_maintenance(
+    request: MaintenanceRunCreate,
+    current_user: CurrentAdmin,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> MaintenanceRunResponse:
+    """
+    Solicita a manutenção do banco. A execução é assíncrona: acompanhe
+    por `GET /api/admin/maintenance/runs/{run_id}`.
+
+    A tarefa `vacuum` reconstrói o arquivo inteiro e bloqueia o shard
+    enquanto roda; as demais podem ser executadas a qualquer momento.
+
+    Args:
+        request: Tarefas e shard (sem shard: todos)
+        current_user: Administrador autenticado
+        db: Sessão do banco principal
+
+    Returns:
+        MaintenanceRunResponse: Execução criada
+
+    Raises:
+        HTTPException: Se o shard não existir
+    """
+    if request.shard is not None and request.shard >= shard_router.count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Shard deve estar entre 0 e {shard_router.count - 1}"
+        )
+
+    run = await db_maintenance.request_run(
+        db, [task.value for task in request.tasks], request.shard
+    )
+    return _run_response(run)
+
+
+@router.get("/maintenance/runs", response_model=list[MaintenanceRunResponse])
+async def list_maintenance_runs(
+    current_user: CurrentAdmin,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    limit: int = Query(20, ge=1, le=100),
+) -> list[MaintenanceRunResponse]:
+    """
+    Lista as execuções da manutenção (agendadas e solicitadas), das mais
+    recentes para as mais antigas.
+
+    Args:
+        current_user: Administrador autenticado
+        db: Sessão do banco principal
+        limit: Número máximo de execuções
+
+    Returns:
+        list[MaintenanceRunResponse]: Execuções com duração e efeito
+    """
+    result = await db.execute(
+        select(MaintenanceRun).order_by(MaintenanceRun.id.desc()).limit(limit)
+    )
+    return [_run_response(run) for run in result.scalars().all()]
+
+
+@router.get("/maintenance/runs/{run_id}", response_model=MaintenanceRunResponse)
+async def get_maintenance_run(
+    run_id: int,
+    current_user: CurrentAdmin,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> MaintenanceRunResponse:
+    """
+    Retorna uma execução da manutenção com o resultado de cada tarefa.
+
+    Args:
+        run_id: ID da execução
+        current_user: Administrador autenticado
+        db: Sessão do banco principal
+
+    Returns:
+        MaintenanceRunResponse: Execução
+
+    Raises:
+        HTTPException: Se a execução não for encontrada
+    """
+    run = await db.get(MaintenanceRun, run_id)
+    if run is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Execução de manutenção não encontrada"
+        )
+    return _run_response(run)
@@ -0,0 +1,80 @@
+"""
+Vita - Analytics Routes
+Rotas para análises agregadas sobre a população de pacientes.
+"""
+
+import asyncio
+from typing import Annotated, Optional
+from datetime import datetime, date, timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient
+from app.schemas import CohortAnalyticsResponse, CohortGrouping
+from app.api.deps import CurrentDoctor, get_shard_db
+from app.services import cohort_analytics, vital_partitions
+from app.services.vital_archive import METRIC_COLUMNS
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get("/cohort", response_model=CohortAnalyticsResponse)
+async def get_cohort_analytics(
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    days: int = Query(30, ge=1, le=365),
+    group_by: Optional[CohortGrouping] = Query(None),
+) -> CohortAnalyticsResponse:
+    """
+    Retorna estatísticas da coorte de pacientes do médico.
+
+    Inclui percentis e desvio padrão por métrica, inclinação da tendência
+    de cada paciente e a distribuição de pacientes por classe de pressão
+    arterial, opcionalmente agrupados por gênero ou faixa etária.
+
+    Args:
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+        days: Período em dias
+        group_by: Agrupamento opcional (gender ou age_band)
+
+    Returns:
+        CohortAnalyticsResponse: Estatísticas da coorte
+    """
+    date_to = datetime.utcnow()
+    date_from = date_to - timedelta(days=days)
+
+    patient_ids, reading_days, series = await vital_partitions.fetch_cohort_series(
+        db, current_user.id, METRIC_COLUMNS, date_from, date_to
+    )
+
+    demographics = {}
+    if group_by:
+        result = await db.execute(
+            select(Patient.id, Patient.gender, Patient.birth_date)
+            .where(Patient.doctor_id == current_user.id)
+        )
+        demographics = {row.id: (row.gender, row.birth_date) for row in result}
+
+    window_start_day = (date_from - datetime(1970, 1, 1)).total_seconds() / 86400
+
+    # Vectorized work runs off the event loop
+    cohort = await asyncio.to_thread(
+        cohort_analytics.compute_cohort,
+        patient_ids,
+        reading_days,
+        series,
+        demographics,
+        group_by.value if group_by else None,
+        window_start_day,
+        date.today(),
+    )
+
+    return CohortAnalyticsResponse(
+        date_from=date_from,
+        date_to=date_to,
+        group_by=group_by,
+        **cohort,
+    )
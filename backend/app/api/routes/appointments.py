@@ -3,15 +3,16 @@ Vita - Appointment Routes
 Rotas para gerenciamento de consultas/agendamentos.
 """
 
+from collections import Counter
 from typing import Annotated, Optional
 from datetime import datetime, date, timedelta
 from math import ceil
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, and_
+from fastapi.responses import JSONResponse
+from sqlalchemy import bindparam, select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
 from app.models import Appointment, Patient, AppointmentStatus
 from app.schemas import (
     AppointmentCreate,
@@ -19,24 +20,61 @@ from app.schemas import (
     AppointmentResponse,
     AppointmentDetailResponse,
     AppointmentListResponse,
+    AppointmentCalendarResponse,
+    AppointmentCalendarDay,
+    AppointmentCalendarCell,
     PatientResponse,
     UserResponse,
 )
-from app.api.deps import CurrentDoctor
+from app.api.deps import CurrentDoctor, get_shard_db, verify_patient_ownership
+from app.api.fieldsets import Fieldset, SparseFields
+from app.api.routes.dashboard import invalidate_dashboard
+from app.services.appointment_calendar import calendar_cache
 
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
+CALENDAR_MAX_DAYS = 366
+
+# Built once with named parameters; each appointment comes joined with its
+# patient instead of one patient query per row
+TODAY_APPOINTMENTS_QUERY = (
+    select(Appointment, Patient)
+    .join(Patient, Patient.id == Appointment.patient_id)
+    .where(
+        Appointment.doctor_id == bindparam("doctor_id"),
+        Appointment.scheduled_at >= bindparam("start"),
+        Appointment.scheduled_at <= bindparam("end"),
+    )
+    .order_by(Appointment.scheduled_at)
+)
+
+UPCOMING_APPOINTMENTS_QUERY = (
+    select(Appointment, Patient)
+    .join(Patient, Patient.id == Appointment.patient_id)
+    .where(
+        Appointment.doctor_id == bindparam("doctor_id"),
+        Appointment.scheduled_at >= bindparam("now"),
+        Appointment.status.in_([
+            AppointmentStatus.SCHEDULED,
+            AppointmentStatus.CONFIRMED
+        ]),
+    )
+    .order_by(Appointment.scheduled_at)
+    .limit(bindparam("limit"))
+)
+
 
 @router.get("", response_model=AppointmentListResponse)
 async def list_appointments(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     status_filter: Optional[AppointmentStatus] = Query(None, alias="status"),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
     patient_id: Optional[int] = Query(None),
+    fields: Annotated[Optional[Fieldset], Depends(SparseFields(AppointmentResponse))] = None,
 ) -> AppointmentListResponse:
     """
     Lista consultas do médico com paginação e filtros.
@@ -50,9 +88,13 @@ async def list_appointments(
         date_from: Data inicial
         date_to: Data final
         patient_id: Filtro por paciente
+        fields: Campos a retornar em cada item (padrão: todos)
 
     Returns:
         AppointmentListResponse: Lista paginada de consultas
+
+    Raises:
+        HTTPException: Se um campo for inválido
     """
     query = select(Appointment).where(Appointment.doctor_id == current_user.id)
 
@@ -76,10 +118,21 @@ async def list_appointments(
     # Paginate
     offset = (page - 1) * page_size
     query = query.order_by(Appointment.scheduled_at.desc()).offset(offset).limit(page_size)
+    if fields:
+        query = query.options(fields.load_only(Appointment))
 
     result = await db.execute(query)
     appointments = result.scalars().all()
 
+    if fields:
+        return fields.response(
+            appointments,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=ceil(total / page_size) if total > 0 else 1,
+        )
+
     return AppointmentListResponse(
         items=[AppointmentResponse.model_validate(a) for a in appointments],
         total=total,
@@ -92,7 +145,7 @@ async def list_appointments(
 @router.get("/today", response_model=list[AppointmentDetailResponse])
 async def list_today_appointments(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> list[AppointmentDetailResponse]:
     """
     Lista consultas do dia atual.
@@ -108,23 +161,12 @@ async def list_today_appointments(
     today_end = datetime.combine(date.today(), datetime.max.time())
 
     result = await db.execute(
-        select(Appointment)
-        .where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.scheduled_at >= today_start,
-            Appointment.scheduled_at <= today_end,
-        )
-        .order_by(Appointment.scheduled_at)
+        TODAY_APPOINTMENTS_QUERY,
+        {"doctor_id": current_user.id, "start": today_start, "end": today_end},
     )
-    appointments = result.scalars().all()
 
     detailed_appointments = []
-    for appointment in appointments:
-        patient_result = await db.execute(
-            select(Patient).where(Patient.id == appointment.patient_id)
-        )
-        patient = patient_result.scalar_one()
-
+    for appointment, patient in result.all():
         detailed_appointments.append(
             AppointmentDetailResponse(
                 **AppointmentResponse.model_validate(appointment).model_dump(),
@@ -139,7 +181,7 @@ async def list_today_appointments(
 @router.get("/upcoming", response_model=list[AppointmentDetailResponse])
 async def list_upcoming_appointments(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     limit: int = Query(10, ge=1, le=50),
 ) -> list[AppointmentDetailResponse]:
     """
@@ -156,27 +198,12 @@ async def list_upcoming_appointments(
     now = datetime.utcnow()
 
     result = await db.execute(
-        select(Appointment)
-        .where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.scheduled_at >= now,
-            Appointment.status.in_([
-                AppointmentStatus.SCHEDULED,
-                AppointmentStatus.CONFIRMED
-            ])
-        )
-        .order_by(Appointment.scheduled_at)
-        .limit(limit)
+        UPCOMING_APPOINTMENTS_QUERY,
+        {"doctor_id": current_user.id, "now": now, "limit": limit},
     )
-    appointments = result.scalars().all()
 
     detailed_appointments = []
-    for appointment in appointments:
-        patient_result = await db.execute(
-            select(Patient).where(Patient.id == appointment.patient_id)
-        )
-        patient = patient_result.scalar_one()
-
+    for appointment, patient in result.all():
         detailed_appointments.append(
             AppointmentDetailResponse(
                 **AppointmentResponse.model_validate(appointment).model_dump(),
@@ -188,11 +215,76 @@ async def list_upcoming_appointments(
     return detailed_appointments
 
 
+@router.get("/calendar", response_model=AppointmentCalendarResponse)
+async def get_appointment_calendar(
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+) -> AppointmentCalendarResponse:
+    """
+    Retorna as contagens de consultas por dia, status e tipo de um período
+    (padrão: mês atual), para a visão de calendário.
+
+    Args:
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+        date_from: Data inicial
+        date_to: Data final
+
+    Returns:
+        AppointmentCalendarResponse: Contagens por dia × status × tipo e totais
+
+    Raises:
+        HTTPException: Se o período for inválido
+    """
+    today = date.today()
+    start = date_from or today.replace(day=1)
+    end = date_to or (
+        (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    )
+
+    if end < start or (end - start).days > CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Período inválido (máximo de {CALENDAR_MAX_DAYS} dias)"
+        )
+
+    cells = await calendar_cache.counts(db, current_user.id, start, end)
+
+    by_status: Counter = Counter()
+    by_type: Counter = Counter()
+    by_day: Counter = Counter()
+    for cell in cells:
+        by_status[cell.status] += cell.count
+        by_type[cell.appointment_type] += cell.count
+        by_day[cell.day] += cell.count
+
+    return AppointmentCalendarResponse(
+        date_from=start,
+        date_to=end,
+        total=sum(by_day.values()),
+        by_status=dict(by_status),
+        by_type=dict(by_type),
+        days=[AppointmentCalendarDay(date=day, total=total) for day, total in by_day.items()],
+        cells=[
+            AppointmentCalendarCell(
+                date=cell.day,
+                status=cell.status,
+                appointment_type=cell.appointment_type,
+                count=cell.count,
+            )
+            for cell in cells
+        ],
+    )
+
+
 @router.get("/{appointment_id}", response_model=AppointmentDetailResponse)
 async def get_appointment(
     appointment_id: int,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    fields: Annotated[Optional[Fieldset], Depends(SparseFields(AppointmentDetailResponse))] = None,
 ) -> AppointmentDetailResponse:
     """
     Retorna detalhes de uma consulta específica.
@@ -201,19 +293,23 @@ async def get_appointment(
         appointment_id: ID da consulta
         current_user: Médico autenticado
         db: Sessão do banco de dados
+        fields: Campos a retornar (padrão: todos)
 
     Returns:
         AppointmentDetailResponse: Detalhes da consulta
 
     Raises:
-        HTTPException: Se a consulta não for encontrada
+        HTTPException: Se a consulta não for encontrada ou um campo for inválido
     """
-    result = await db.execute(
-        select(Appointment).where(
-            Appointment.id == appointment_id,
-            Appointment.doctor_id == current_user.id
-        )
+    query = select(Appointment).where(
+        Appointment.id == appointment_id,
+        Appointment.doctor_id == current_user.id
     )
+    if fields:
+        # patient_id is needed to load the nested patient
+        query = query.options(fields.load_only(Appointment, "patient_id"))
+
+    result = await db.execute(query)
     appointment = result.scalar_one_or_none()
 
     if not appointment:
@@ -222,6 +318,20 @@ async def get_appointment(
             detail="Consulta não encontrada"
         )
 
+    if fields:
+        patient = None
+        if "patient" in fields:
+            patient_result = await db.execute(
+                select(Patient).where(Patient.id == appointment.patient_id)
+            )
+            patient = PatientResponse.model_validate(patient_result.scalar_one())
+
+        return JSONResponse(fields.dump(
+            appointment,
+            patient=patient,
+            doctor=UserResponse.model_validate(current_user),
+        ))
+
     patient_result = await db.execute(
         select(Patient).where(Patient.id == appointment.patient_id)
     )
@@ -238,7 +348,7 @@ async def get_appointment(
 async def create_appointment(
     request: AppointmentCreate,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> Appointment:
     """
     Agenda uma nova consulta.
@@ -255,19 +365,7 @@ async def create_appointment(
         HTTPException: Se o paciente não for encontrado ou horário indisponível
     """
     # Verify patient exists and belongs to doctor
-    patient_result = await db.execute(
-        select(Patient).where(
-            Patient.id == request.patient_id,
-            Patient.doctor_id == current_user.id
-        )
-    )
-    patient = patient_result.scalar_one_or_none()
-
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
+    await verify_patient_ownership(db, current_user, [request.patient_id])
 
     # Check for conflicting appointments
     appointment_end = request.scheduled_at + timedelta(minutes=request.duration_minutes)
@@ -300,6 +398,9 @@ async def create_appointment(
     await db.commit()
     await db.refresh(appointment)
 
+    calendar_cache.invalidate(current_user.id, [appointment.scheduled_at])
+    invalidate_dashboard(current_user.id)
+
     return appointment
 
 
@@ -308,7 +409,7 @@ async def update_appointment(
     appointment_id: int,
     request: AppointmentUpdate,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> Appointment:
     """
     Atualiza uma consulta.
@@ -339,6 +440,8 @@ async def update_appointment(
             detail="Consulta não encontrada"
         )
 
+    previous_scheduled_at = appointment.scheduled_at
+
     update_data = request.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(appointment, field, value)
@@ -346,6 +449,11 @@ async def update_appointment(
     await db.commit()
     await db.refresh(appointment)
 
+    calendar_cache.invalidate(
+        current_user.id, [previous_scheduled_at, appointment.scheduled_at]
+    )
+    invalidate_dashboard(current_user.id)
+
     return appointment
 
 
@@ -353,7 +461,7 @@ async def update_appointment(
 async def cancel_appointment(
     appointment_id: int,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> None:
     """
     Cancela uma consulta.
@@ -382,3 +490,6 @@ async def cancel_appointment(
 
     appointment.status = AppointmentStatus.CANCELLED
     await db.commit()
+
+    calendar_cache.invalidate(current_user.id, [appointment.scheduled_at])
+    invalidate_dashboard(current_user.id)
@@ -10,7 +10,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_db, shard_router
 from app.core.config import settings
 from app.core.security import (
     create_access_token,
@@ -19,7 +19,7 @@ from app.core.security import (
     get_password_hash,
     verify_token,
 )
-from app.models import User
+from app.models import User, UserRole
 from app.schemas import (
     LoginRequest,
     TokenResponse,
@@ -131,6 +131,10 @@ async def register(
     )
 
     db.add(user)
+    if user.role == UserRole.DOCTOR:
+        # Clinical data is partitioned by doctor
+        await db.flush()
+        await shard_router.assign(db, user.id)
     await db.commit()
     await db.refresh(user)
 
@@ -0,0 +1,107 @@
+"""
+Vita - Batch Routes
+Rota para agrupar várias leituras (GET) em uma única requisição.
+"""
+
+import asyncio
+import json
+from typing import Any
+from urllib.parse import unquote
+
+from fastapi import APIRouter, Request
+
+from app.schemas import BatchRequest, BatchRequestItem, BatchResponse, BatchResponseItem
+from app.api.deps import CurrentDoctor, BATCH_PRINCIPAL_KEY
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+# Headers forwarded from the batch request to each sub-request
+FORWARDED_HEADERS = (b"authorization", b"accept-language")
+
+
+async def _dispatch(request: Request, item: BatchRequestItem, principal) -> BatchResponseItem:
+    """Executa uma sub-requisição GET em processo, pela pilha ASGI da aplicação."""
+    path, _, query = item.path.partition("?")
+
+    if not path.startswith("/api/") or path.startswith("/api/batch"):
+        return BatchResponseItem(
+            id=item.id,
+            path=item.path,
+            status=400,
+            body={"detail": "Caminho inválido para requisição em lote"},
+        )
+
+    parent = request.scope
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": unquote(path),
+        "raw_path": path.encode("latin-1", "ignore"),
+        "query_string": query.encode("latin-1", "ignore"),
+        "headers": [(k, v) for k, v in parent.get("headers", []) if k in FORWARDED_HEADERS],
+        "state": dict(parent.get("state", {})),
+        BATCH_PRINCIPAL_KEY: principal,
+    }
+
+    status_code = 500
+    chunks: list[bytes] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The error middleware has already answered 500; keep the other items going
+        status_code = 500
+
+    raw = b"".join(chunks)
+    body: Any = None
+    if raw:
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = raw.decode("utf-8", "replace")
+
+    return BatchResponseItem(id=item.id, path=item.path, status=status_code, body=body)
+
+
+@router.post("", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: CurrentDoctor,
+) -> BatchResponse:
+    """
+    Executa várias leituras (GET) da API em uma única requisição.
+
+    O usuário é autenticado uma vez e compartilhado pelas sub-requisições,
+    que são despachadas em processo contra os próprios routers e rodam
+    concorrentemente. Cada item traz seu próprio status; uma falha não
+    interrompe as demais.
+
+    Args:
+        batch: Lista de sub-requisições (`path` com query string, sob `/api/`)
+        request: Requisição do lote
+        current_user: Médico autenticado
+
+    Returns:
+        BatchResponse: Respostas na mesma ordem das sub-requisições
+    """
+    responses = await asyncio.gather(
+        *(_dispatch(request, item, current_user) for item in batch.requests)
+    )
+    return BatchResponse(responses=list(responses))
@@ -0,0 +1,76 @@
+"""
+Vita - Change Feed Routes
+Rota de sincronização incremental (delta sync).
+"""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import (
+    ChangeEntry,
+    ChangeFeedResponse,
+    PatientResponse,
+    AppointmentResponse,
+    VitalSignResponse,
+)
+from app.api.deps import CurrentDoctor, get_shard_db
+from app.services import change_feed
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+RECORD_SCHEMAS = {
+    "patient": PatientResponse,
+    "appointment": AppointmentResponse,
+    "vital_sign": VitalSignResponse,
+}
+
+
+@router.get("", response_model=ChangeFeedResponse)
+async def list_changes(
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+) -> ChangeFeedResponse:
+    """
+    Lista as alterações de pacientes, consultas e sinais vitais do médico
+    posteriores a `since`, em ordem de `seq`.
+
+    Cada registro aparece no máximo uma vez, com a alteração mais recente
+    e o estado atual. Para sincronizar, o cliente começa com `since=0` e
+    repete a chamada com `next_since` enquanto `has_more` for verdadeiro;
+    nas sincronizações seguintes, parte do último `next_since` recebido.
+    Como entradas antigas são compactadas, `insert` e `update` devem ser
+    tratados como upsert.
+
+    Args:
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+        since: Último `seq` já sincronizado pelo cliente
+        limit: Quantidade máxima de alterações
+
+    Returns:
+        ChangeFeedResponse: Alterações e cursor para a próxima chamada
+    """
+    entries, has_more = await change_feed.fetch_changes(db, current_user.id, since, limit)
+    records = await change_feed.load_records(db, entries)
+
+    changes = []
+    for entry in entries:
+        record = records.get((entry.entity, entry.entity_id))
+        changes.append(ChangeEntry(
+            seq=entry.seq,
+            entity=entry.entity,
+            entity_id=entry.entity_id,
+            operation=entry.operation,
+            changed_at=entry.changed_at,
+            data=RECORD_SCHEMAS[entry.entity].model_validate(record) if record else None,
+        ))
+
+    return ChangeFeedResponse(
+        changes=changes,
+        next_since=entries[-1].seq if entries else since,
+        has_more=has_more,
+    )
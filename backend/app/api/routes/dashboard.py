@@ -7,21 +7,77 @@ from typing import Annotated
 from datetime import datetime, date, timedelta
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.shared_cache import shared_cache
 from app.models import Patient, Appointment, VitalSign, AppointmentStatus
 from app.schemas import DashboardStatsResponse
-from app.api.deps import CurrentDoctor
+from app.api.deps import CurrentDoctor, get_shard_db
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+# Statements built once with named parameters: neither the construct nor its
+# compiled-cache key is rebuilt per request
+TOTAL_PATIENTS_QUERY = select(func.count(Patient.id)).where(
+    Patient.doctor_id == bindparam("doctor_id"),
+    Patient.is_active == True,
+)
+
+TOTAL_APPOINTMENTS_QUERY = select(func.count(Appointment.id)).where(
+    Appointment.doctor_id == bindparam("doctor_id")
+)
+
+APPOINTMENTS_BETWEEN_QUERY = select(func.count(Appointment.id)).where(
+    Appointment.doctor_id == bindparam("doctor_id"),
+    Appointment.scheduled_at >= bindparam("start"),
+    Appointment.scheduled_at <= bindparam("end"),
+)
+
+# The doctor's patients as a subquery rather than an IN list of their ids
+PATIENTS_WITH_ALERTS_QUERY = select(func.count(func.distinct(VitalSign.patient_id))).where(
+    VitalSign.patient_id.in_(select(Patient.id).where(Patient.doctor_id == bindparam("doctor_id"))),
+    VitalSign.recorded_at >= bindparam("since"),
+    or_(
+        VitalSign.heart_rate < 50,
+        VitalSign.heart_rate > 120,
+        VitalSign.systolic_pressure < 90,
+        VitalSign.systolic_pressure > 180,
+        VitalSign.temperature < 35,
+        VitalSign.temperature > 39,
+        VitalSign.oxygen_saturation < 90,
+    ),
+)
+
+COMPLETED_APPOINTMENTS_QUERY = select(func.count(Appointment.id)).where(
+    Appointment.doctor_id == bindparam("doctor_id"),
+    Appointment.status == AppointmentStatus.COMPLETED,
+)
+
+PENDING_APPOINTMENTS_QUERY = select(func.count(Appointment.id)).where(
+    Appointment.doctor_id == bindparam("doctor_id"),
+    Appointment.status.in_([
+        AppointmentStatus.SCHEDULED,
+        AppointmentStatus.CONFIRMED
+    ]),
+    Appointment.scheduled_at >= bindparam("now"),
+)
+
+
+def _scope(doctor_id: int) -> tuple:
+    return ("dashboard", doctor_id)
+
+
+def invalidate_dashboard(doctor_id: int) -> None:
+    """Descarta as estatísticas em cache do médico (após escritas que as afetam)."""
+    shared_cache.invalidate(_scope(doctor_id))
+
 
 @router.get("/stats", response_model=DashboardStatsResponse)
 async def get_dashboard_stats(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> DashboardStatsResponse:
     """
     Retorna estatísticas gerais para o dashboard do médico.
@@ -33,99 +89,56 @@ async def get_dashboard_stats(
     Returns:
         DashboardStatsResponse: Estatísticas do dashboard
     """
-    # Total patients
-    total_patients_result = await db.execute(
-        select(func.count(Patient.id)).where(
-            Patient.doctor_id == current_user.id,
-            Patient.is_active == True
-        )
+    # Cached per doctor and day in the cross-worker cache; writes invalidate it
+    scope = _scope(current_user.id)
+    key = (*scope, date.today())
+    cached = shared_cache.get(key, scope)
+    if cached is not None:
+        return DashboardStatsResponse.model_validate_json(cached)
+
+    generation = shared_cache.generation(scope)
+    stats = await _compute_dashboard_stats(db, current_user.id)
+    shared_cache.put(
+        key, scope, stats.model_dump_json(), settings.DASHBOARD_CACHE_TTL_SECONDS, generation
     )
-    total_patients = total_patients_result.scalar() or 0
+    return stats
+
+
+async def _compute_dashboard_stats(db: AsyncSession, doctor_id: int) -> DashboardStatsResponse:
+    async def count(query, **params) -> int:
+        result = await db.execute(query, {"doctor_id": doctor_id, **params})
+        return result.scalar() or 0
+
+    # Total patients
+    total_patients = await count(TOTAL_PATIENTS_QUERY)
 
     # Total appointments
-    total_appointments_result = await db.execute(
-        select(func.count(Appointment.id)).where(
-            Appointment.doctor_id == current_user.id
-        )
-    )
-    total_appointments = total_appointments_result.scalar() or 0
+    total_appointments = await count(TOTAL_APPOINTMENTS_QUERY)
 
     # Appointments today
     today_start = datetime.combine(date.today(), datetime.min.time())
     today_end = datetime.combine(date.today(), datetime.max.time())
-
-    appointments_today_result = await db.execute(
-        select(func.count(Appointment.id)).where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.scheduled_at >= today_start,
-            Appointment.scheduled_at <= today_end,
-        )
-    )
-    appointments_today = appointments_today_result.scalar() or 0
+    appointments_today = await count(APPOINTMENTS_BETWEEN_QUERY, start=today_start, end=today_end)
 
     # Appointments this week
     week_start = date.today() - timedelta(days=date.today().weekday())
     week_end = week_start + timedelta(days=6)
-
-    appointments_week_result = await db.execute(
-        select(func.count(Appointment.id)).where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.scheduled_at >= datetime.combine(week_start, datetime.min.time()),
-            Appointment.scheduled_at <= datetime.combine(week_end, datetime.max.time()),
-        )
+    appointments_this_week = await count(
+        APPOINTMENTS_BETWEEN_QUERY,
+        start=datetime.combine(week_start, datetime.min.time()),
+        end=datetime.combine(week_end, datetime.max.time()),
     )
-    appointments_this_week = appointments_week_result.scalar() or 0
 
     # Patients with critical vitals (alerts)
-    from sqlalchemy import or_
-
-    patient_ids_result = await db.execute(
-        select(Patient.id).where(Patient.doctor_id == current_user.id)
+    patients_with_alerts = await count(
+        PATIENTS_WITH_ALERTS_QUERY, since=datetime.utcnow() - timedelta(hours=24)
     )
-    patient_ids = [p for p in patient_ids_result.scalars().all()]
-
-    patients_with_alerts = 0
-    if patient_ids:
-        time_threshold = datetime.utcnow() - timedelta(hours=24)
-
-        alerts_result = await db.execute(
-            select(func.count(func.distinct(VitalSign.patient_id))).where(
-                VitalSign.patient_id.in_(patient_ids),
-                VitalSign.recorded_at >= time_threshold,
-                or_(
-                    VitalSign.heart_rate < 50,
-                    VitalSign.heart_rate > 120,
-                    VitalSign.systolic_pressure < 90,
-                    VitalSign.systolic_pressure > 180,
-                    VitalSign.temperature < 35,
-                    VitalSign.temperature > 39,
-                    VitalSign.oxygen_saturation < 90,
-                )
-            )
-        )
-        patients_with_alerts = alerts_result.scalar() or 0
 
     # Completed appointments
-    completed_result = await db.execute(
-        select(func.count(Appointment.id)).where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.status == AppointmentStatus.COMPLETED
-        )
-    )
-    completed_appointments = completed_result.scalar() or 0
+    completed_appointments = await count(COMPLETED_APPOINTMENTS_QUERY)
 
     # Pending appointments
-    pending_result = await db.execute(
-        select(func.count(Appointment.id)).where(
-            Appointment.doctor_id == current_user.id,
-            Appointment.status.in_([
-                AppointmentStatus.SCHEDULED,
-                AppointmentStatus.CONFIRMED
-            ]),
-            Appointment.scheduled_at >= datetime.utcnow()
-        )
-    )
-    pending_appointments = pending_result.scalar() or 0
+    pending_appointments = await count(PENDING_APPOINTMENTS_QUERY, now=datetime.utcnow())
 
     return DashboardStatsResponse(
         total_patients=total_patients,
@@ -3,38 +3,50 @@ Vita - Patient Routes
 Rotas para gerenciamento de pacientes.
 """
 
+import asyncio
 from typing import Annotated, Optional
+from datetime import datetime
 from math import ceil
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import shard_router
 from app.core.config import settings
-from app.models import Patient, VitalSign, Appointment, AppointmentStatus
+from app.models import Patient, Appointment, AppointmentStatus
 from app.schemas import (
     PatientCreate,
     PatientUpdate,
     PatientResponse,
     PatientListResponse,
     PatientDetailResponse,
+    PatientOverviewResponse,
     VitalSignResponse,
     AppointmentResponse,
 )
-from app.api.deps import CurrentDoctor
+from app.api.deps import CurrentDoctor, OwnedPatientId, get_shard_db
+from app.api.fieldsets import Fieldset, SparseFields
+from app.api.routes import vitals
+from app.api.routes.dashboard import invalidate_dashboard
+from app.services import vital_partitions
+from app.services.patient_ownership import ownership_cache
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
+OVERVIEW_SECTIONS = ("patient", "vitals", "stats", "chart", "appointments")
+
 
 @router.get("", response_model=PatientListResponse)
 async def list_patients(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
+    fields: Annotated[Optional[Fieldset], Depends(SparseFields(PatientResponse))] = None,
 ) -> PatientListResponse:
     """
     Lista pacientes do médico com paginação e filtros.
@@ -46,9 +58,13 @@ async def list_patients(
         page_size: Itens por página
         search: Busca por nome ou CPF
         is_active: Filtro por status
+        fields: Campos a retornar em cada item (padrão: todos)
 
     Returns:
         PatientListResponse: Lista paginada de pacientes
+
+    Raises:
+        HTTPException: Se um campo for inválido
     """
     query = select(Patient).where(Patient.doctor_id == current_user.id)
 
@@ -70,10 +86,21 @@ async def list_patients(
     # Paginate
     offset = (page - 1) * page_size
     query = query.order_by(Patient.full_name).offset(offset).limit(page_size)
+    if fields:
+        query = query.options(fields.load_only(Patient))
 
     result = await db.execute(query)
     patients = result.scalars().all()
 
+    if fields:
+        return fields.response(
+            patients,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=ceil(total / page_size) if total > 0 else 1,
+        )
+
     return PatientListResponse(
         items=[PatientResponse.model_validate(p) for p in patients],
         total=total,
@@ -87,7 +114,8 @@ async def list_patients(
 async def get_patient(
     patient_id: int,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    fields: Annotated[Optional[Fieldset], Depends(SparseFields(PatientDetailResponse))] = None,
 ) -> PatientDetailResponse:
     """
     Retorna detalhes de um paciente específico.
@@ -96,19 +124,22 @@ async def get_patient(
         patient_id: ID do paciente
         current_user: Médico autenticado
         db: Sessão do banco de dados
+        fields: Campos a retornar (padrão: todos)
 
     Returns:
         PatientDetailResponse: Detalhes do paciente
 
     Raises:
-        HTTPException: Se o paciente não for encontrado
+        HTTPException: Se o paciente não for encontrado ou um campo for inválido
     """
-    result = await db.execute(
-        select(Patient).where(
-            Patient.id == patient_id,
-            Patient.doctor_id == current_user.id
-        )
+    query = select(Patient).where(
+        Patient.id == patient_id,
+        Patient.doctor_id == current_user.id
     )
+    if fields:
+        query = query.options(fields.load_only(Patient))
+
+    result = await db.execute(query)
     patient = result.scalar_one_or_none()
 
     if not patient:
@@ -117,18 +148,133 @@ async def get_patient(
             detail="Paciente não encontrado"
         )
 
+    return await _patient_detail(db, patient, fields)
+
+
+@router.get("/{patient_id}/overview", response_model=PatientOverviewResponse)
+async def get_patient_overview(
+    patient_id: OwnedPatientId,
+    current_user: CurrentDoctor,
+    include: Optional[str] = Query(
+        None, description="Seções separadas por vírgula (padrão: todas)"
+    ),
+    days: int = Query(30, ge=1, le=365),
+    vitals_limit: int = Query(20, ge=1, le=100),
+    appointments_limit: int = Query(20, ge=1, le=100),
+) -> PatientOverviewResponse:
+    """
+    Retorna em uma única resposta os dados da tela do paciente.
+
+    A autorização é feita uma vez; as seções independentes são
+    consultadas concorrentemente, cada uma em sua própria sessão (e
+    conexão) de leitura, de modo que a latência fica próxima à da seção
+    mais lenta.
+
+    Args:
+        patient_id: ID do paciente
+        current_user: Médico autenticado
+        include: Seções desejadas (patient, vitals, stats, chart, appointments)
+        days: Período em dias para estatísticas e gráfico
+        vitals_limit: Quantidade de sinais vitais recentes
+        appointments_limit: Quantidade de consultas recentes
+
+    Returns:
+        PatientOverviewResponse: Seções solicitadas
+
+    Raises:
+        HTTPException: Se o paciente não for encontrado ou a seção for inválida
+    """
+    sections = OVERVIEW_SECTIONS
+    if include:
+        sections = tuple(dict.fromkeys(part.strip() for part in include.split(",") if part.strip()))
+        invalid = [section for section in sections if section not in OVERVIEW_SECTIONS]
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Seção inválida: {', '.join(invalid)}"
+            )
+
+    async def load_patient(db: AsyncSession):
+        patient = await db.get(Patient, patient_id)
+        return await _patient_detail(db, patient)
+
+    async def load_appointments(db: AsyncSession):
+        result = await db.execute(
+            select(Appointment)
+            .where(
+                Appointment.patient_id == patient_id,
+                Appointment.doctor_id == current_user.id,
+            )
+            .order_by(Appointment.scheduled_at.desc())
+            .limit(appointments_limit)
+        )
+        return [AppointmentResponse.model_validate(a) for a in result.scalars().all()]
+
+    loaders = {
+        "patient": load_patient,
+        "vitals": lambda db: vitals.load_vital_list(db, patient_id, limit=vitals_limit),
+        "stats": lambda db: vitals.load_vital_stats(db, patient_id, days),
+        "chart": lambda db: vitals.load_vital_chart(db, patient_id, days),
+        "appointments": load_appointments,
+    }
+
+    session_maker = await shard_router.sessionmaker_for(current_user.id)
+
+    async def run(section: str):
+        async with session_maker() as db:
+            return await loaders[section](db)
+
+    results = await asyncio.gather(*(run(section) for section in sections))
+
+    return PatientOverviewResponse(**dict(zip(sections, results)))
+
+
+async def _patient_detail(
+    db: AsyncSession,
+    patient: Patient,
+    fields: Optional[Fieldset] = None,
+) -> PatientDetailResponse | JSONResponse:
+    """
+    Monta o detalhe do paciente com últimos sinais vitais e próximas consultas.
+    Com `fields`, as seções não selecionadas nem são consultadas.
+    """
+    if fields:
+        latest_vitals = None
+        if "latest_vitals" in fields:
+            latest = await vital_partitions.fetch_vitals(db, patient.id, descending=True, limit=1)
+            latest_vitals = VitalSignResponse.model_validate(latest[0]) if latest else None
+
+        upcoming_appointments = []
+        if "upcoming_appointments" in fields:
+            upcoming_appointments = [
+                AppointmentResponse.model_validate(a)
+                for a in await _upcoming_appointments(db, patient.id)
+            ]
+
+        return JSONResponse(fields.dump(
+            patient,
+            latest_vitals=latest_vitals,
+            upcoming_appointments=upcoming_appointments,
+        ))
+
     # Get latest vitals
-    vitals_result = await db.execute(
-        select(VitalSign)
-        .where(VitalSign.patient_id == patient_id)
-        .order_by(VitalSign.recorded_at.desc())
-        .limit(1)
-    )
-    latest_vitals = vitals_result.scalar_one_or_none()
+    latest = await vital_partitions.fetch_vitals(db, patient.id, descending=True, limit=1)
+    latest_vitals = latest[0] if latest else None
 
     # Get upcoming appointments
-    from datetime import datetime
+    upcoming_appointments = await _upcoming_appointments(db, patient.id)
+
+    return PatientDetailResponse(
+        **PatientResponse.model_validate(patient).model_dump(),
+        latest_vitals=VitalSignResponse.model_validate(latest_vitals) if latest_vitals else None,
+        upcoming_appointments=[
+            AppointmentResponse.model_validate(a) for a in upcoming_appointments
+        ],
+    )
+
 
+async def _upcoming_appointments(db: AsyncSession, patient_id: int) -> list[Appointment]:
+    """Próximas 5 consultas agendadas ou confirmadas do paciente."""
     appointments_result = await db.execute(
         select(Appointment)
         .where(
@@ -142,22 +288,14 @@ async def get_patient(
         .order_by(Appointment.scheduled_at)
         .limit(5)
     )
-    upcoming_appointments = appointments_result.scalars().all()
-
-    return PatientDetailResponse(
-        **PatientResponse.model_validate(patient).model_dump(),
-        latest_vitals=VitalSignResponse.model_validate(latest_vitals) if latest_vitals else None,
-        upcoming_appointments=[
-            AppointmentResponse.model_validate(a) for a in upcoming_appointments
-        ],
-    )
+    return list(appointments_result.scalars().all())
 
 
 @router.post("", response_model=PatientResponse, status_code=status.HTTP_201_CREATED)
 async def create_patient(
     request: PatientCreate,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> Patient:
     """
     Cria um novo paciente.
@@ -173,10 +311,15 @@ async def create_patient(
     Raises:
         HTTPException: Se o CPF já estiver cadastrado
     """
-    result = await db.execute(
-        select(Patient).where(Patient.cpf == request.cpf)
-    )
-    existing = result.scalar_one_or_none()
+    # The unique index only covers one shard: the CPF is checked on all of them
+    async def cpf_taken(shard_db: AsyncSession) -> bool:
+        result = await shard_db.execute(select(Patient.id).where(Patient.cpf == request.cpf))
+        return result.first() is not None
+
+    if shard_router.enabled:
+        existing = any(await shard_router.fan_out(cpf_taken))
+    else:
+        existing = await cpf_taken(db)
 
     if existing:
         raise HTTPException(
@@ -193,6 +336,9 @@ async def create_patient(
     await db.commit()
     await db.refresh(patient)
 
+    ownership_cache.invalidate(current_user.id)
+    invalidate_dashboard(current_user.id)
+
     return patient
 
 
@@ -201,7 +347,7 @@ async def update_patient(
     patient_id: int,
     request: PatientUpdate,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> Patient:
     """
     Atualiza dados de um paciente.
@@ -246,7 +392,7 @@ async def update_patient(
 async def delete_patient(
     patient_id: int,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> None:
     """
     Desativa um paciente (soft delete).
@@ -275,3 +421,6 @@ async def delete_patient(
 
     patient.is_active = False
     await db.commit()
+
+    ownership_cache.invalidate(current_user.id)
+    invalidate_dashboard(current_user.id)
@@ -0,0 +1,185 @@
+"""
+Vita - Report Routes
+Rotas para solicitar e acompanhar relatórios de pacientes.
+"""
+
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Patient, ReportJob
+from app.schemas import ReportArtifact, ReportJobCreate, ReportJobResponse
+from app.api.deps import CurrentDoctor, get_shard_db, verify_patient_ownership
+from app.services import reports
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+
+def _job_response(job: ReportJob) -> ReportJobResponse:
+    """Monta a resposta do job com os links dos relatórios já gerados."""
+    artifacts = [
+        ReportArtifact(
+            patient_id=int(patient_id),
+            url=f"/api/reports/{job.id}/patients/{patient_id}",
+            version=artifact["version"],
+            cached=artifact["cached"],
+        )
+        for patient_id, artifact in json.loads(job.artifacts or "{}").items()
+    ]
+    return ReportJobResponse(
+        id=job.id,
+        status=job.status,
+        days=job.days,
+        total=job.total,
+        completed=job.completed,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        artifacts=artifacts,
+    )
+
+
+async def _get_job(db: AsyncSession, job_id: int, doctor_id: int) -> ReportJob:
+    job = await db.get(ReportJob, job_id)
+    if job is None or job.doctor_id != doctor_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Relatório não encontrado"
+        )
+    return job
+
+
+@router.post("", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    request: ReportJobCreate,
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+) -> ReportJobResponse:
+    """
+    Solicita relatórios de pacientes. A geração é assíncrona: acompanhe
+    o job por `GET /api/reports/{job_id}`.
+
+    Sem `patient_ids`, gera os relatórios de todos os pacientes ativos do
+    médico.
+
+    Args:
+        request: Pacientes e período em dias
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+
+    Returns:
+        ReportJobResponse: Job criado
+
+    Raises:
+        HTTPException: Se algum paciente não for encontrado ou a carteira
+            exceder o limite por job
+    """
+    if request.patient_ids:
+        patient_ids = list(dict.fromkeys(request.patient_ids))
+        await verify_patient_ownership(db, current_user, patient_ids)
+    else:
+        result = await db.execute(
+            select(Patient.id)
+            .where(Patient.doctor_id == current_user.id, Patient.is_active == True)
+            .order_by(Patient.id)
+        )
+        patient_ids = list(result.scalars().all())
+
+    if len(patient_ids) > settings.REPORT_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.REPORT_MAX_PATIENTS} pacientes por solicitação"
+        )
+
+    job = await reports.create_job(db, current_user.id, patient_ids, request.days)
+    return _job_response(job)
+
+
+@router.get("", response_model=list[ReportJobResponse])
+async def list_report_jobs(
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    limit: int = Query(20, ge=1, le=100),
+) -> list[ReportJobResponse]:
+    """
+    Lista os jobs de relatórios mais recentes do médico.
+
+    Args:
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+        limit: Quantidade máxima de resultados
+
+    Returns:
+        list[ReportJobResponse]: Jobs, do mais recente para o mais antigo
+    """
+    result = await db.execute(
+        select(ReportJob)
+        .where(ReportJob.doctor_id == current_user.id)
+        .order_by(ReportJob.id.desc())
+        .limit(limit)
+    )
+    return [_job_response(job) for job in result.scalars().all()]
+
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: int,
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+) -> ReportJobResponse:
+    """
+    Retorna o status e o progresso de um job de relatórios.
+
+    Args:
+        job_id: ID do job
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+
+    Returns:
+        ReportJobResponse: Job com os relatórios já gerados
+
+    Raises:
+        HTTPException: Se o job não for encontrado
+    """
+    return _job_response(await _get_job(db, job_id, current_user.id))
+
+
+@router.get("/{job_id}/patients/{patient_id}", response_class=FileResponse)
+async def download_report(
+    job_id: int,
+    patient_id: int,
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+) -> FileResponse:
+    """
+    Retorna o relatório HTML de um paciente gerado pelo job.
+
+    Args:
+        job_id: ID do job
+        patient_id: ID do paciente
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+
+    Returns:
+        FileResponse: Documento HTML
+
+    Raises:
+        HTTPException: Se o job ou o relatório não for encontrado
+    """
+    job = await _get_job(db, job_id, current_user.id)
+
+    artifact = json.loads(job.artifacts or "{}").get(str(patient_id))
+    path = reports.artifact_path(patient_id, artifact["version"]) if artifact else None
+    if path is None or not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Relatório não encontrado"
+        )
+
+    return FileResponse(path, media_type="text/html; charset=utf-8")
@@ -6,33 +6,228 @@ Rotas para gerenciamento de sinais vitais.
 from typing import Annotated, Optional
 from datetime import datetime, date, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func
+import numpy as np
+from fastapi import APIRouter, Depends, status, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import bindparam, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
-from app.models import VitalSign, Patient
+from app.core.config import settings
+from app.core.shared_cache import shared_cache
+from app.models import VitalSign, VitalAnomaly, Patient
 from app.schemas import (
     VitalSignCreate,
     VitalSignResponse,
     VitalSignListResponse,
+    VitalAnomalyResponse,
     VitalStatsResponse,
+    VitalBatchRequest,
+    VitalBatchItem,
+    VitalBatchResponse,
     VitalChartData,
     ChartDataPoint,
 )
-from app.api.deps import CurrentDoctor
+from app.api.deps import CurrentDoctor, OwnedPatientId, get_shard_db, verify_patient_ownership
+from app.api.fieldsets import Fieldset, SparseFields
+from app.api.routes.dashboard import invalidate_dashboard
+from app.services import cohort_analytics, quantile_sketches, vital_counters, vital_partitions
+from app.services.job_queue import job_queue
 
 router = APIRouter(prefix="/vitals", tags=["Vital Signs"])
 
+# Built once with named parameters; the doctor's patients are a subquery
+# rather than an IN list of their ids
+CRITICAL_VITALS_QUERY = (
+    select(VitalSign)
+    .where(
+        VitalSign.patient_id.in_(select(Patient.id).where(Patient.doctor_id == bindparam("doctor_id"))),
+        VitalSign.recorded_at >= bindparam("since"),
+        or_(
+            VitalSign.heart_rate < 50,
+            VitalSign.heart_rate > 120,
+            VitalSign.systolic_pressure < 90,
+            VitalSign.systolic_pressure > 180,
+            VitalSign.temperature < 35,
+            VitalSign.temperature > 39,
+            VitalSign.oxygen_saturation < 90,
+        ),
+    )
+    .order_by(VitalSign.recorded_at.desc())
+    .limit(50)
+)
+
+CHART_METRICS = ("heart_rate", "systolic_pressure", "diastolic_pressure", "temperature", "oxygen_saturation")
+
+
+def _stats_response(stats: dict, percentiles: dict) -> VitalStatsResponse:
+    """Monta a resposta de estatísticas a partir dos valores brutos."""
+    return VitalStatsResponse(
+        avg_heart_rate=round(stats["avg_heart_rate"], 1) if stats["avg_heart_rate"] else None,
+        avg_systolic=round(stats["avg_systolic"], 1) if stats["avg_systolic"] else None,
+        avg_diastolic=round(stats["avg_diastolic"], 1) if stats["avg_diastolic"] else None,
+        avg_temperature=round(stats["avg_temperature"], 2) if stats["avg_temperature"] else None,
+        avg_oxygen=round(stats["avg_oxygen"], 1) if stats["avg_oxygen"] else None,
+        min_heart_rate=stats["min_heart_rate"],
+        max_heart_rate=stats["max_heart_rate"],
+        total_records=stats["total_records"],
+        percentiles=percentiles,
+    )
+
+
+async def load_vital_list(
+    db: AsyncSession,
+    patient_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = 100,
+    fields: Optional[Fieldset] = None,
+    before: Optional[datetime] = None,
+    include_total: bool = False,
+    before_id: Optional[int] = None,
+) -> VitalSignListResponse | JSONResponse:
+    """
+    Sinais vitais mais recentes do paciente (já autorizado), do mais novo
+    para o mais antigo, desempatados pelo id.
+
+    `has_more` vem de uma leitura de `limit + 1` itens; a próxima página é
+    pedida com `before=next_before` e `before_id=next_before_id`. Sem
+    `before_id`, o cursor exclui todo o instante `before`. O total,
+    consistente com os filtros de data, só é calculado com `include_total`.
+    Com `fields`, carrega e serializa apenas os campos selecionados.
+    """
+    start = datetime.combine(date_from, datetime.min.time()) if date_from else None
+    end = datetime.combine(date_to, datetime.max.time()) if date_to else None
+
+    # The cursor is exclusive; windows are inclusive down to the microsecond
+    page_end = end
+    cursor = None
+    if before:
+        if before_id is None:
+            cursor_end = before - timedelta(microseconds=1)
+        else:
+            cursor_end = before
+            cursor = (before, before_id)
+        page_end = min(end, cursor_end) if end else cursor_end
+
+    vitals = await vital_partitions.fetch_vitals(
+        db, patient_id, start=start, end=page_end, descending=True, limit=limit + 1,
+        columns=fields.names if fields else None, before=cursor,
+    )
+
+    has_more = len(vitals) > limit
+    vitals = vitals[:limit]
+    next_before = vitals[-1].recorded_at if has_more else None
+    next_before_id = vitals[-1].id if has_more else None
+
+    total = await vital_counters.count_window(db, patient_id, start, end) if include_total else None
+
+    if fields:
+        return fields.response(
+            vitals,
+            total=total,
+            has_more=has_more,
+            next_before=next_before.isoformat() if next_before else None,
+            next_before_id=next_before_id,
+        )
+
+    return VitalSignListResponse(
+        items=[VitalSignResponse.model_validate(v) for v in vitals],
+        total=total,
+        has_more=has_more,
+        next_before=next_before,
+        next_before_id=next_before_id,
+    )
+
+
+async def load_vital_stats(db: AsyncSession, patient_id: int, days: int) -> VitalStatsResponse:
+    """Estatísticas dos últimos `days` dias do paciente (já autorizado)."""
+    date_threshold = datetime.utcnow() - timedelta(days=days)
+
+    stats = await vital_partitions.vital_stats(db, patient_id, start=date_threshold)
+
+    # Percentiles come from merged daily sketches (whole UTC days)
+    percentiles = await quantile_sketches.window_percentiles(db, patient_id, date_threshold.date())
+
+    return _stats_response(stats, percentiles)
+
+
+def _vitals_scope(patient_id: int) -> tuple:
+    return ("vitals", patient_id)
+
+
+async def load_vital_chart(db: AsyncSession, patient_id: int, days: int) -> VitalChartData:
+    """
+    Dados de gráfico dos últimos `days` dias do paciente (já autorizado).
+
+    O resultado fica no cache compartilhado entre workers por
+    `VITAL_CHART_CACHE_TTL_SECONDS` e é invalidado por novos registros.
+    """
+    scope = _vitals_scope(patient_id)
+    key = ("vital_chart", patient_id, days)
+    cached = shared_cache.get(key, scope)
+    if cached is not None:
+        return VitalChartData.model_validate_json(cached)
+
+    generation = shared_cache.generation(scope)
+    chart = await _build_vital_chart(db, patient_id, days)
+    shared_cache.put(
+        key, scope, chart.model_dump_json(), settings.VITAL_CHART_CACHE_TTL_SECONDS, generation
+    )
+    return chart
+
+
+async def _build_vital_chart(db: AsyncSession, patient_id: int, days: int) -> VitalChartData:
+    date_threshold = datetime.utcnow() - timedelta(days=days)
+
+    timestamps, series = await vital_partitions.fetch_series(
+        db, patient_id, CHART_METRICS, start=date_threshold
+    )
+
+    # "dd/mm" labels from the ISO dates
+    labels = [f"{d[8:10]}/{d[5:7]}" for d in np.datetime_as_string(timestamps, unit="D").tolist()]
+
+    def points(values: np.ndarray, mask: np.ndarray) -> list[ChartDataPoint]:
+        return [
+            ChartDataPoint(name=labels[i], value=v)
+            for i, v in zip(np.flatnonzero(mask).tolist(), values[mask].tolist())
+        ]
+
+    # Missing (NaN) and zero readings are left out of the charts
+    present = {metric: np.nan_to_num(values) != 0 for metric, values in series.items()}
+
+    heart_rate_data = points(series["heart_rate"], present["heart_rate"])
+    # Use systolic for the chart, could be expanded
+    blood_pressure_data = points(
+        series["systolic_pressure"],
+        present["systolic_pressure"] & present["diastolic_pressure"],
+    )
+    temperature_data = points(series["temperature"], present["temperature"])
+    oxygen_data = points(series["oxygen_saturation"], present["oxygen_saturation"])
+
+    return VitalChartData(
+        heart_rate=heart_rate_data,
+        blood_pressure=blood_pressure_data,
+        temperature=temperature_data,
+        oxygen_saturation=oxygen_data,
+    )
+
 
 @router.get("/{patient_id}", response_model=VitalSignListResponse)
 async def list_patient_vitals(
-    patient_id: int,
+    patient_id: OwnedPatientId,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
     limit: int = Query(100, ge=1, le=500),
+    before: Optional[datetime] = Query(
+        None, description="Cursor: retorna leituras anteriores a este instante (`next_before`)"
+    ),
+    before_id: Optional[int] = Query(
+        None, description="Desempate do cursor: id da última leitura da página (`next_before_id`)"
+    ),
+    include_total: bool = Query(False, description="Inclui o total de leituras do período"),
+    fields: Annotated[Optional[Fieldset], Depends(SparseFields(VitalSignResponse))] = None,
 ) -> VitalSignListResponse:
     """
     Lista sinais vitais de um paciente.
@@ -44,57 +239,27 @@ async def list_patient_vitals(
         date_from: Data inicial
         date_to: Data final
         limit: Quantidade máxima de resultados
+        before: Cursor de continuação (`next_before` da página anterior)
+        before_id: Desempate do cursor (`next_before_id` da página anterior)
+        include_total: Calcula o total de leituras entre `date_from` e `date_to`
+        fields: Campos a retornar em cada item (padrão: todos)
 
     Returns:
         VitalSignListResponse: Lista de sinais vitais
 
     Raises:
-        HTTPException: Se o paciente não for encontrado
+        HTTPException: Se o paciente não for encontrado ou um campo for inválido
     """
-    # Verify patient belongs to doctor
-    patient_result = await db.execute(
-        select(Patient).where(
-            Patient.id == patient_id,
-            Patient.doctor_id == current_user.id
-        )
-    )
-    patient = patient_result.scalar_one_or_none()
-
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
-
-    query = select(VitalSign).where(VitalSign.patient_id == patient_id)
-
-    if date_from:
-        query = query.where(VitalSign.recorded_at >= datetime.combine(date_from, datetime.min.time()))
-
-    if date_to:
-        query = query.where(VitalSign.recorded_at <= datetime.combine(date_to, datetime.max.time()))
-
-    query = query.order_by(VitalSign.recorded_at.desc()).limit(limit)
-
-    result = await db.execute(query)
-    vitals = result.scalars().all()
-
-    # Count total
-    count_query = select(func.count(VitalSign.id)).where(VitalSign.patient_id == patient_id)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    return VitalSignListResponse(
-        items=[VitalSignResponse.model_validate(v) for v in vitals],
-        total=total,
+    return await load_vital_list(
+        db, patient_id, date_from, date_to, limit, fields, before, include_total, before_id
     )
 
 
 @router.get("/{patient_id}/stats", response_model=VitalStatsResponse)
 async def get_patient_vital_stats(
-    patient_id: int,
+    patient_id: OwnedPatientId,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     days: int = Query(30, ge=1, le=365),
 ) -> VitalStatsResponse:
     """
@@ -112,57 +277,14 @@ async def get_patient_vital_stats(
     Raises:
         HTTPException: Se o paciente não for encontrado
     """
-    # Verify patient belongs to doctor
-    patient_result = await db.execute(
-        select(Patient).where(
-            Patient.id == patient_id,
-            Patient.doctor_id == current_user.id
-        )
-    )
-    patient = patient_result.scalar_one_or_none()
-
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
-
-    date_threshold = datetime.utcnow() - timedelta(days=days)
-
-    stats_result = await db.execute(
-        select(
-            func.avg(VitalSign.heart_rate).label("avg_heart_rate"),
-            func.avg(VitalSign.systolic_pressure).label("avg_systolic"),
-            func.avg(VitalSign.diastolic_pressure).label("avg_diastolic"),
-            func.avg(VitalSign.temperature).label("avg_temperature"),
-            func.avg(VitalSign.oxygen_saturation).label("avg_oxygen"),
-            func.min(VitalSign.heart_rate).label("min_heart_rate"),
-            func.max(VitalSign.heart_rate).label("max_heart_rate"),
-            func.count(VitalSign.id).label("total_records"),
-        ).where(
-            VitalSign.patient_id == patient_id,
-            VitalSign.recorded_at >= date_threshold
-        )
-    )
-    stats = stats_result.one()
-
-    return VitalStatsResponse(
-        avg_heart_rate=round(stats.avg_heart_rate, 1) if stats.avg_heart_rate else None,
-        avg_systolic=round(stats.avg_systolic, 1) if stats.avg_systolic else None,
-        avg_diastolic=round(stats.avg_diastolic, 1) if stats.avg_diastolic else None,
-        avg_temperature=round(stats.avg_temperature, 2) if stats.avg_temperature else None,
-        avg_oxygen=round(stats.avg_oxygen, 1) if stats.avg_oxygen else None,
-        min_heart_rate=stats.min_heart_rate,
-        max_heart_rate=stats.max_heart_rate,
-        total_records=stats.total_records,
-    )
+    return await load_vital_stats(db, patient_id, days)
 
 
 @router.get("/{patient_id}/chart", response_model=VitalChartData)
 async def get_patient_vital_chart_data(
-    patient_id: int,
+    patient_id: OwnedPatientId,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     days: int = Query(30, ge=1, le=365),
 ) -> VitalChartData:
     """
@@ -180,61 +302,81 @@ async def get_patient_vital_chart_data(
     Raises:
         HTTPException: Se o paciente não for encontrado
     """
-    # Verify patient belongs to doctor
-    patient_result = await db.execute(
-        select(Patient).where(
-            Patient.id == patient_id,
-            Patient.doctor_id == current_user.id
-        )
-    )
-    patient = patient_result.scalar_one_or_none()
+    return await load_vital_chart(db, patient_id, days)
 
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
 
-    date_threshold = datetime.utcnow() - timedelta(days=days)
+@router.post("/batch", response_model=VitalBatchResponse)
+async def get_vitals_batch(
+    batch: VitalBatchRequest,
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+) -> VitalBatchResponse:
+    """
+    Retorna estatísticas e sparklines de vários pacientes de uma vez.
 
-    result = await db.execute(
-        select(VitalSign)
-        .where(
-            VitalSign.patient_id == patient_id,
-            VitalSign.recorded_at >= date_threshold
-        )
-        .order_by(VitalSign.recorded_at)
-    )
-    vitals = result.scalars().all()
+    Usa um número constante de consultas, independente da quantidade de
+    pacientes: estatísticas agrupadas por paciente, percentis dos sketches
+    e uma única leitura das séries da janela.
 
-    heart_rate_data = []
-    blood_pressure_data = []
-    temperature_data = []
-    oxygen_data = []
+    Args:
+        batch: IDs dos pacientes, período em dias e pontos por sparkline
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
 
-    for vital in vitals:
-        date_str = vital.recorded_at.strftime("%d/%m")
+    Returns:
+        VitalBatchResponse: Estatísticas e sparklines por paciente
 
-        if vital.heart_rate:
-            heart_rate_data.append(ChartDataPoint(name=date_str, value=vital.heart_rate))
+    Raises:
+        HTTPException: Se algum paciente não for encontrado
+    """
+    patient_ids = list(dict.fromkeys(batch.patient_ids))
 
-        if vital.systolic_pressure and vital.diastolic_pressure:
-            # Use systolic for the chart, could be expanded
-            blood_pressure_data.append(
-                ChartDataPoint(name=date_str, value=vital.systolic_pressure)
-            )
+    # Verify all patients belong to doctor
+    await verify_patient_ownership(db, current_user, patient_ids)
 
-        if vital.temperature:
-            temperature_data.append(ChartDataPoint(name=date_str, value=vital.temperature))
+    date_to = datetime.utcnow()
+    date_from = date_to - timedelta(days=batch.days)
 
-        if vital.oxygen_saturation:
-            oxygen_data.append(ChartDataPoint(name=date_str, value=vital.oxygen_saturation))
+    stats = await vital_partitions.batch_vital_stats(db, patient_ids, start=date_from, end=date_to)
+    percentiles = await quantile_sketches.batch_window_percentiles(db, patient_ids, date_from.date())
 
-    return VitalChartData(
-        heart_rate=heart_rate_data,
-        blood_pressure=blood_pressure_data,
-        temperature=temperature_data,
-        oxygen_saturation=oxygen_data,
+    row_patients, row_days, series = await vital_partitions.fetch_patients_series(
+        db, patient_ids, CHART_METRICS, date_from, date_to
+    )
+
+    # Map each row to the position of its patient in the request
+    order = np.array(patient_ids, dtype=np.int64)
+    sorter = np.argsort(order)
+    index = sorter[np.searchsorted(order, row_patients, sorter=sorter)]
+    relative_days = row_days - (date_from - datetime(1970, 1, 1)) / timedelta(days=1)
+
+    sparklines = {
+        metric: cohort_analytics.bucket_means(
+            index, relative_days, values, len(patient_ids), batch.days, batch.points
+        )
+        for metric, values in series.items()
+    }
+    decimals = {"temperature": 2}
+
+    items = []
+    for i, patient_id in enumerate(patient_ids):
+        items.append(VitalBatchItem(
+            patient_id=patient_id,
+            stats=_stats_response(stats[patient_id], percentiles[patient_id]),
+            sparklines={
+                metric: [
+                    None if np.isnan(v) else round(v, decimals.get(metric, 1))
+                    for v in means[i].tolist()
+                ]
+                for metric, means in sparklines.items()
+            },
+        ))
+
+    return VitalBatchResponse(
+        date_from=date_from,
+        date_to=date_to,
+        points=batch.points,
+        items=items,
     )
 
 
@@ -242,7 +384,7 @@ async def get_patient_vital_chart_data(
 async def create_vital_sign(
     request: VitalSignCreate,
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
 ) -> VitalSign:
     """
     Registra novos sinais vitais para um paciente.
@@ -259,19 +401,7 @@ async def create_vital_sign(
         HTTPException: Se o paciente não for encontrado
     """
     # Verify patient belongs to doctor
-    patient_result = await db.execute(
-        select(Patient).where(
-            Patient.id == request.patient_id,
-            Patient.doctor_id == current_user.id
-        )
-    )
-    patient = patient_result.scalar_one_or_none()
-
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
+    await verify_patient_ownership(db, current_user, [request.patient_id])
 
     vital_sign = VitalSign(
         recorded_by=current_user.id,
@@ -282,13 +412,23 @@ async def create_vital_sign(
     await db.commit()
     await db.refresh(vital_sign)
 
+    shared_cache.invalidate(_vitals_scope(vital_sign.patient_id))
+    invalidate_dashboard(current_user.id)
+
+    # Baselines, anomaly events and sketches are updated off the request path
+    await job_queue.enqueue(
+        "vitals.ingested",
+        vital_sign.patient_id,
+        {"vital_sign_id": vital_sign.id, "doctor_id": current_user.id},
+    )
+
     return vital_sign
 
 
 @router.get("/alerts/critical", response_model=list[VitalSignResponse])
 async def get_critical_vitals(
     current_user: CurrentDoctor,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
     hours: int = Query(24, ge=1, le=168),
 ) -> list[VitalSignResponse]:
     """
@@ -308,37 +448,56 @@ async def get_critical_vitals(
     Returns:
         list[VitalSignResponse]: Sinais vitais críticos
     """
-    from sqlalchemy import or_
-
     time_threshold = datetime.utcnow() - timedelta(hours=hours)
 
-    # Get patient IDs for this doctor
-    patient_ids_result = await db.execute(
-        select(Patient.id).where(Patient.doctor_id == current_user.id)
+    result = await db.execute(
+        CRITICAL_VITALS_QUERY, {"doctor_id": current_user.id, "since": time_threshold}
     )
-    patient_ids = [p for p in patient_ids_result.scalars().all()]
+    vitals = result.scalars().all()
 
-    if not patient_ids:
-        return []
+    return [VitalSignResponse.model_validate(v) for v in vitals]
 
-    result = await db.execute(
-        select(VitalSign)
+
+@router.get("/alerts/anomalies", response_model=list[VitalAnomalyResponse])
+async def list_vital_anomalies(
+    current_user: CurrentDoctor,
+    db: Annotated[AsyncSession, Depends(get_shard_db)],
+    hours: int = Query(24, ge=1, le=720),
+    patient_id: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+) -> list[VitalAnomalyResponse]:
+    """
+    Lista anomalias detectadas em relação à linha de base de cada paciente.
+
+    As anomalias são calculadas na ingestão (ver `anomaly_detection`);
+    esta rota apenas consulta os eventos já registrados.
+
+    Args:
+        current_user: Médico autenticado
+        db: Sessão do banco de dados
+        hours: Período em horas para buscar anomalias
+        patient_id: Filtro por paciente
+        limit: Quantidade máxima de resultados
+
+    Returns:
+        list[VitalAnomalyResponse]: Anomalias mais recentes primeiro
+    """
+    time_threshold = datetime.utcnow() - timedelta(hours=hours)
+
+    query = (
+        select(VitalAnomaly)
+        .join(Patient, Patient.id == VitalAnomaly.patient_id)
         .where(
-            VitalSign.patient_id.in_(patient_ids),
-            VitalSign.recorded_at >= time_threshold,
-            or_(
-                VitalSign.heart_rate < 50,
-                VitalSign.heart_rate > 120,
-                VitalSign.systolic_pressure < 90,
-                VitalSign.systolic_pressure > 180,
-                VitalSign.temperature < 35,
-                VitalSign.temperature > 39,
-                VitalSign.oxygen_saturation < 90,
-            )
+            Patient.doctor_id == current_user.id,
+            VitalAnomaly.detected_at >= time_threshold,
         )
-        .order_by(VitalSign.recorded_at.desc())
-        .limit(50)
     )
-    vitals = result.scalars().all()
 
-    return [VitalSignResponse.model_validate(v) for v in vitals]
+    if patient_id:
+        query = query.where(VitalAnomaly.patient_id == patient_id)
+
+    result = await db.execute(
+        query.order_by(VitalAnomaly.detected_at.desc()).limit(limit)
+    )
+
+    return [VitalAnomalyResponse.model_validate(a) for a in result.scalars().all()]
@@ -0,0 +1,209 @@
+"""
+Vita - Startup Warm-up
+Fase de aquecimento executada na inicialização de cada processo, antes de
+aceitar requisições:
+
+- abre as conexões do pool (`STARTUP_POOL_CONNECTIONS`);
+- percorre as rotas de leitura mais usadas pela aplicação ASGI completa
+  (middlewares, dependências, consultas e serialização), com um médico
+  sentinela que não existe no banco. As consultas voltam vazias, mas o SQL
+  de cada uma fica no cache de compilação do engine;
+- gera o esquema OpenAPI.
+
+Assim a primeira requisição real de um processo recém-iniciado já encontra
+o mesmo estado das seguintes. `StartupTimings` mede cada fase da
+inicialização.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.api.deps import get_current_user, get_owned_patient_id, load_principal
+from app.core.config import settings
+from app.db.database import async_session_maker, shard_router
+from app.models import User, UserRole
+from app.services.patient_ownership import ownership_cache
+
+# IDs are autoincrement from 1, so the sentinel never matches a real row
+WARMUP_ID = 0
+
+WARMUP_ROUTES = (
+    "/api/dashboard/stats",
+    "/api/patients",
+    f"/api/patients/{WARMUP_ID}",
+    "/api/appointments",
+    "/api/appointments/today",
+    "/api/appointments/upcoming",
+    "/api/appointments/calendar",
+    f"/api/vitals/{WARMUP_ID}",
+    f"/api/vitals/{WARMUP_ID}/stats",
+    f"/api/vitals/{WARMUP_ID}/chart",
+    "/api/vitals/alerts/critical",
+    "/api/vitals/alerts/anomalies",
+    "/api/changes",
+    "/api/auth/me",
+)
+
+
+class StartupTimings:
+    """Duração de cada fase da inicialização, em milissegundos."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (time.perf_counter() - started) * 1000
+
+    def snapshot(self) -> dict:
+        return {
+            "phases_ms": {name: round(ms, 1) for name, ms in self.phases.items()},
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 1),
+        }
+
+    def report(self) -> str:
+        snapshot = self.snapshot()
+        phases = " · ".join(f"{name} {ms:.0f} ms" for name, ms in snapshot["phases_ms"].items())
+        return f"{phases} (total {snapshot['total_ms']:.0f} ms)"
+
+
+def _warmup_principal() -> User:
+    now = datetime.utcnow()
+    return User(
+        id=WARMUP_ID,
+        email="warmup@vita.med.br",
+        full_name="Warm-up",
+        role=UserRole.DOCTOR,
+        is_active=True,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+async def open_pool() -> int:
+    """
+    Abre em paralelo as conexões do pool de cada shard e executa uma
+    consulta em cada.
+
+    Returns:
+        int: Número de conexões abertas
+    """
+    connections = await asyncio.gather(*(
+        shard_engine.connect()
+        for shard_engine in shard_router.engines
+        for _ in range(min(settings.STARTUP_POOL_CONNECTIONS, shard_engine.pool.size()))
+    ))
+    try:
+        for conn in connections:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            await conn.close()
+    return len(connections)
+
+
+async def _request(app: FastAPI, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"warmup"), (b"authorization", b"Bearer warmup")],
+        "client": ("warmup", 0),
+        "server": ("warmup", 80),
+    }
+    received = False
+    status = 0
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm_routes(app: FastAPI) -> int:
+    """
+    Executa as rotas de `WARMUP_ROUTES` como o médico sentinela.
+
+    A autenticação e a verificação de propriedade do paciente são
+    substituídas só durante o aquecimento; as consultas que elas fazem
+    (usuário do token e pacientes do médico) são executadas à parte.
+
+    Args:
+        app: Aplicação FastAPI
+
+    Returns:
+        int: Número de rotas que responderam sem erro de servidor
+    """
+    principal = _warmup_principal()
+
+    async def warmup_user() -> User:
+        return principal
+
+    async def warmup_patient_id(patient_id: int) -> int:
+        return patient_id
+
+    async with async_session_maker() as db:
+        await load_principal(db, WARMUP_ID)
+        await ownership_cache.owns(db, WARMUP_ID, [WARMUP_ID])
+
+    app.dependency_overrides[get_current_user] = warmup_user
+    app.dependency_overrides[get_owned_patient_id] = warmup_patient_id
+    warmed = 0
+    try:
+        for path in WARMUP_ROUTES:
+            try:
+                status = await _request(app, path)
+            except Exception as exc:
+                print(f"⚠️  Aquecimento de {path} falhou: {exc!r}")
+                continue
+            if status >= 500:
+                print(f"⚠️  Aquecimento de {path} respondeu {status}")
+                continue
+            warmed += 1
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        app.dependency_overrides.pop(get_owned_patient_id, None)
+    return warmed
+
+
+async def warm_up(app: FastAPI, timings: StartupTimings) -> None:
+    """
+    Executa as fases de aquecimento, registrando a duração de cada uma.
+
+    Args:
+        app: Aplicação FastAPI
+        timings: Medidor das fases da inicialização
+    """
+    with timings.phase("pool"):
+        await open_pool()
+    with timings.phase("rotas"):
+        await warm_routes(app)
+    with timings.phase("openapi"):
+        app.openapi()
@@ -0,0 +1,260 @@
+"""
+Vita - Admission Control
+Controle de admissão e descarte de carga por médico.
+
+Cada requisição para `/api` é classificada em uma classe de rota e passa
+por um token bucket da dupla (médico, classe). Quem excede a taxa recebe
+429 com `Retry-After`. Consultas caras (janelas longas, analytics, lotes)
+também disputam um número limitado de vagas concorrentes por processo;
+se a espera na fila passar do orçamento, a requisição é descartada com
+503 e `Retry-After`, protegendo a latência das demais.
+
+Todo o estado fica em memória do processo.
+"""
+
+import asyncio
+import json
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+from app.core.security import verify_token
+
+ROUTE_CLASSES = ("read", "search", "write", "expensive")
+
+# Routes whose cost grows with the `days` window
+WINDOWED_ROUTES = re.compile(r"^/api/(vitals/\d+(/stats|/chart)?|patients/\d+/overview)$")
+EXPENSIVE_PREFIXES = ("/api/analytics/", "/api/vitals/batch")
+SAFE_METHODS = ("GET", "HEAD")
+
+MAX_BUCKETS = 10_000
+
+
+class TokenBucket:
+    """Token bucket com reabastecimento contínuo."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """
+        Consome um token.
+
+        Returns:
+            float: 0 se admitido, ou segundos até haver um token
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+@lru_cache(maxsize=4096)
+def _token_subject(token: str) -> Optional[str]:
+    payload = verify_token(token, token_type="access")
+    return str(payload["sub"]) if payload and payload.get("sub") else None
+
+
+def _limits(route_class: str) -> tuple[float, float]:
+    prefix = f"ADMISSION_{route_class.upper()}"
+    return getattr(settings, f"{prefix}_RATE"), getattr(settings, f"{prefix}_BURST")
+
+
+class AdmissionController:
+    """Limites por médico/classe de rota e vagas para consultas caras."""
+
+    def __init__(self):
+        # Least recently used first; capped at MAX_BUCKETS
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        self._expensive: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self.metrics: Counter = Counter()
+
+    # ============== Classification ==============
+
+    def classify(self, method: str, path: str, query_string: bytes) -> str:
+        """Classe de rota da requisição."""
+        if path.startswith(EXPENSIVE_PREFIXES):
+            return "expensive"
+
+        # Batch envelopes only carry reads; each sub-request is admitted on its own
+        if path == "/api/batch":
+            return "read"
+
+        if method not in SAFE_METHODS:
+            return "write"
+
+        query = parse_qs(query_string.decode("latin-1")) if query_string else {}
+
+        if WINDOWED_ROUTES.match(path):
+            days = query.get("days", ["0"])[0]
+            if days.isdigit() and int(days) >= settings.ADMISSION_EXPENSIVE_DAYS:
+                return "expensive"
+
+        if path == "/api/patients" and query.get("search"):
+            return "search"
+
+        return "read"
+
+    def identity(self, scope: dict) -> str:
+        """Médico autenticado (pelo token) ou, na falta dele, o IP do cliente."""
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    subject = _token_subject(token)
+                    if subject:
+                        return f"user:{subject}"
+                break
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    # ============== Rate limiting ==============
+
+    def check_rate(self, identity: str, route_class: str) -> float:
+        """
+        Aplica o token bucket da dupla (identidade, classe).
+
+        Returns:
+            float: 0 se admitido, ou segundos sugeridos para `Retry-After`
+        """
+        rate, burst = _limits(route_class)
+        now = time.monotonic()
+        key = (identity, route_class)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # The idlest buckets are the likeliest to be full again anyway
+            while len(self._buckets) >= MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+        else:
+            self._buckets.move_to_end(key)
+
+        return bucket.take(rate, burst, now)
+
+    # ============== Concurrency ==============
+
+    async def acquire_expensive(self) -> bool:
+        """
+        Aguarda uma vaga para consulta cara dentro do orçamento de espera.
+
+        Returns:
+            bool: True se a vaga foi obtida (liberar com `release_expensive`)
+        """
+        if self._expensive is None:
+            self._expensive = asyncio.Semaphore(settings.ADMISSION_EXPENSIVE_CONCURRENCY)
+
+        if self._expensive.locked():
+            self.metrics["queued"] += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    self._expensive.acquire(), settings.ADMISSION_QUEUE_BUDGET_MS / 1000
+                )
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.metrics["queue_wait_ms"] += int((time.monotonic() - started) * 1000)
+        else:
+            await self._expensive.acquire()
+
+        self._in_flight += 1
+        return True
+
+    def release_expensive(self) -> None:
+        self._in_flight -= 1
+        self._expensive.release()
+
+    def snapshot(self) -> dict:
+        """Métricas acumuladas desde a inicialização do processo."""
+        return {
+            "admitted": self.metrics["admitted"],
+            "rejected_rate_limited": {
+                route_class: self.metrics[f"rate_limited:{route_class}"]
+                for route_class in ROUTE_CLASSES
+            },
+            "rejected_overloaded": self.metrics["overloaded"],
+            "queued": self.metrics["queued"],
+            "queue_wait_ms_total": self.metrics["queue_wait_ms"],
+            "expensive_in_flight": self._in_flight,
+            "tracked_buckets": len(self._buckets),
+        }
+
+
+admission = AdmissionController()
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica o `AdmissionController` às rotas `/api`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or not settings.ADMISSION_ENABLED
+            or not path.startswith("/api/")
+            or scope["method"] == "OPTIONS"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = admission.classify(scope["method"], path, scope.get("query_string", b""))
+        retry_after = admission.check_rate(admission.identity(scope), route_class)
+
+        if retry_after:
+            admission.metrics[f"rate_limited:{route_class}"] += 1
+            await _reject(
+                send, 429, "Muitas requisições, tente novamente em instantes", retry_after
+            )
+            return
+
+        if route_class != "expensive":
+            admission.metrics["admitted"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        if not await admission.acquire_expensive():
+            admission.metrics["overloaded"] += 1
+            await _reject(
+                send,
+                503,
+                "Servidor sobrecarregado, tente novamente em instantes",
+                settings.ADMISSION_QUEUE_BUDGET_MS / 1000,
+            )
+            return
+
+        admission.metrics["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release_expensive()
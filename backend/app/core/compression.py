@@ -0,0 +1,289 @@
+"""
+Vita - Response Compression
+Compressão de respostas negociada via `Accept-Encoding`.
+
+Codificações suportadas, em ordem de preferência do servidor: zstd, br e
+gzip. Brotli e Zstandard são dependências opcionais; sem elas o
+middleware negocia apenas gzip.
+
+- Corpos menores que `COMPRESSION_MIN_SIZE` são enviados sem compressão.
+- Respostas completas (não streaming) passam por um cache LRU de bytes
+  já comprimidos, indexado por codificação e hash do corpo, de modo que
+  payloads repetidos (mesmo gráfico, mesma listagem) não são comprimidos
+  de novo.
+- `StreamingResponse` é comprimida incrementalmente, com flush a cada
+  bloco para que o cliente receba os dados conforme são produzidos.
+"""
+
+import asyncio
+import hashlib
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# Payloads above this size are compressed in a worker thread
+THREAD_THRESHOLD = 256 * 1024
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Codificações disponíveis neste processo, da preferida para a menos."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe a codificação a partir do header `Accept-Encoding`.
+
+    Returns:
+        Optional[str]: Codificação escolhida, ou None para identidade
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(encoding, wildcard), -rank, encoding)
+        for rank, encoding in enumerate(available_encodings())
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+class StreamCompressor:
+    """Compressor incremental com a mesma interface para as três codificações."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zstandard.ZstdCompressor(
+                level=settings.COMPRESSION_ZSTD_LEVEL
+            ).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """Comprime um bloco e descarrega o que já pode ser enviado."""
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    """Comprime um corpo completo."""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+
+class CompressedBodyCache:
+    """LRU de corpos comprimidos, limitado pelo total de bytes guardados."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[tuple[str, bytes], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, encoding: str, body: bytes) -> bytes:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        compressed = compress(encoding, body)
+
+        limit = settings.COMPRESSION_CACHE_MAX_BYTES
+        if len(compressed) <= limit // 8:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = compressed
+                    self._size += len(compressed)
+                while self._size > limit:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+
+        return compressed
+
+
+compressed_cache = CompressedBodyCache()
+
+
+def _header(headers: list, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _is_compressible(headers: list) -> bool:
+    if _header(headers, b"content-encoding") is not None:
+        return False
+    content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _with_encoding(headers: list, encoding: str, length: Optional[int]) -> list:
+    headers = [
+        (key, value) for key, value in headers
+        if key.lower() not in (b"content-length", b"content-encoding")
+    ]
+    headers.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode()))
+
+    vary = _header(headers, b"vary")
+    if vary is None:
+        headers.append((b"vary", b"Accept-Encoding"))
+    elif b"accept-encoding" not in vary.lower():
+        headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+        headers.append((b"vary", vary + b", Accept-Encoding"))
+
+    return headers
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compressão negociada."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = negotiate(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    """Intercepta as mensagens de resposta e decide se/como comprimir."""
+
+    def __init__(self, send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start: Optional[dict] = None
+        self.passthrough = False
+        self.buffer = bytearray()
+        self.stream: Optional[StreamCompressor] = None
+
+    async def __call__(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = list(message.get("headers", []))
+            self.passthrough = message["status"] in (204, 304) or not _is_compressible(headers)
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            await self._send_chunk(self.stream.compress(body) if body else b"", more_body)
+            return
+
+        self.buffer.extend(body)
+
+        if not more_body:
+            await self._send_complete(bytes(self.buffer))
+            return
+
+        # Streaming: wait until the threshold is reached before committing
+        if len(self.buffer) >= settings.COMPRESSION_MIN_SIZE:
+            self.stream = StreamCompressor(self.encoding)
+            await self.send({
+                **self.start,
+                "headers": _with_encoding(list(self.start.get("headers", [])), self.encoding, None),
+            })
+            chunk = self.stream.compress(bytes(self.buffer))
+            self.buffer.clear()
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def _send_chunk(self, chunk: bytes, more_body: bool) -> None:
+        if not more_body:
+            chunk += self.stream.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_complete(self, body: bytes) -> None:
+        if len(body) < settings.COMPRESSION_MIN_SIZE:
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        if len(body) >= THREAD_THRESHOLD:
+            compressed = await asyncio.to_thread(
+                compressed_cache.get_or_compress, self.encoding, body
+            )
+        else:
+            compressed = compressed_cache.get_or_compress(self.encoding, body)
+
+        headers = _with_encoding(list(self.start.get("headers", [])), self.encoding, len(compressed))
+        await self.send({**self.start, "headers": headers})
+        await self.send({"type": "http.response.body", "body": compressed})
@@ -4,7 +4,7 @@ Configurações centralizadas da aplicação usando Pydantic Settings.
 """
 
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -32,8 +32,27 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # Production server (serve.py)
+    WORKERS: Optional[int] = None  # padrão: núcleos disponíveis
+    WORKER_MAX_MEMORY_MB: int = 1024  # 0 desativa
+    WORKER_MAX_LIFETIME_SECONDS: int = 6 * 3600  # 0 desativa
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS: int = 30
+
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./vita.db"
+    DB_STATEMENT_CACHE_SIZE: int = 1200  # SQL compilado (SQLAlchemy); 0 desativa
+    DB_DRIVER_STATEMENT_CACHE_SIZE: int = 256  # statements preparados por conexão (sqlite3)
+
+    # Database sharding (um arquivo SQLite por shard; o shard 0 é DATABASE_URL)
+    SHARD_COUNT: int = 1  # 1 desativa
+    SHARD_URL_TEMPLATE: str = "sqlite+aiosqlite:///./vita-shard-{shard}.db"
+    SHARD_ID_URL: Optional[str] = None  # padrão: DATA_DIR/shard-ids.db
+    SHARD_ID_BLOCK_SIZE: int = 1000
+    SHARD_MAP_CACHE_TTL_SECONDS: int = 300
+
+    # Startup warm-up (pool, rotas de leitura e OpenAPI antes da primeira requisição)
+    STARTUP_WARMUP_ENABLED: bool = True
+    STARTUP_POOL_CONNECTIONS: int = 5
 
     # Security
     SECRET_KEY: str = "vita-secret-key-change-in-production-2024"
@@ -54,6 +73,104 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
 
+    # Admission control (token buckets por médico e classe de rota)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_READ_RATE: float = 20.0
+    ADMISSION_READ_BURST: int = 60
+    ADMISSION_SEARCH_RATE: float = 5.0
+    ADMISSION_SEARCH_BURST: int = 15
+    ADMISSION_WRITE_RATE: float = 10.0
+    ADMISSION_WRITE_BURST: int = 30
+    ADMISSION_EXPENSIVE_RATE: float = 1.0
+    ADMISSION_EXPENSIVE_BURST: int = 5
+    ADMISSION_EXPENSIVE_DAYS: int = 180
+    ADMISSION_EXPENSIVE_CONCURRENCY: int = 4
+    ADMISSION_QUEUE_BUDGET_MS: int = 2000
+
+    # Response compression (gzip/br/zstd)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # Idempotency-Key (respostas guardadas das rotas de criação)
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_MAX_BYTES: int = 16 * 1024 * 1024
+    IDEMPOTENCY_SWEEP_SECONDS: int = 60
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # execução em andamento (após isso, outra tentativa assume)
+    IDEMPOTENCY_POLL_SECONDS: float = 0.05  # espera por uma execução em outro worker
+
+    # Cache compartilhado entre workers (arquivo mapeado em memória)
+    SHARED_CACHE_ENABLED: bool = True
+    SHARED_CACHE_PATH: Optional[str] = None  # padrão: DATA_DIR/shared-cache.bin
+    SHARED_CACHE_SMALL_SLOTS: int = 16384  # slots de 1 KiB
+    SHARED_CACHE_LARGE_SLOTS: int = 512  # slots de 64 KiB
+
+    # Patient ownership cache
+    PATIENT_OWNERSHIP_TTL_SECONDS: int = 300
+
+    # Principal (usuário autenticado), dashboard e gráficos
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    VITAL_CHART_CACHE_TTL_SECONDS: int = 60
+
+    # Appointment calendar counts cache (por médico/mês)
+    APPOINTMENT_CALENDAR_TTL_SECONDS: int = 300
+
+    # Storage
+    DATA_DIR: str = "./data"
+
+    # Vital signs retention (partições mensais)
+    VITALS_HOT_RETENTION_MONTHS: int = 12
+    VITALS_RETENTION_INTERVAL_HOURS: int = 24
+
+    # Vital signs compaction (leituras brutas antigas → agregados por minuto/hora)
+    VITALS_COMPACTION_ENABLED: bool = True
+    VITALS_COMPACTION_MINUTE_AFTER_DAYS: int = 30  # 0 desativa o nível
+    VITALS_COMPACTION_HOUR_AFTER_DAYS: int = 180  # 0 desativa o nível
+    VITALS_COMPACTION_CHUNK_ROWS: int = 2000
+    VITALS_COMPACTION_PAUSE_SECONDS: float = 0.05
+    VITALS_COMPACTION_INTERVAL_HOURS: int = 6
+
+    # Database maintenance (PRAGMA optimize, ANALYZE, checkpoints, vacuum incremental)
+    DB_MAINTENANCE_ENABLED: bool = True
+    DB_MAINTENANCE_INTERVAL_MINUTES: int = 60  # optimize + checkpoint passivo
+    DB_MAINTENANCE_STARTUP_DELAY_SECONDS: int = 300  # após retenção e compactação iniciais
+    DB_MAINTENANCE_BUSY_TIMEOUT_MS: int = 30000
+    DB_MAINTENANCE_LOCK_RETRIES: int = 3
+    DB_MAINTENANCE_WINDOW_START_HOUR: int = 2  # janela de baixo tráfego (UTC)
+    DB_MAINTENANCE_WINDOW_END_HOUR: int = 5
+    DB_MAINTENANCE_IDLE_REQUESTS_PER_MINUTE: float = 30.0  # por worker
+    DB_MAINTENANCE_VACUUM_PAGES: int = 256  # páginas liberadas por fatia
+    DB_MAINTENANCE_VACUUM_MAX_SLICES: int = 200
+    DB_MAINTENANCE_SLICE_PAUSE_SECONDS: float = 0.1
+    DB_MAINTENANCE_HISTORY_DAYS: int = 30
+    DB_INCREMENTAL_VACUUM: bool = True  # auto_vacuum=INCREMENTAL em bancos novos
+
+    # Post-write job queue
+    JOB_QUEUE_MAX_SIZE: int = 1000
+    JOB_QUEUE_WORKERS: int = 2
+    JOB_QUEUE_THREAD_WORKERS: int = 2
+    JOB_QUEUE_ENQUEUE_TIMEOUT_SECONDS: float = 0.5
+    JOB_QUEUE_DRAIN_TIMEOUT_SECONDS: float = 30.0
+    JOB_QUEUE_MAX_ATTEMPTS: int = 3
+    JOB_QUEUE_RETRY_BACKOFF_SECONDS: float = 1.0  # dobra a cada nova tentativa
+
+    # Patient reports (renderização em processos)
+    REPORT_PROCESS_WORKERS: Optional[int] = None
+    REPORT_CHUNK_SIZE: int = 50
+    REPORT_MAX_PATIENTS: int = 500
+    REPORT_ARTIFACT_TTL_HOURS: int = 24  # versões substituídas ainda baixáveis
+
+    # Anomaly detection (EWMA por paciente/métrica)
+    ANOMALY_SLOW_ALPHA: float = 0.05
+    ANOMALY_FAST_ALPHA: float = 0.3
+    ANOMALY_Z_THRESHOLD: float = 3.0
+    ANOMALY_DRIFT_THRESHOLD: float = 2.0
+    ANOMALY_MIN_SAMPLES: int = 10
+
 
 @lru_cache
 def get_settings() -> Settings:
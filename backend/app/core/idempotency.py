@@ -0,0 +1,394 @@
+"""
+Vita - Idempotency Keys
+Suporte ao header `Idempotency-Key` nas rotas de criação.
+
+Clientes que repetem um `POST` após timeout (monitores, app móvel) enviam
+a mesma chave em todas as tentativas. A primeira execução bem-sucedida
+(2xx) tem a resposta guardada por `IDEMPOTENCY_TTL_SECONDS`; repetições
+com a mesma chave recebem essa resposta, com `Idempotent-Replayed: true`,
+sem executar a rota nem tocar nas tabelas.
+
+- A chave vale por identidade (médico do token ou IP) e rota.
+- Reusar a chave com outro corpo é erro (400): o corpo é comparado por hash.
+- Uma repetição que chega enquanto a original ainda executa aguarda o
+  resultado dela em vez de criar um segundo registro, mesmo que chegue a
+  outro worker do `serve.py`.
+- Respostas de erro não são guardadas: a próxima tentativa executa de novo.
+
+As chaves ficam na tabela `idempotency_keys` do banco principal, com
+chave primária (identidade, rota, chave): a primeira requisição reserva a
+chave com um insert atômico e as demais, em qualquer worker, aguardam a
+resposta gravada. Uma reserva cujo worker morreu expira após
+`IDEMPOTENCY_LOCK_SECONDS` e passa para a próxima tentativa. Cada worker
+mantém as respostas já concluídas em um LRU em memória, limitado em bytes
+(`IDEMPOTENCY_MAX_BYTES`), e as repetições no mesmo worker se encontram
+sem consultar o banco. Entradas expiradas são removidas por uma tarefa de
+background.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.db.database import async_session_maker
+from app.models import IdempotencyRecord
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# POST routes that create resources
+CREATE_ROUTES = frozenset({
+    "/api/auth/register",
+    "/api/patients",
+    "/api/appointments",
+    "/api/vitals",
+    "/api/reports",
+})
+
+# Fixed per-entry overhead (tuple, key, digest) counted against the byte budget
+ENTRY_OVERHEAD = 256
+
+
+class StoredResponse(NamedTuple):
+    """Resposta guardada para uma chave."""
+    expires_at: float
+    fingerprint: bytes
+    status: int
+    headers: tuple[tuple[bytes, bytes], ...]
+    body: bytes
+
+    @property
+    def size(self) -> int:
+        return ENTRY_OVERHEAD + len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+class IdempotencyStore:
+    """
+    Chaves reservadas e respostas guardadas no banco, com um LRU local das
+    respostas concluídas, limitado em bytes e com expiração.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[tuple[str, str, str], StoredResponse]" = OrderedDict()
+        self._in_flight: dict[tuple[str, str, str], asyncio.Future] = {}
+        self._size = 0
+        self.replayed = 0
+
+    def get(self, key: tuple[str, str, str]) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple[str, str, str], entry: StoredResponse) -> None:
+        limit = settings.IDEMPOTENCY_MAX_BYTES
+        if entry.size > limit // 8:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._size += entry.size
+
+        while self._size > limit:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def _remove(self, key: tuple[str, str, str]) -> None:
+        self._size -= self._entries.pop(key).size
+
+    async def purge_expired(self) -> int:
+        """
+        Remove as entradas expiradas (do LRU local e do banco).
+
+        Returns:
+            int: Quantidade de entradas removidas do banco
+        """
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+
+        async with async_session_maker() as db:
+            result = await db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+            )
+            await db.commit()
+        return result.rowcount
+
+    # ============== Shared records ==============
+
+    async def claim(self, key: tuple[str, str, str], fingerprint: bytes) -> Optional[StoredResponse]:
+        """
+        Reserva a chave para esta requisição, entre todos os workers. Se
+        outra requisição já a reservou, aguarda a resposta dela.
+
+        Returns:
+            Optional[StoredResponse]: None se esta requisição deve executar
+                a rota, ou a resposta guardada pela execução original
+        """
+        identity, route, idempotency_key = key
+        record_key = {"identity": identity, "route": route, "key": idempotency_key}
+
+        while True:
+            now = datetime.utcnow()
+            reservation = {
+                "fingerprint": fingerprint,
+                "status": None,
+                "headers": None,
+                "body": None,
+                "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+                "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+            }
+            statement = sqlite_insert(IdempotencyRecord).values(**record_key, **reservation)
+            statement = statement.on_conflict_do_update(
+                index_elements=["identity", "route", "key"],
+                set_=reservation,
+                # Expired, or reserved by a worker that died before answering
+                where=or_(
+                    IdempotencyRecord.expires_at <= now,
+                    and_(IdempotencyRecord.status.is_(None), IdempotencyRecord.locked_until <= now),
+                ),
+            )
+            async with async_session_maker() as db:
+                result = await db.execute(statement)
+                await db.commit()
+                if result.rowcount:
+                    return None
+                record = await db.get(IdempotencyRecord, (identity, route, idempotency_key))
+
+            if record is not None and record.status is not None:
+                remaining = (record.expires_at - now).total_seconds()
+                entry = StoredResponse(
+                    expires_at=time.monotonic() + remaining,
+                    fingerprint=record.fingerprint,
+                    status=record.status,
+                    headers=tuple(
+                        (name.encode("latin-1"), value.encode("latin-1"))
+                        for name, value in json.loads(record.headers)
+                    ),
+                    body=record.body,
+                )
+                self.put(key, entry)
+                return entry
+
+            # Running in another worker (or released after an error): check again
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+
+    async def release(self, key: tuple[str, str, str], entry: Optional[StoredResponse]) -> None:
+        """
+        Grava a resposta da execução (2xx) ou libera a chave para a próxima
+        tentativa.
+        """
+        identity, route, idempotency_key = key
+        condition = and_(
+            IdempotencyRecord.identity == identity,
+            IdempotencyRecord.route == route,
+            IdempotencyRecord.key == idempotency_key,
+        )
+        async with async_session_maker() as db:
+            if entry is None:
+                await db.execute(delete(IdempotencyRecord).where(condition))
+            else:
+                await db.execute(update(IdempotencyRecord).where(condition).values(
+                    status=entry.status,
+                    headers=json.dumps([
+                        [name.decode("latin-1"), value.decode("latin-1")]
+                        for name, value in entry.headers
+                    ]),
+                    body=entry.body,
+                    expires_at=datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                ))
+            await db.commit()
+
+    # ============== In-flight requests ==============
+
+    def begin(self, key: tuple[str, str, str]) -> Optional[asyncio.Future]:
+        """
+        Marca a chave como em execução.
+
+        Returns:
+            Optional[asyncio.Future]: None se esta requisição deve executar a
+                rota, ou o future da execução em andamento a aguardar
+        """
+        running = self._in_flight.get(key)
+        if running is not None:
+            return running
+        self._in_flight[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def finish(self, key: tuple[str, str, str], entry: Optional[StoredResponse]) -> None:
+        future = self._in_flight.pop(key)
+        if entry is not None:
+            self.put(key, entry)
+        future.set_result(entry)
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "in_flight": len(self._in_flight),
+            "replayed": self.replayed,
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def expiry_loop() -> None:
+    """Tarefa de background que remove as respostas expiradas."""
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_SWEEP_SECONDS)
+        try:
+            await idempotency_store.purge_expired()
+        except Exception as exc:
+            print(f"⚠️  Falha ao remover chaves de idempotência expiradas: {exc}")
+
+
+async def _send_json(send, status_code: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, entry: StoredResponse) -> None:
+    idempotency_store.replayed += 1
+    await send({
+        "type": "http.response.start",
+        "status": entry.status,
+        "headers": [*entry.headers, (b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": entry.body})
+
+
+async def _respond(send, entry: StoredResponse, fingerprint: bytes) -> None:
+    if entry.fingerprint != fingerprint:
+        await _send_json(send, 400, "Idempotency-Key já utilizada com outro conteúdo")
+    else:
+        await _replay(send, entry)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI que aplica `Idempotency-Key` às rotas de criação."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope.get("path") not in CREATE_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        raw_key = next((value for name, value in scope["headers"] if name == HEADER), None)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = raw_key.decode("latin-1").strip()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, "Idempotency-Key inválida")
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+        key = (admission.identity(scope), scope["path"], idempotency_key)
+
+        while True:
+            entry = idempotency_store.get(key)
+            if entry is not None:
+                await _respond(send, entry, fingerprint)
+                return
+
+            running = idempotency_store.begin(key)
+            if running is None:
+                break
+            # A retry raced the original in this worker: wait for its outcome, then re-check
+            await asyncio.shield(running)
+
+        entry = None
+        claimed = False
+        try:
+            entry = await idempotency_store.claim(key, fingerprint)
+            if entry is None:
+                claimed = True
+                entry = await self._execute(scope, receive, send, body, fingerprint)
+        finally:
+            try:
+                if claimed:
+                    await idempotency_store.release(key, entry)
+            finally:
+                idempotency_store.finish(key, entry)
+
+        if not claimed:
+            # The original ran in another worker
+            await _respond(send, entry, fingerprint)
+
+    async def _execute(self, scope, receive, send, body: bytes, fingerprint: bytes) -> Optional[StoredResponse]:
+        sent = False
+
+        async def replay_receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start: dict = {}
+        chunks: list[bytes] = []
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, replay_receive, capture_send)
+        if not 200 <= start.get("status", 500) < 300:
+            return None
+        return StoredResponse(
+            expires_at=time.monotonic() + settings.IDEMPOTENCY_TTL_SECONDS,
+            fingerprint=fingerprint,
+            status=start["status"],
+            headers=tuple(
+                (name, value) for name, value in start.get("headers", ())
+                if name.lower() != b"set-cookie"
+            ),
+            body=b"".join(chunks),
+        )
@@ -0,0 +1,420 @@
+"""
+Vita - Shared Cache
+Cache compartilhado entre os workers do uvicorn, em um arquivo mapeado em
+memória (`mmap`).
+
+Com vários workers, um cache em memória do processo é duplicado em cada
+um e a invalidação feita por um worker não chega aos outros. Aqui todos
+os workers mapeiam o mesmo arquivo:
+
+- Entradas ficam em slots de tamanho fixo, em duas classes (pequenos e
+  grandes). A chave é um hash de 16 bytes; cada chave pode ocupar um de
+  `WAYS` slots consecutivos, e a substituição prefere slots vazios,
+  expirados ou invalidados.
+- Leitura sem lock (seqlock): o escritor torna o contador de sequência do
+  slot ímpar, grava e o torna par de novo; o leitor copia o slot e só
+  aceita a cópia se a sequência era par e não mudou.
+- Escritores de processos diferentes se excluem por `fcntl.lockf` em
+  faixas de bytes (um lock por grupo de slots).
+- Invalidação por contadores de geração, também no arquivo: cada entrada
+  guarda a geração do seu escopo (médico, paciente...) do momento em que
+  os dados foram carregados. Invalidar é incrementar o contador; entradas
+  com geração antiga passam a ser ignoradas em todos os workers, inclusive
+  as que ainda estavam sendo carregadas.
+
+Os valores são serializados com pickle (comprimidos com zlib só quando
+não cabem em um slot grande); valores que nem assim cabem não são
+guardados. Sem suporte a `fcntl` (ou com `SHARED_CACHE_ENABLED=false`), o
+mesmo contrato é atendido por um LRU em memória do processo.
+"""
+
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b"VITACACH"
+# Bump when the file layout or the pickled value types change
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct("<8sIIII")
+HEADER_SIZE = 64
+GENERATION = struct.Struct("<Q")
+GENERATION_SLOTS = 65536
+
+# seq, key digest, expires_at (wall clock), generation, generation index, length
+SLOT = struct.Struct("<Q16sdQII")
+SEQUENCE = struct.Struct("<Q")
+SMALL_SLOT_BYTES = 1024
+LARGE_SLOT_BYTES = 64 * 1024
+WAYS = 4
+
+COMPRESSED = 1 << 31
+LENGTH_MASK = COMPRESSED - 1
+READ_RETRIES = 3
+
+# Writer lock stripes live past the end of the file (POSIX allows locking there)
+LOCK_STRIPES = 4096
+
+
+def _digest(key: Hashable) -> bytes:
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+
+
+def _generation_index(scope: Hashable) -> int:
+    return int.from_bytes(_digest(scope)[:4], "little") % GENERATION_SLOTS
+
+
+def _encode(value: Any, limit: int) -> Optional[tuple[bytes, int]]:
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    flags = 0
+    if len(payload) > limit:
+        payload, flags = zlib.compress(payload, 1), COMPRESSED
+    if len(payload) > limit:
+        return None
+    return payload, flags
+
+
+def _decode(payload: bytes, length: int) -> Any:
+    if length & COMPRESSED:
+        payload = zlib.decompress(payload)
+    return pickle.loads(payload)
+
+
+class _Region:
+    """Faixa do arquivo com slots de um mesmo tamanho."""
+
+    __slots__ = ("offset", "slot_bytes", "count")
+
+    def __init__(self, offset: int, slot_bytes: int, count: int):
+        self.offset = offset
+        self.slot_bytes = slot_bytes
+        self.count = count
+
+    @property
+    def capacity(self) -> int:
+        return self.slot_bytes - SLOT.size
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.slot_bytes * self.count
+
+    def bucket(self, digest: bytes) -> tuple[int, list[int]]:
+        """Índice do grupo e offsets dos `WAYS` slots candidatos da chave."""
+        first = int.from_bytes(digest[:8], "little") % self.count
+        return first, [
+            self.offset + ((first + way) % self.count) * self.slot_bytes
+            for way in range(WAYS)
+        ]
+
+
+class SharedMemoryCache:
+    """Cache em arquivo mapeado, compartilhado entre processos."""
+
+    def __init__(self, path: str, small_slots: int, large_slots: int):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        small = _Region(
+            HEADER_SIZE + GENERATION.size * GENERATION_SLOTS, SMALL_SLOT_BYTES, small_slots
+        )
+        large = _Region(small.end, LARGE_SLOT_BYTES, large_slots)
+        self._regions = (small, large)
+        self._size = large.end
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._initialize(small_slots, large_slots)
+        self._map = mmap.mmap(self._fd, self._size)
+
+    def _initialize(self, small_slots: int, large_slots: int) -> None:
+        header = HEADER.pack(MAGIC, LAYOUT_VERSION, GENERATION_SLOTS, small_slots, large_slots)
+
+        init_lock = self._size + LOCK_STRIPES + 1
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, init_lock)
+        try:
+            current = os.pread(self._fd, HEADER.size, 0)
+            if current != header or os.fstat(self._fd).st_size != self._size:
+                # Unknown or different layout: start over from an empty (sparse) file
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, init_lock)
+
+    def _locked(self, stripe: int):
+        return _FileLock(self._lock, self._fd, self._size + stripe)
+
+    # ============== Generations ==============
+
+    def generation(self, scope: Hashable) -> int:
+        """Geração atual do escopo (ler antes de carregar os dados)."""
+        return self._generation_at(_generation_index(scope))
+
+    def _generation_at(self, index: int) -> int:
+        return GENERATION.unpack_from(self._map, HEADER_SIZE + index * GENERATION.size)[0]
+
+    def invalidate(self, scope: Hashable) -> None:
+        """Invalida, em todos os processos, as entradas do escopo."""
+        index = _generation_index(scope)
+        offset = HEADER_SIZE + index * GENERATION.size
+        with self._locked(LOCK_STRIPES):
+            GENERATION.pack_into(self._map, offset, self._generation_at(index) + 1)
+
+    # ============== Entries ==============
+
+    def _read(self, offset: int, digest: bytes) -> Optional[tuple]:
+        """Cópia consistente do slot, se ele guardar a chave."""
+        for _ in range(READ_RETRIES):
+            sequence, slot_key, expires_at, generation, index, length = SLOT.unpack_from(
+                self._map, offset
+            )
+            if slot_key != digest:
+                return None
+            if sequence & 1:
+                continue
+
+            start = offset + SLOT.size
+            payload = self._map[start:start + (length & LENGTH_MASK)]
+            if SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                return expires_at, generation, index, length, payload
+        return None
+
+    def get(self, key: Hashable, scope: Hashable) -> Optional[Any]:
+        """
+        Valor da chave, se presente, não expirado e da geração atual do escopo.
+
+        Args:
+            key: Chave do valor
+            scope: Escopo de invalidação
+
+        Returns:
+            Optional[Any]: Valor guardado, ou None
+        """
+        digest = _digest(key)
+        index = _generation_index(scope)
+        current = self._generation_at(index)
+        now = time.time()
+
+        for region in self._regions:
+            for offset in region.bucket(digest)[1]:
+                slot = self._read(offset, digest)
+                if slot is None:
+                    continue
+                expires_at, generation, slot_index, length, payload = slot
+                if expires_at > now and generation == current and slot_index == index:
+                    self.hits += 1
+                    return _decode(payload, length)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, scope: Hashable, value: Any, ttl: float, generation: int) -> bool:
+        """
+        Guarda um valor carregado quando o escopo estava em `generation`.
+
+        Returns:
+            bool: False se o valor não couber em um slot
+        """
+        encoded = _encode(value, self._regions[-1].capacity)
+        if encoded is None:
+            return False
+        payload, flags = encoded
+
+        digest = _digest(key)
+        index = _generation_index(scope)
+        region = next(r for r in self._regions if len(payload) <= r.capacity)
+
+        for other in self._regions:
+            if other is not region:
+                self._clear(other, digest)
+
+        expires_at = time.time() + ttl
+        bucket, offsets = region.bucket(digest)
+        with self._locked(bucket % LOCK_STRIPES):
+            offset = self._victim(offsets, digest)
+            sequence = SEQUENCE.unpack_from(self._map, offset)[0] | 1
+            SEQUENCE.pack_into(self._map, offset, sequence)
+            start = offset + SLOT.size
+            self._map[start:start + len(payload)] = payload
+            SLOT.pack_into(
+                self._map, offset,
+                sequence, digest, expires_at, generation, index, len(payload) | flags,
+            )
+            SEQUENCE.pack_into(self._map, offset, sequence + 1)
+
+        return True
+
+    def _victim(self, offsets: list[int], digest: bytes) -> int:
+        """Slot a sobrescrever: o da própria chave, um livre/obsoleto ou o que expira antes."""
+        now = time.time()
+        oldest, oldest_expiry = offsets[0], float("inf")
+        for offset in offsets:
+            _, slot_key, expires_at, generation, index, _ = SLOT.unpack_from(self._map, offset)
+            if slot_key == digest:
+                return offset
+            if expires_at <= now or generation != self._generation_at(index):
+                return offset
+            if expires_at < oldest_expiry:
+                oldest, oldest_expiry = offset, expires_at
+        return oldest
+
+    def _clear(self, region: _Region, digest: bytes) -> None:
+        bucket, offsets = region.bucket(digest)
+        for offset in offsets:
+            if SLOT.unpack_from(self._map, offset)[1] != digest:
+                continue
+            with self._locked(bucket % LOCK_STRIPES):
+                sequence = SEQUENCE.unpack_from(self._map, offset)[0]
+                SEQUENCE.pack_into(self._map, offset, sequence | 1)
+                SLOT.pack_into(self._map, offset, sequence | 1, bytes(16), 0.0, 0, 0, 0)
+                SEQUENCE.pack_into(self._map, offset, (sequence | 1) + 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": "shared",
+            "path": self.path,
+            "size_bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class _FileLock:
+    """Lock de escrita entre threads (threading) e entre processos (lockf)."""
+
+    __slots__ = ("_thread_lock", "_fd", "_offset")
+
+    def __init__(self, thread_lock: threading.Lock, fd: int, offset: int):
+        self._thread_lock = thread_lock
+        self._fd = fd
+        self._offset = offset
+
+    def __enter__(self):
+        # POSIX record locks are per process, so threads also need the local lock
+        self._thread_lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._offset)
+
+    def __exit__(self, *exc_info):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._offset)
+        self._thread_lock.release()
+
+
+class LocalCache:
+    """LRU em memória do processo com o mesmo contrato do cache compartilhado."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple[float, int, int, Any]]" = OrderedDict()
+        self._generations: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, scope: Hashable) -> int:
+        return self._generations.get(_generation_index(scope), 0)
+
+    def invalidate(self, scope: Hashable) -> None:
+        index = _generation_index(scope)
+        self._generations[index] = self._generations.get(index, 0) + 1
+
+    def get(self, key: Hashable, scope: Hashable) -> Optional[Any]:
+        digest = _digest(key)
+        entry = self._entries.get(digest)
+        if entry is not None:
+            expires_at, index, generation, value = entry
+            if (
+                expires_at > time.time()
+                and index == _generation_index(scope)
+                and generation == self._generations.get(index, 0)
+            ):
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return value
+            del self._entries[digest]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, scope: Hashable, value: Any, ttl: float, generation: int) -> bool:
+        digest = _digest(key)
+        self._entries[digest] = (time.time() + ttl, _generation_index(scope), generation, value)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": "local",
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class Cache:
+    """
+    Cache usado pelas rotas e serviços. O backend (arquivo compartilhado ou
+    LRU local) é criado no primeiro uso, já dentro do processo do worker.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_backend()
+        return self._backend
+
+    @staticmethod
+    def _create_backend():
+        small_slots = settings.SHARED_CACHE_SMALL_SLOTS
+        large_slots = settings.SHARED_CACHE_LARGE_SLOTS
+
+        if settings.SHARED_CACHE_ENABLED and fcntl is not None:
+            path = settings.SHARED_CACHE_PATH or str(Path(settings.DATA_DIR) / "shared-cache.bin")
+            try:
+                return SharedMemoryCache(path, small_slots, large_slots)
+            except OSError as exc:
+                print(f"⚠️  Cache compartilhado indisponível ({exc}); usando cache local")
+
+        return LocalCache(small_slots + large_slots)
+
+    def generation(self, scope: Hashable) -> int:
+        """Geração atual do escopo; leia antes de carregar os dados a guardar."""
+        return self.backend.generation(scope)
+
+    def get(self, key: Hashable, scope: Hashable) -> Optional[Any]:
+        """Valor válido da chave, ou None."""
+        return self.backend.get(key, scope)
+
+    def put(self, key: Hashable, scope: Hashable, value: Any, ttl: float, generation: int) -> bool:
+        """Guarda o valor, válido enquanto o escopo estiver em `generation`."""
+        return self.backend.put(key, scope, value, ttl, generation)
+
+    def invalidate(self, scope: Hashable) -> None:
+        """Invalida todas as entradas do escopo (em todos os workers)."""
+        self.backend.invalidate(scope)
+
+    def snapshot(self) -> dict:
+        return self.backend.snapshot()
+
+
+shared_cache = Cache()
@@ -1,28 +1,94 @@
 """
 Vita - Database Configuration
 Configuração do SQLAlchemy assíncrono com SQLite.
+
+Com `SHARD_COUNT` > 1, os dados clínicos são divididos em shards, um
+arquivo SQLite (e um engine) por shard, e cada médico tem todos os seus
+dados em um único shard: escritas de médicos em shards diferentes não
+disputam o mesmo lock de arquivo. O shard 0 é o banco principal
+(`DATABASE_URL`), que também guarda o diretório (usuários, mapa
+médico → shard e fila de jobs); os demais seguem `SHARD_URL_TEMPLATE`.
+
+Os IDs continuam únicos entre shards (URLs, caches e chaves de jobs
+dependem disso): as tabelas de `GLOBAL_ID_TABLES` recebem IDs de blocos
+reservados em um banco próprio (`SHARD_ID_URL`), e não do `max(id) + 1`
+de cada arquivo. Assim os dados de um médico podem mudar de shard sem
+mudar de ID (ver `rebalance_shards.py`).
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+import asyncio
+import errno
+import hashlib
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, event, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.util import await_only
 
 from app.core.config import settings
+from app.core.shared_cache import shared_cache
+from app.db.statement_cache import statement_cache_stats
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
 
-# Engine assíncrono
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True,
+T = TypeVar("T")
+
+# Tables whose ids appear in URLs, cache keys and job keys: unique across shards
+GLOBAL_ID_TABLES = (
+    "patients",
+    "vital_signs",
+    "appointments",
+    "report_jobs",
+    "vital_archive_segments",
+    "vital_baselines",
+    "vital_anomalies",
 )
 
+
+def _create_engine(url: str) -> AsyncEngine:
+    created = create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        future=True,
+        query_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        # sqlite3 keeps its own per-connection cache of prepared statements
+        connect_args=(
+            {"cached_statements": settings.DB_DRIVER_STATEMENT_CACHE_SIZE}
+            if url.startswith("sqlite")
+            else {}
+        ),
+    )
+    statement_cache_stats.install(created.sync_engine)
+    return created
+
+
+def _create_session_maker(bind: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+# Engine assíncrono (banco principal: diretório e shard 0)
+engine = _create_engine(settings.DATABASE_URL)
+
 # Session factory assíncrona
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+async_session_maker = _create_session_maker(engine)
 
 
 class Base(DeclarativeBase):
@@ -30,15 +96,18 @@ class Base(DeclarativeBase):
     pass
 
 
-async def get_db() -> AsyncSession:
+@asynccontextmanager
+async def session_scope(maker: async_sessionmaker = async_session_maker) -> AsyncIterator[AsyncSession]:
     """
-    Dependency que fornece uma sessão de banco de dados.
-    Garante que a sessão seja fechada após o uso.
+    Sessão transacional: commit ao final, rollback em caso de erro.
+
+    Args:
+        maker: Fábrica de sessões (padrão: banco principal)
 
     Yields:
         AsyncSession: Sessão do banco de dados
     """
-    async with async_session_maker() as session:
+    async with maker() as session:
         try:
             yield session
             await session.commit()
@@ -49,10 +118,437 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
-async def init_db() -> None:
+class ProcessLock:
     """
-    Inicializa o banco de dados criando todas as tabelas.
-    Deve ser chamado na inicialização da aplicação.
+    Lock assíncrono exclusivo entre as tarefas do processo e entre os
+    processos que usam o mesmo `DATA_DIR` (workers do `serve.py`, inclusive
+    o worker antigo e o novo durante a reciclagem), por `fcntl.lockf` em um
+    arquivo. Sem `fcntl`, vale só dentro do processo.
+    """
+
+    def __init__(self, name: str, poll_seconds: float = 0.5):
+        self.name = name
+        self.poll_seconds = poll_seconds
+        self._lock = asyncio.Lock()
+        self._fd: Optional[int] = None
+
+    def _file(self) -> int:
+        # Opened on first use, inside the worker process
+        if self._fd is None:
+            path = Path(settings.DATA_DIR) / self.name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        return self._fd
+
+    async def __aenter__(self) -> "ProcessLock":
+        await self._lock.acquire()
+        if fcntl is None:
+            return self
+
+        try:
+            fd = self._file()
+            # Non-blocking attempts: a blocking lockf in a thread could still
+            # take the lock after the waiting task was cancelled
+            while True:
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return self
+                except OSError as exc:
+                    if exc.errno not in (errno.EACCES, errno.EAGAIN):
+                        raise
+                await asyncio.sleep(self.poll_seconds)
+        except BaseException:
+            self._lock.release()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+
+# Background jobs that rewrite or scan whole databases (retention,
+# compaction, maintenance) run one at a time across all workers
+maintenance_lock = ProcessLock("maintenance.lock")
+
+
+async def get_db() -> AsyncSession:
+    """
+    Dependency que fornece uma sessão de banco de dados.
+    Garante que a sessão seja fechada após o uso.
+
+    Yields:
+        AsyncSession: Sessão do banco de dados
+    """
+    async with session_scope() as session:
+        yield session
+
+
+# ============== Sharding ==============
+
+class ShardMovingError(RuntimeError):
+    """Os dados do médico estão sendo movidos entre shards."""
+
+
+class ShardRouter:
+    """Engines e sessões de cada shard e o mapa médico → shard."""
+
+    def __init__(self, engines: list[AsyncEngine]):
+        self.engines = engines
+        self.session_makers = [async_session_maker] + [
+            _create_session_maker(shard_engine) for shard_engine in engines[1:]
+        ]
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    async def shard_for(self, doctor_id: int) -> int:
+        """
+        Shard do médico, passando pelo cache compartilhado entre workers.
+        Médicos sem atribuição (anteriores ao sharding) ficam no shard 0.
+
+        Args:
+            doctor_id: ID do médico
+
+        Returns:
+            int: Número do shard
+
+        Raises:
+            ShardMovingError: Se os dados do médico estiverem sendo movidos
+        """
+        if not self.enabled:
+            return 0
+
+        from app.models import DoctorShard
+
+        scope = ("doctor_shard", doctor_id)
+        assignment = shared_cache.get(scope, scope)
+        if assignment is None:
+            generation = shared_cache.generation(scope)
+            async with async_session_maker() as db:
+                row = (await db.execute(
+                    select(DoctorShard.shard, DoctorShard.moving)
+                    .where(DoctorShard.doctor_id == doctor_id)
+                )).first()
+            assignment = (row.shard, row.moving) if row else (0, False)
+            shared_cache.put(
+                scope, scope, assignment, settings.SHARD_MAP_CACHE_TTL_SECONDS, generation
+            )
+
+        shard, moving = assignment
+        if moving:
+            raise ShardMovingError(doctor_id)
+        return shard
+
+    async def sessionmaker_for(self, doctor_id: Optional[int]) -> async_sessionmaker:
+        """
+        Fábrica de sessões do shard do médico. Sem médico (jobs gravados
+        antes do sharding), a do shard 0.
+        """
+        if doctor_id is None:
+            return async_session_maker
+        return self.session_makers[await self.shard_for(doctor_id)]
+
+    async def doctors_per_shard(self, db: AsyncSession, exclude: Optional[int] = None) -> dict[int, int]:
+        """
+        Número de médicos em cada shard, segundo o diretório.
+
+        Args:
+            db: Sessão do banco principal (diretório)
+            exclude: Médico a desconsiderar (o que está sendo atribuído)
+
+        Returns:
+            dict: {shard: médicos}
+        """
+        from app.models import DoctorShard, User, UserRole
+
+        result = await db.execute(
+            select(DoctorShard.shard, func.count()).group_by(DoctorShard.shard)
+        )
+        doctors = defaultdict(int, result.all())
+        # Doctors registered before sharding have no assignment and live in shard 0
+        doctors[0] += await db.scalar(
+            select(func.count(User.id)).where(
+                User.role == UserRole.DOCTOR,
+                User.id != exclude,
+                User.id.not_in(select(DoctorShard.doctor_id)),
+            )
+        ) or 0
+        return dict(doctors)
+
+    async def assign(self, db: AsyncSession, doctor_id: int) -> int:
+        """
+        Atribui um novo médico ao shard com menos médicos.
+
+        Args:
+            db: Sessão do banco principal (diretório)
+            doctor_id: ID do médico
+
+        Returns:
+            int: Número do shard
+        """
+        if not self.enabled:
+            return 0
+
+        from app.models import DoctorShard
+
+        doctors = await self.doctors_per_shard(db, exclude=doctor_id)
+        shard = min(range(self.count), key=lambda candidate: (doctors.get(candidate, 0), candidate))
+        db.add(DoctorShard(doctor_id=doctor_id, shard=shard))
+        return shard
+
+    def invalidate(self, doctor_id: int) -> None:
+        """Descarta a atribuição em cache do médico (em todos os workers)."""
+        shared_cache.invalidate(("doctor_shard", doctor_id))
+
+    async def fan_out(self, query: Callable[[AsyncSession], Awaitable[T]]) -> list[T]:
+        """
+        Executa `query` em todos os shards em paralelo, uma sessão por shard.
+
+        Args:
+            query: Função assíncrona que recebe a sessão do shard
+
+        Returns:
+            list: Resultado de cada shard, na ordem dos shards
+        """
+        async def run(maker: async_sessionmaker) -> T:
+            async with maker() as db:
+                return await query(db)
+
+        return await asyncio.gather(*(run(maker) for maker in self.session_makers))
+
+    async def dispose(self) -> None:
+        """Fecha as conexões de todos os shards (e do alocador de IDs)."""
+        for shard_engine in self.engines:
+            await shard_engine.dispose()
+        if id_allocator is not None:
+            await id_allocator.engine.dispose()
+
+
+shard_router = ShardRouter(
+    [engine] + [
+        _create_engine(settings.SHARD_URL_TEMPLATE.format(shard=shard))
+        for shard in range(1, settings.SHARD_COUNT)
+    ]
+)
+
+
+_id_metadata = MetaData()
+
+id_blocks = Table(
+    "id_blocks",
+    _id_metadata,
+    Column("name", String(64), primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+
+class IdAllocator:
+    """
+    IDs globais por tabela, reservados em blocos de `SHARD_ID_BLOCK_SIZE`
+    no banco do alocador. Cada processo usa os próprios blocos; um bloco
+    nunca é entregue a dois processos.
     """
-    async with engine.begin() as conn:
+
+    def __init__(self, url: str):
+        self.engine = _create_engine(url)
+        self._blocks: dict[str, tuple[int, int]] = {}
+        # A forked worker must not reuse the blocks reserved by its parent
+        os.register_at_fork(after_in_child=self._blocks.clear)
+
+    async def initialize(self) -> None:
+        """
+        Cria a tabela de blocos e garante que cada sequência comece acima
+        dos IDs já gravados em qualquer shard.
+        """
+        async with self.engine.begin() as conn:
+            await conn.run_sync(_id_metadata.create_all)
+
+        for name in GLOBAL_ID_TABLES:
+            column = Base.metadata.tables[name].c.id
+            maxima = await shard_router.fan_out(lambda db: db.scalar(select(func.max(column))))
+            floor = max(value or 0 for value in maxima) + 1
+
+            statement = sqlite_insert(id_blocks).values(name=name, next_id=floor)
+            async with self.engine.begin() as conn:
+                await conn.execute(statement.on_conflict_do_update(
+                    index_elements=["name"],
+                    set_={"next_id": func.max(id_blocks.c.next_id, statement.excluded.next_id)},
+                ))
+
+    async def _reserve(self, name: str, count: int) -> tuple[int, int]:
+        async with self.engine.begin() as conn:
+            end = await conn.scalar(
+                update(id_blocks)
+                .where(id_blocks.c.name == name)
+                .values(next_id=id_blocks.c.next_id + count)
+                .returning(id_blocks.c.next_id)
+            )
+        if end is None:
+            raise RuntimeError(f"Alocador de IDs não inicializado para {name}")
+        return end - count, end
+
+    def take(self, name: str, count: int) -> range:
+        """
+        Próximos `count` IDs da tabela. Chamado dentro do flush (contexto
+        greenlet do SQLAlchemy), quando o bloco atual não basta reserva outro.
+        """
+        start, end = self._blocks.get(name, (0, 0))
+        if end - start < count:
+            start, end = await_only(
+                self._reserve(name, max(count, settings.SHARD_ID_BLOCK_SIZE))
+            )
+        self._blocks[name] = (start + count, end)
+        return range(start, start + count)
+
+
+id_allocator: Optional[IdAllocator] = None
+if shard_router.enabled:
+    id_allocator = IdAllocator(
+        settings.SHARD_ID_URL
+        or f"sqlite+aiosqlite:///{Path(settings.DATA_DIR) / 'shard-ids.db'}"
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_global_ids(session: Session, flush_context, instances) -> None:
+    if id_allocator is None:
+        return
+
+    pending = defaultdict(list)
+    for instance in session.new:
+        name = getattr(instance, "__tablename__", None)
+        if name in GLOBAL_ID_TABLES and instance.id is None:
+            pending[name].append(instance)
+
+    for name, instances_ in pending.items():
+        # Ids follow the order in which the rows were added to the session
+        instances_.sort(key=lambda instance: instance._sa_instance_state.insert_order)
+        for instance, new_id in zip(instances_, id_allocator.take(name, len(instances_))):
+            instance.id = new_id
+
+
+# ============== Schema ==============
+
+def schema_fingerprint() -> str:
+    """
+    Impressão digital do esquema declarado pelos modelos (DDL das tabelas
+    e índices no dialeto do engine).
+
+    Returns:
+        str: Hash hexadecimal do DDL
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    return digest.hexdigest()
+
+
+def _missing_indexes(connection) -> list:
+    existing = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+    return [
+        index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name not in existing
+    ]
+
+
+def _create_indexes(connection) -> None:
+    # create_all skips the indexes of tables that already exist
+    for index in _missing_indexes(connection):
+        index.create(connection, checkfirst=True)
+        print(f"🗂️  Índice {index.name} criado em {index.table.name}")
+
+
+def _add_columns(connection) -> None:
+    # create_all doesn't alter existing tables either: new nullable columns
+    # are added in place
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        name = preparer.quote(table.name)
+        existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({name})"))}
+        if not existing:
+            continue
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(
+                f"ALTER TABLE {name} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+            ))
+            print(f"🗂️  Coluna {column.name} adicionada em {table.name}")
+
+
+async def _apply_schema(target: AsyncEngine, fingerprint: str) -> bool:
+    from app.models import SchemaVersion
+
+    async with target.connect() as conn:
+        try:
+            stored = await conn.scalar(
+                select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)
+            )
+        except OperationalError:
+            # First boot: the version table does not exist yet
+            stored = None
+        # Databases upgraded before the indexes were created with the tables
+        missing = await conn.run_sync(_missing_indexes) if stored == fingerprint else []
+    if stored == fingerprint:
+        if not missing:
+            return False
+        async with target.begin() as conn:
+            await conn.run_sync(_create_indexes)
+        return True
+
+    if stored is None and settings.DB_INCREMENTAL_VACUUM:
+        # Only applies to a database without tables; existing ones are
+        # converted by the admin `vacuum` maintenance task
+        async with target.connect() as conn:
+            await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+
+    async with target.begin() as conn:
+        await conn.run_sync(_add_columns)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_indexes)
+        table = SchemaVersion.__table__
+        await conn.execute(table.delete())
+        await conn.execute(
+            table.insert().values(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow())
+        )
+    return True
+
+
+async def init_db() -> bool:
+    """
+    Inicializa o banco de dados (todos os shards) criando as tabelas que
+    faltarem, e o alocador de IDs globais quando há mais de um shard.
+
+    Compara a impressão digital do esquema com a versão gravada em cada
+    shard: quando são iguais, nenhuma tabela é refletida nem criada (só os
+    índices declarados que faltarem). Quando mudam, também adiciona as
+    colunas anuláveis novas e cria os índices novos de tabelas já
+    existentes, que o `create_all` ignora.
+    Deve ser chamado na inicialização da aplicação.
+
+    Returns:
+        bool: True se o DDL foi aplicado em algum shard, False se o esquema
+            já estava atualizado
+    """
+    fingerprint = schema_fingerprint()
+    applied = False
+    for shard_engine in shard_router.engines:
+        applied |= await _apply_schema(shard_engine, fingerprint)
+
+    if id_allocator is not None:
+        Path(settings.DATA_DIR).mkdir(parents=True, exist_ok=True)
+        await id_allocator.initialize()
+    return applied
@@ -0,0 +1,56 @@
+"""
+Vita - Statement Cache
+Métricas do cache de SQL compilado do SQLAlchemy.
+
+Toda execução passa pelo cache de compilação do engine
+(`DB_STATEMENT_CACHE_SIZE` entradas): um acerto reaproveita o SQL já
+compilado, uma falta compila a construção de novo. As consultas quentes
+das rotas são construídas uma única vez, no import, com parâmetros
+nomeados (`bindparam`); a chave de cache de uma construção é memoizada
+nela, então nem a construção nem a chave são refeitas por requisição.
+Com sharding, cada engine tem o próprio cache; as métricas somam todos.
+"""
+
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+
+class StatementCacheStats:
+    """Contagem de acertos e faltas do cache de compilação de um engine."""
+
+    def __init__(self):
+        self.outcomes: Counter = Counter()
+        self._engines: list[Engine] = []
+
+    def install(self, engine: Engine) -> None:
+        """Passa a contar as execuções do engine (um por shard)."""
+        self._engines.append(engine)
+        event.listen(engine, "after_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            self.outcomes[context.cache_hit] += 1
+
+    def snapshot(self) -> dict:
+        hits = self.outcomes[CACHE_HIT]
+        misses = self.outcomes[CACHE_MISS]
+        # Driver-level SQL and DDL never go through the compiled cache
+        uncached = sum(self.outcomes.values()) - hits - misses
+        caches = [
+            engine._compiled_cache for engine in self._engines
+            if engine._compiled_cache is not None
+        ]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncached": uncached,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "entries": sum(len(cache) for cache in caches),
+            "capacity": sum(cache.capacity for cache in caches),
+        }
+
+
+statement_cache_stats = StatementCacheStats()
@@ -9,7 +9,7 @@ from typing import Optional, List
 
 from sqlalchemy import (
     String, Integer, Float, Text, DateTime, Date, 
-    ForeignKey, Enum, Boolean
+    ForeignKey, Enum, Boolean, Index, UniqueConstraint, LargeBinary
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -55,10 +55,10 @@ class User(Base):
 
     # Relationships
     patients: Mapped[List["Patient"]] = relationship(
-        "Patient", back_populates="doctor", lazy="selectin"
+        "Patient", back_populates="doctor"
     )
     appointments: Mapped[List["Appointment"]] = relationship(
-        "Appointment", back_populates="doctor", lazy="selectin"
+        "Appointment", back_populates="doctor"
     )
 
     def __repr__(self) -> str:
@@ -95,10 +95,10 @@ class Patient(Base):
     # Relationships
     doctor: Mapped["User"] = relationship("User", back_populates="patients")
     vitals: Mapped[List["VitalSign"]] = relationship(
-        "VitalSign", back_populates="patient", lazy="selectin"
+        "VitalSign", back_populates="patient"
     )
     appointments: Mapped[List["Appointment"]] = relationship(
-        "Appointment", back_populates="patient", lazy="selectin"
+        "Appointment", back_populates="patient"
     )
 
     def __repr__(self) -> str:
@@ -110,6 +110,9 @@ class VitalSign(Base):
     Modelo para registro de sinais vitais.
     """
     __tablename__ = "vital_signs"
+    __table_args__ = (
+        Index("ix_vital_signs_patient_recorded", "patient_id", "recorded_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
@@ -135,11 +138,203 @@ class VitalSign(Base):
         return f"<VitalSign(id={self.id}, patient_id={self.patient_id}, recorded_at={self.recorded_at})>"
 
 
+class VitalArchiveSegment(Base):
+    """
+    Segmento arquivado de sinais vitais (um paciente em um mês).
+    Registros antigos saem da tabela `vital_signs` e passam a viver em
+    arquivos comprimidos; este catálogo permite rotear consultas por janela.
+    """
+    __tablename__ = "vital_archive_segments"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "month", name="uq_vital_archive_patient_month"),
+        Index("ix_vital_archive_patient_range", "patient_id", "first_recorded_at", "last_recorded_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    month: Mapped[str] = mapped_column(String(7), nullable=False)  # YYYY-MM
+    path: Mapped[str] = mapped_column(String(500), nullable=False)  # relativo ao DATA_DIR
+    row_count: Mapped[int] = mapped_column(Integer, default=0)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    first_recorded_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_recorded_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<VitalArchiveSegment(patient_id={self.patient_id}, month={self.month}, rows={self.row_count})>"
+
+
+class VitalBaseline(Base):
+    """
+    Estado estatístico online (EWMA) de uma métrica de um paciente.
+    Atualizado em O(1) a cada novo registro de sinais vitais.
+    """
+    __tablename__ = "vital_baselines"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "metric", name="uq_vital_baseline_patient_metric"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    metric: Mapped[str] = mapped_column(String(32), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    mean: Mapped[float] = mapped_column(Float, default=0.0)  # EWMA lenta
+    variance: Mapped[float] = mapped_column(Float, default=0.0)  # EWMV dos resíduos
+    fast_mean: Mapped[float] = mapped_column(Float, default=0.0)  # EWMA rápida
+    drifting: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<VitalBaseline(patient_id={self.patient_id}, metric={self.metric}, mean={self.mean:.1f})>"
+
+
+class VitalAnomaly(Base):
+    """
+    Evento de anomalia detectado na ingestão de sinais vitais.
+    """
+    __tablename__ = "vital_anomalies"
+    __table_args__ = (
+        Index("ix_vital_anomalies_patient_detected", "patient_id", "detected_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    vital_sign_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    metric: Mapped[str] = mapped_column(String(32), nullable=False)
+    kind: Mapped[str] = mapped_column(String(10), nullable=False)  # spike | drift
+    value: Mapped[float] = mapped_column(Float, nullable=False)
+    expected: Mapped[float] = mapped_column(Float, nullable=False)
+    z_score: Mapped[float] = mapped_column(Float, nullable=False)
+    detected_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<VitalAnomaly(patient_id={self.patient_id}, metric={self.metric}, kind={self.kind})>"
+
+
+class VitalDailySketch(Base):
+    """
+    Sketch de quantis de uma métrica de um paciente em um dia (UTC).
+    Histograma esparso de resolução fixa, mergeável por soma.
+    """
+    __tablename__ = "vital_daily_sketches"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "day", "metric", name="uq_vital_sketch_patient_day_metric"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    metric: Mapped[str] = mapped_column(String(32), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    bins: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<VitalDailySketch(patient_id={self.patient_id}, day={self.day}, metric={self.metric})>"
+
+
+class VitalDailyCount(Base):
+    """
+    Quantidade de sinais vitais de um paciente em um dia (UTC), somando a
+    tabela quente e os segmentos arquivados.
+    """
+    __tablename__ = "vital_daily_counts"
+    __table_args__ = (
+        UniqueConstraint("patient_id", "day", name="uq_vital_count_patient_day"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"<VitalDailyCount(patient_id={self.patient_id}, day={self.day}, count={self.count})>"
+
+
+class VitalRollup(Base):
+    """
+    Registro de sinais vitais produzido pela compactação: o registro em
+    `vital_signs` guarda as médias do intervalo, e esta tabela o número de
+    leituras brutas substituídas, quantas delas tinham cada métrica e o
+    mínimo/máximo de cada métrica.
+
+    Fica mesmo depois que o registro agregado é arquivado, para que as
+    estatísticas e contagens do arquivo continuem em leituras.
+    """
+    __tablename__ = "vital_rollups"
+    __table_args__ = (
+        Index("ix_vital_rollups_patient_bucket", "patient_id", "bucket_start"),
+    )
+
+    vital_sign_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    bucket_seconds: Mapped[int] = mapped_column(Integer, nullable=False)  # 60 | 3600
+    sample_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Readings of the bucket that had each metric (rows compacted before
+    # these columns existed are backfilled from sample_count at startup)
+    heart_rate_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    systolic_pressure_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    diastolic_pressure_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    temperature_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    oxygen_saturation_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    respiratory_rate_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    weight_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    height_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    glucose_level_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    heart_rate_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    heart_rate_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    systolic_pressure_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    systolic_pressure_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    diastolic_pressure_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    diastolic_pressure_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    temperature_min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    temperature_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    oxygen_saturation_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    oxygen_saturation_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    respiratory_rate_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    respiratory_rate_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    weight_min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    weight_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    height_min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    height_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    glucose_level_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    glucose_level_max: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<VitalRollup(vital_sign_id={self.vital_sign_id}, samples={self.sample_count})>"
+
+
+class VitalCompactionMark(Base):
+    """
+    Até onde as leituras de um paciente já foram compactadas em uma
+    resolução (a próxima execução continua daqui).
+    """
+    __tablename__ = "vital_compaction_marks"
+
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"), primary_key=True)
+    bucket_seconds: Mapped[int] = mapped_column(Integer, primary_key=True)
+    compacted_until: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<VitalCompactionMark(patient_id={self.patient_id}, until={self.compacted_until})>"
+
+
 class Appointment(Base):
     """
     Modelo para consultas/agendamentos.
     """
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Covers the calendar counts (range scan without touching the table);
+        # created at startup on databases that predate it
+        Index(
+            "ix_appointments_doctor_scheduled",
+            "doctor_id", "scheduled_at", "status", "appointment_type",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     doctor_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -167,3 +362,147 @@ class Appointment(Base):
 
     def __repr__(self) -> str:
         return f"<Appointment(id={self.id}, doctor_id={self.doctor_id}, patient_id={self.patient_id})>"
+
+
+class PendingJob(Base):
+    """
+    Job pós-escrita ainda não executado, persistido no encerramento (ou
+    quando a fila está cheia) para ser retomado na próxima inicialização.
+    """
+    __tablename__ = "pending_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    key: Mapped[str] = mapped_column(String(128), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<PendingJob(id={self.id}, kind={self.kind}, key={self.key})>"
+
+
+class IdempotencyRecord(Base):
+    """
+    Requisição com `Idempotency-Key` (banco principal, compartilhado entre
+    os workers). Enquanto a primeira execução não termina, `status` é nulo
+    e `locked_until` marca até quando ela é considerada em andamento.
+    """
+    __tablename__ = "idempotency_keys"
+
+    identity: Mapped[str] = mapped_column(String(100), primary_key=True)
+    route: Mapped[str] = mapped_column(String(100), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    headers: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    locked_until: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyRecord(route={self.route}, key={self.key}, status={self.status})>"
+
+
+class ReportJob(Base):
+    """
+    Job de geração de relatórios de pacientes. Os artefatos (um arquivo
+    por paciente) ficam em disco; `artifacts` guarda o índice em JSON.
+    """
+    __tablename__ = "report_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    days: Mapped[int] = mapped_column(Integer, nullable=False)
+    patient_ids: Mapped[str] = mapped_column(Text, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False)
+    completed: Mapped[int] = mapped_column(Integer, default=0)
+    artifacts: Mapped[str] = mapped_column(Text, default="{}")
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ReportJob(id={self.id}, status={self.status}, total={self.total})>"
+
+
+class ChangeLogEntry(Base):
+    """
+    Última alteração de um registro (paciente, consulta ou sinal vital),
+    para sincronização incremental por médico.
+
+    `seq` é AUTOINCREMENT: nunca é reutilizado, mesmo quando a entrada
+    anterior do mesmo registro é substituída (compactação).
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id", name="uq_change_log_entity"),
+        Index("ix_change_log_doctor_seq", "doctor_id", "seq"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    entity: Mapped[str] = mapped_column(String(20), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    operation: Mapped[str] = mapped_column(String(10), nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<ChangeLogEntry(seq={self.seq}, entity={self.entity}, id={self.entity_id})>"
+
+
+class SchemaVersion(Base):
+    """
+    Versão do esquema aplicada ao banco: impressão digital do DDL dos
+    modelos, para que a inicialização só crie tabelas quando ele mudar.
+    """
+    __tablename__ = "schema_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<SchemaVersion(fingerprint={self.fingerprint})>"
+
+
+class DoctorShard(Base):
+    """
+    Shard que guarda os dados de um médico (diretório, no banco principal).
+    `moving` bloqueia o acesso enquanto os dados mudam de shard.
+    """
+    __tablename__ = "doctor_shards"
+
+    doctor_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    moving: Mapped[bool] = mapped_column(Boolean, default=False)
+    assigned_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<DoctorShard(doctor_id={self.doctor_id}, shard={self.shard})>"
+
+
+class MaintenanceRun(Base):
+    """
+    Execução da manutenção do banco (agendada ou solicitada por um
+    administrador), no banco principal. `results` guarda, em JSON, a
+    duração e o efeito de cada tarefa em cada shard.
+    """
+    __tablename__ = "maintenance_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    trigger: Mapped[str] = mapped_column(String(20), nullable=False)
+    tasks: Mapped[str] = mapped_column(String(200), nullable=False)
+    shard: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    results: Mapped[str] = mapped_column(Text, default="[]")
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    duration_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<MaintenanceRun(id={self.id}, trigger={self.trigger}, status={self.status})>"
@@ -4,7 +4,7 @@ Schemas para validação de entrada/saída da API.
 """
 
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Any, Optional, List, Union
 from enum import Enum
 
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
@@ -27,6 +27,19 @@ class AppointmentStatus(str, Enum):
     NO_SHOW = "no_show"
 
 
+class CohortGrouping(str, Enum):
+    GENDER = "gender"
+    AGE_BAND = "age_band"
+
+
+class MaintenanceTask(str, Enum):
+    OPTIMIZE = "optimize"
+    ANALYZE = "analyze"
+    CHECKPOINT = "checkpoint"
+    INCREMENTAL_VACUUM = "incremental_vacuum"
+    VACUUM = "vacuum"
+
+
 # ============== Auth Schemas ==============
 
 class LoginRequest(BaseModel):
@@ -184,7 +197,33 @@ class VitalSignResponse(VitalSignBase):
 class VitalSignListResponse(BaseModel):
     """Schema para listagem de sinais vitais."""
     items: List[VitalSignResponse]
-    total: int
+    total: Optional[int] = None
+    has_more: bool = False
+    next_before: Optional[datetime] = None
+    next_before_id: Optional[int] = None
+
+
+class VitalAnomalyResponse(BaseModel):
+    """Schema de resposta para anomalias de sinais vitais."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    patient_id: int
+    vital_sign_id: int
+    metric: str
+    kind: str
+    value: float
+    expected: float
+    z_score: float
+    detected_at: datetime
+
+
+class VitalPercentiles(BaseModel):
+    """Percentis de uma métrica de sinais vitais."""
+    count: int = 0
+    p5: Optional[float] = None
+    p50: Optional[float] = None
+    p95: Optional[float] = None
 
 
 class VitalStatsResponse(BaseModel):
@@ -197,6 +236,29 @@ class VitalStatsResponse(BaseModel):
     min_heart_rate: Optional[int] = None
     max_heart_rate: Optional[int] = None
     total_records: int = 0
+    percentiles: dict[str, VitalPercentiles] = {}
+
+
+class VitalBatchRequest(BaseModel):
+    """Schema para estatísticas e sparklines de vários pacientes."""
+    patient_ids: List[int] = Field(..., min_length=1, max_length=100)
+    days: int = Field(30, ge=1, le=365)
+    points: int = Field(20, ge=2, le=100)
+
+
+class VitalBatchItem(BaseModel):
+    """Estatísticas e sparklines de um paciente no lote."""
+    patient_id: int
+    stats: VitalStatsResponse
+    sparklines: dict[str, List[Optional[float]]] = {}
+
+
+class VitalBatchResponse(BaseModel):
+    """Schema de resposta do lote de estatísticas."""
+    date_from: datetime
+    date_to: datetime
+    points: int
+    items: List[VitalBatchItem]
 
 
 # ============== Appointment Schemas ==============
@@ -259,6 +321,31 @@ class AppointmentListResponse(BaseModel):
     total_pages: int
 
 
+class AppointmentCalendarCell(BaseModel):
+    """Quantidade de consultas de um dia com um status e um tipo."""
+    date: date
+    status: AppointmentStatus
+    appointment_type: str
+    count: int
+
+
+class AppointmentCalendarDay(BaseModel):
+    """Total de consultas de um dia."""
+    date: date
+    total: int
+
+
+class AppointmentCalendarResponse(BaseModel):
+    """Schema de resposta do calendário de consultas."""
+    date_from: date
+    date_to: date
+    total: int
+    by_status: dict[str, int]
+    by_type: dict[str, int]
+    days: List[AppointmentCalendarDay]
+    cells: List[AppointmentCalendarCell]
+
+
 # ============== Dashboard Schemas ==============
 
 class DashboardStatsResponse(BaseModel):
@@ -286,5 +373,194 @@ class VitalChartData(BaseModel):
     oxygen_saturation: List[ChartDataPoint] = []
 
 
+# ============== Analytics Schemas ==============
+
+class MetricSummary(BaseModel):
+    """Resumo estatístico de uma métrica."""
+    count: int = 0
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    p5: Optional[float] = None
+    p25: Optional[float] = None
+    p50: Optional[float] = None
+    p75: Optional[float] = None
+    p95: Optional[float] = None
+
+
+class CohortGroupStats(BaseModel):
+    """Estatísticas de um grupo de pacientes da coorte."""
+    key: str
+    patient_count: int = 0
+    total_readings: int = 0
+    metrics: dict[str, MetricSummary] = {}
+    blood_pressure_classes: dict[str, int] = {}
+
+
+class PatientTrend(BaseModel):
+    """Tendência das métricas de um paciente na janela (unidades por dia)."""
+    patient_id: int
+    blood_pressure_class: Optional[str] = None
+    slopes: dict[str, Optional[float]] = {}
+
+
+class CohortAnalyticsResponse(BaseModel):
+    """Schema de resposta para análise de coorte."""
+    date_from: datetime
+    date_to: datetime
+    group_by: Optional[CohortGrouping] = None
+    overall: CohortGroupStats
+    groups: List[CohortGroupStats] = []
+    trends: List[PatientTrend] = []
+
+
+# ============== Overview Schemas ==============
+
+class PatientOverviewResponse(BaseModel):
+    """
+    Visão consolidada de um paciente. Seções não solicitadas em `include`
+    ficam nulas.
+    """
+    patient: Optional[PatientDetailResponse] = None
+    vitals: Optional[VitalSignListResponse] = None
+    stats: Optional[VitalStatsResponse] = None
+    chart: Optional[VitalChartData] = None
+    appointments: Optional[List[AppointmentResponse]] = None
+
+
+# ============== Batch Schemas ==============
+
+class BatchRequestItem(BaseModel):
+    """Sub-requisição GET de um lote."""
+    id: Optional[str] = Field(None, max_length=64)
+    path: str = Field(..., max_length=2048)
+
+
+class BatchRequest(BaseModel):
+    """Schema para requisições em lote."""
+    requests: List[BatchRequestItem] = Field(..., min_length=1, max_length=20)
+
+
+class BatchResponseItem(BaseModel):
+    """Resultado de uma sub-requisição do lote."""
+    id: Optional[str] = None
+    path: str
+    status: int
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    """Schema de resposta para requisições em lote."""
+    responses: List[BatchResponseItem]
+
+
+# ============== Report Schemas ==============
+
+class ReportJobCreate(BaseModel):
+    """Schema para solicitar relatórios (sem pacientes: toda a carteira)."""
+    patient_ids: Optional[List[int]] = Field(None, min_length=1, max_length=500)
+    days: int = Field(90, ge=1, le=365)
+
+
+class ReportArtifact(BaseModel):
+    """Relatório gerado para um paciente."""
+    patient_id: int
+    url: str
+    version: str
+    cached: bool
+
+
+class ReportJobResponse(BaseModel):
+    """Schema de resposta de um job de relatórios."""
+    id: int
+    status: str
+    days: int
+    total: int
+    completed: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    artifacts: List[ReportArtifact] = []
+
+# ============== Change Feed Schemas ==============
+
+class ChangeEntry(BaseModel):
+    """
+    Alteração de um registro. `data` traz o estado atual do registro, ou
+    nulo se ele não estiver mais disponível.
+    """
+    seq: int
+    entity: str
+    entity_id: int
+    operation: str
+    changed_at: datetime
+    data: Optional[Union[PatientResponse, AppointmentResponse, VitalSignResponse]] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    """Schema de resposta do feed de alterações."""
+    changes: List[ChangeEntry]
+    next_since: int
+    has_more: bool
+
+
+# ============== Admin Schemas ==============
+
+class ShardStats(BaseModel):
+    """Volume de dados de um shard."""
+    shard: int
+    doctors: int
+    patients: int
+    vital_signs: int
+    appointments: int
+
+
+class ShardStatsResponse(BaseModel):
+    """Schema de resposta da visão geral dos shards."""
+    shards: List[ShardStats]
+    total_patients: int
+    total_vital_signs: int
+    total_appointments: int
+
+
+class MaintenanceRunCreate(BaseModel):
+    """Schema para solicitar a manutenção do banco (sem `shard`: todos)."""
+    tasks: List[MaintenanceTask] = Field(
+        default=[
+            MaintenanceTask.OPTIMIZE,
+            MaintenanceTask.ANALYZE,
+            MaintenanceTask.CHECKPOINT,
+            MaintenanceTask.INCREMENTAL_VACUUM,
+        ],
+        min_length=1,
+    )
+    shard: Optional[int] = Field(None, ge=0)
+
+
+class MaintenanceTaskResult(BaseModel):
+    """Duração e efeito de uma tarefa de manutenção em um shard."""
+    shard: int
+    task: str
+    status: str  # completed | skipped | failed
+    duration_ms: float
+    details: dict[str, Any] = {}
+    error: Optional[str] = None
+
+
+class MaintenanceRunResponse(BaseModel):
+    """Schema de resposta de uma execução da manutenção."""
+    id: int
+    trigger: str
+    tasks: List[str]
+    shard: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+    duration_ms: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: List[MaintenanceTaskResult] = []
+
+
 # Update forward references
 PatientDetailResponse.model_rebuild()
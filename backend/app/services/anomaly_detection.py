@@ -0,0 +1,175 @@
+"""
+Vita - Anomaly Detection
+Detecção incremental de anomalias por paciente com médias móveis
+exponenciais (EWMA).
+
+Para cada paciente/métrica é mantido um estado compacto em
+`vital_baselines`:
+
+- média exponencial lenta (linha de base do paciente);
+- média exponencial rápida (nível recente);
+- variância exponencial dos resíduos em torno do nível recente (ruído).
+
+Cada nova leitura é comparada com o estado antes de atualizá-lo:
+
+- spike: |valor - média rápida| / desvio > ANOMALY_Z_THRESHOLD
+- drift: |média rápida - média lenta| / desvio > ANOMALY_DRIFT_THRESHOLD
+  (registrado apenas na transição, não a cada leitura)
+
+Valores extremos são limitados a ±Z desvios antes da atualização, para
+que um pico isolado não desloque as médias.
+
+A atualização é O(1) por leitura e nunca relê o histórico.
+"""
+
+import math
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import VitalSign, VitalBaseline, VitalAnomaly
+
+# Desvio mínimo considerado por métrica, evita z-scores explosivos em
+# pacientes muito estáveis
+MIN_STD = {
+    "heart_rate": 2.0,
+    "systolic_pressure": 3.0,
+    "diastolic_pressure": 2.0,
+    "temperature": 0.15,
+    "oxygen_saturation": 1.0,
+    "respiratory_rate": 1.0,
+    "glucose_level": 5.0,
+    "weight": 0.3,
+}
+
+MONITORED_METRICS = tuple(MIN_STD)
+
+
+def _observe(
+    baseline: VitalBaseline,
+    value: float,
+    vital: VitalSign,
+) -> list[VitalAnomaly]:
+    """Avalia uma leitura contra a linha de base e atualiza o estado."""
+    anomalies: list[VitalAnomaly] = []
+
+    if baseline.count == 0:
+        baseline.mean = value
+        baseline.fast_mean = value
+        baseline.variance = 0.0
+        baseline.count = 1
+        return anomalies
+
+    std = max(math.sqrt(baseline.variance), MIN_STD[baseline.metric])
+    warmed_up = baseline.count >= settings.ANOMALY_MIN_SAMPLES
+    z_threshold = settings.ANOMALY_Z_THRESHOLD
+
+    residual = value - baseline.fast_mean
+    z_score = residual / std
+    if warmed_up and abs(z_score) > z_threshold:
+        anomalies.append(VitalAnomaly(
+            patient_id=vital.patient_id,
+            vital_sign_id=vital.id,
+            metric=baseline.metric,
+            kind="spike",
+            value=value,
+            expected=baseline.fast_mean,
+            z_score=z_score,
+            detected_at=vital.recorded_at,
+        ))
+
+    # Outliers are clipped before updating so a single spike cannot drag
+    # the baselines; a sustained shift still moves them
+    clipped = baseline.fast_mean + max(-z_threshold * std, min(residual, z_threshold * std))
+
+    # Exponentially weighted variance of the short-term residuals (Finch, 2009)
+    alpha = settings.ANOMALY_SLOW_ALPHA
+    baseline.variance = (1 - alpha) * (baseline.variance + alpha * (clipped - baseline.fast_mean) ** 2)
+    baseline.mean += alpha * (clipped - baseline.mean)
+    baseline.fast_mean += settings.ANOMALY_FAST_ALPHA * (clipped - baseline.fast_mean)
+    baseline.count += 1
+
+    drift = (baseline.fast_mean - baseline.mean) / std
+    drifting = warmed_up and abs(drift) > settings.ANOMALY_DRIFT_THRESHOLD
+
+    if drifting and not baseline.drifting:
+        anomalies.append(VitalAnomaly(
+            patient_id=vital.patient_id,
+            vital_sign_id=vital.id,
+            metric=baseline.metric,
+            kind="drift",
+            value=baseline.fast_mean,
+            expected=baseline.mean,
+            z_score=drift,
+            detected_at=vital.recorded_at,
+        ))
+    baseline.drifting = drifting
+
+    return anomalies
+
+
+async def process_vitals(
+    db: AsyncSession,
+    vitals: Sequence[VitalSign],
+) -> list[VitalAnomaly]:
+    """
+    Atualiza as linhas de base com novas leituras e registra anomalias.
+
+    Os registros precisam ter `id` atribuído (após flush). Todos os estados
+    envolvidos são carregados em uma única consulta pela chave
+    (patient_id, metric).
+
+    Args:
+        db: Sessão do banco de dados
+        vitals: Leituras recém inseridas
+
+    Returns:
+        list[VitalAnomaly]: Anomalias detectadas (já adicionadas à sessão)
+    """
+    keys = {
+        (vital.patient_id, metric)
+        for vital in vitals
+        for metric in MONITORED_METRICS
+        if getattr(vital, metric) is not None
+    }
+    if not keys:
+        return []
+
+    result = await db.execute(
+        select(VitalBaseline).where(
+            tuple_(VitalBaseline.patient_id, VitalBaseline.metric).in_(list(keys))
+        )
+    )
+    baselines = {(b.patient_id, b.metric): b for b in result.scalars().all()}
+
+    anomalies: list[VitalAnomaly] = []
+    now = datetime.utcnow()
+
+    for vital in sorted(vitals, key=lambda v: v.recorded_at):
+        for metric in MONITORED_METRICS:
+            value = getattr(vital, metric)
+            if value is None:
+                continue
+
+            baseline = baselines.get((vital.patient_id, metric))
+            if baseline is None:
+                baseline = VitalBaseline(
+                    patient_id=vital.patient_id,
+                    metric=metric,
+                    count=0,
+                    mean=0.0,
+                    variance=0.0,
+                    fast_mean=0.0,
+                    drifting=False,
+                )
+                db.add(baseline)
+                baselines[(vital.patient_id, metric)] = baseline
+
+            anomalies.extend(_observe(baseline, float(value), vital))
+            baseline.updated_at = now
+
+    db.add_all(anomalies)
+    return anomalies
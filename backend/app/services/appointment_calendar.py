@@ -0,0 +1,151 @@
+"""
+Vita - Appointment Calendar
+Contagens de consultas por dia × status × tipo, para a visão mensal.
+
+As contagens saem de uma única consulta agrupada sobre o índice
+(`doctor_id`, `scheduled_at`, `status`, `appointment_type`), sem ler a
+tabela. O resultado é guardado no cache compartilhado entre workers, por
+(médico, mês): uma visão que cruza meses reaproveita os meses já
+calculados e só consulta os que faltam.
+
+As rotas que agendam, alteram ou cancelam consultas invalidam os meses
+afetados (em todos os workers); entradas também expiram após
+`APPOINTMENT_CALENDAR_TTL_SECONDS`, o que limita a defasagem causada por
+escritas feitas fora da API.
+"""
+
+from datetime import date, datetime
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.shared_cache import shared_cache
+from app.models import Appointment
+
+Month = tuple[int, int]
+
+
+class CalendarCell(NamedTuple):
+    """Quantidade de consultas de um dia com um status e um tipo."""
+    day: date
+    status: str
+    appointment_type: str
+    count: int
+
+
+def _month_start(month: Month) -> datetime:
+    return datetime(month[0], month[1], 1)
+
+
+def _next_month(month: Month) -> Month:
+    year, number = month
+    return (year + 1, 1) if number == 12 else (year, number + 1)
+
+
+def _scope(doctor_id: int, month: Month) -> tuple:
+    return ("appointment_calendar", doctor_id, month)
+
+
+def months_between(start: date, end: date) -> list[Month]:
+    """Meses (ano, mês) que intersectam o intervalo, em ordem."""
+    months = []
+    month = (start.year, start.month)
+    while month <= (end.year, end.month):
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+class AppointmentCalendarCache:
+    """Contagens do calendário por médico e mês, carregadas sob demanda."""
+
+    async def counts(
+        self,
+        db: AsyncSession,
+        doctor_id: int,
+        start: date,
+        end: date,
+    ) -> list[CalendarCell]:
+        """
+        Contagens do médico entre `start` e `end` (inclusivos).
+
+        Args:
+            db: Sessão do banco de dados
+            doctor_id: ID do médico
+            start: Primeiro dia
+            end: Último dia
+
+        Returns:
+            list[CalendarCell]: Células ordenadas por dia
+        """
+        months = months_between(start, end)
+        cached: dict[Month, tuple[CalendarCell, ...]] = {}
+        for month in months:
+            scope = _scope(doctor_id, month)
+            cells = shared_cache.get(scope, scope)
+            if cells is not None:
+                cached[month] = cells
+
+        missing = [month for month in months if month not in cached]
+        if missing:
+            cached.update(await self._load(db, doctor_id, missing))
+
+        return [
+            cell
+            for month in months
+            for cell in cached[month]
+            if start <= cell.day <= end
+        ]
+
+    async def _load(
+        self,
+        db: AsyncSession,
+        doctor_id: int,
+        months: list[Month],
+    ) -> dict[Month, tuple[CalendarCell, ...]]:
+        """Calcula os meses pedidos com uma consulta sobre o intervalo que os cobre."""
+        # Months invalidated while the query runs are stored already stale
+        generations = {month: shared_cache.generation(_scope(doctor_id, month)) for month in months}
+
+        day = func.date(Appointment.scheduled_at)
+        result = await db.execute(
+            select(
+                day,
+                Appointment.status,
+                Appointment.appointment_type,
+                func.count(),
+            )
+            .where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.scheduled_at >= _month_start(months[0]),
+                Appointment.scheduled_at < _month_start(_next_month(months[-1])),
+            )
+            .group_by(day, Appointment.status, Appointment.appointment_type)
+            .order_by(day)
+        )
+
+        loaded: dict[Month, list[CalendarCell]] = {month: [] for month in months}
+        for day_value, status, appointment_type, count in result.all():
+            cell_day = date.fromisoformat(day_value)
+            month = (cell_day.year, cell_day.month)
+            if month in loaded:
+                loaded[month].append(CalendarCell(cell_day, status.value, appointment_type, count))
+
+        frozen = {month: tuple(cells) for month, cells in loaded.items()}
+        for month, cells in frozen.items():
+            scope = _scope(doctor_id, month)
+            shared_cache.put(
+                scope, scope, cells, settings.APPOINTMENT_CALENDAR_TTL_SECONDS, generations[month]
+            )
+
+        return frozen
+
+    def invalidate(self, doctor_id: int, moments: Iterable[datetime]) -> None:
+        """Descarta os meses afetados por uma consulta agendada, alterada ou cancelada."""
+        for month in {(moment.year, moment.month) for moment in moments}:
+            shared_cache.invalidate(_scope(doctor_id, month))
+
+
+calendar_cache = AppointmentCalendarCache()
@@ -0,0 +1,194 @@
+"""
+Vita - Change Feed
+Log de alterações por médico para sincronização incremental.
+
+Toda escrita ORM em `Patient`, `Appointment` e `VitalSign` registra, na
+mesma transação, uma entrada em `change_log` com um `seq` crescente:
+
+    insert  registro criado
+    update  registro alterado
+    delete  registro removido ou desativado (paciente com
+            `is_active=False`, consulta cancelada)
+
+Cada registro mantém apenas a sua entrada mais recente: uma nova
+alteração substitui a anterior (`INSERT OR REPLACE`) e recebe um `seq`
+novo, de modo que o log cresce com o número de registros alterados e não
+com o número de escritas. Um cliente que guarda o último `seq` recebido
+obtém, com `since`, exatamente o que mudou desde então.
+
+Como o SQLite serializa as transações de escrita, a ordem dos `seq` é a
+ordem de commit: uma leitura com `since` nunca deixa para trás uma
+entrada confirmada depois com `seq` menor.
+
+Escritas feitas com Core (`insert`/`delete` em massa, como o
+arquivamento de sinais vitais antigos) não passam pelo log.
+"""
+
+from typing import Optional
+
+from sqlalchemy import String, case, event, insert, inspect, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Appointment, AppointmentStatus, ChangeLogEntry, Patient, VitalSign
+
+ENTITIES = {
+    Patient: "patient",
+    Appointment: "appointment",
+    VitalSign: "vital_sign",
+}
+
+# Attribute and value that mark a soft delete
+SOFT_DELETES = {
+    Patient: ("is_active", False),
+    Appointment: ("status", AppointmentStatus.CANCELLED),
+}
+
+
+def _operation(session: Session, obj, state: str) -> Optional[str]:
+    if state == "new":
+        return "insert"
+    if state == "deleted":
+        return "delete"
+    if not session.is_modified(obj, include_collections=False):
+        return None
+
+    soft_delete = SOFT_DELETES.get(type(obj))
+    if soft_delete:
+        attribute, value = soft_delete
+        added = inspect(obj).attrs[attribute].history.added
+        if added and added[0] == value:
+            return "delete"
+    return "update"
+
+
+@event.listens_for(Session, "after_flush")
+def record_changes(session: Session, flush_context) -> None:
+    """Registra no `change_log` as alterações do flush (mesma transação)."""
+    changes = []
+    for state, objects in (
+        ("new", session.new),
+        ("dirty", session.dirty),
+        ("deleted", session.deleted),
+    ):
+        for obj in objects:
+            entity = ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            operation = _operation(session, obj, state)
+            if operation:
+                changes.append((obj, entity, operation))
+
+    if not changes:
+        return
+
+    connection = session.connection()
+
+    # Vital signs belong to the doctor of their patient
+    patient_ids = {obj.patient_id for obj, entity, _ in changes if entity == "vital_sign"}
+    doctors: dict[int, int] = {}
+    if patient_ids:
+        doctors = dict(connection.execute(
+            select(Patient.id, Patient.doctor_id).where(Patient.id.in_(patient_ids))
+        ).all())
+
+    rows = [
+        {
+            "doctor_id": doctors[obj.patient_id] if entity == "vital_sign" else obj.doctor_id,
+            "entity": entity,
+            "entity_id": obj.id,
+            "operation": operation,
+        }
+        for obj, entity, operation in changes
+    ]
+
+    # REPLACE drops the superseded entry of the same record and takes a new seq
+    connection.execute(insert(ChangeLogEntry).prefix_with("OR REPLACE"), rows)
+
+
+async def fetch_changes(
+    db: AsyncSession,
+    doctor_id: int,
+    since: int,
+    limit: int,
+) -> tuple[list[ChangeLogEntry], bool]:
+    """
+    Entradas do médico com `seq` maior que `since`, em ordem.
+
+    Returns:
+        tuple: (entradas, há mais entradas além do limite)
+    """
+    result = await db.execute(
+        select(ChangeLogEntry)
+        .where(ChangeLogEntry.doctor_id == doctor_id, ChangeLogEntry.seq > since)
+        .order_by(ChangeLogEntry.seq)
+        .limit(limit + 1)
+    )
+    entries = list(result.scalars().all())
+    return entries[:limit], len(entries) > limit
+
+
+async def load_records(db: AsyncSession, entries: list[ChangeLogEntry]) -> dict[tuple[str, int], object]:
+    """
+    Estado atual dos registros referenciados pelas entradas, com uma
+    consulta por tipo de entidade.
+
+    Returns:
+        dict: (entidade, id) -> objeto ORM (ausente se o registro não
+        existe mais na tabela, ex.: sinal vital arquivado)
+    """
+    records = {}
+    for model, entity in ENTITIES.items():
+        ids = [e.entity_id for e in entries if e.entity == entity]
+        if not ids:
+            continue
+        result = await db.execute(select(model).where(model.id.in_(ids)))
+        records.update({(entity, obj.id): obj for obj in result.scalars().all()})
+    return records
+
+
+async def ensure_change_log(db: AsyncSession) -> int:
+    """
+    Preenche o log na primeira inicialização após a implantação, com uma
+    entrada por registro já existente.
+
+    Returns:
+        int: Quantidade de entradas criadas
+    """
+    has_entries = (await db.execute(select(ChangeLogEntry.seq).limit(1))).first()
+    if has_entries:
+        return 0
+
+    columns = ["doctor_id", "entity", "entity_id", "operation"]
+
+    def deleted_when(condition):
+        return case((condition, literal("delete", String)), else_=literal("insert", String))
+
+    sources = [
+        select(
+            Patient.doctor_id,
+            literal("patient", String),
+            Patient.id,
+            deleted_when(Patient.is_active.is_(False)),
+        ).order_by(Patient.id),
+        select(
+            Appointment.doctor_id,
+            literal("appointment", String),
+            Appointment.id,
+            deleted_when(Appointment.status == AppointmentStatus.CANCELLED),
+        ).order_by(Appointment.id),
+        select(
+            Patient.doctor_id,
+            literal("vital_sign", String),
+            VitalSign.id,
+            literal("insert", String),
+        ).join(Patient, Patient.id == VitalSign.patient_id).order_by(VitalSign.id),
+    ]
+
+    created = 0
+    for source in sources:
+        result = await db.execute(insert(ChangeLogEntry).from_select(columns, source))
+        created += result.rowcount
+    await db.commit()
+
+    return created
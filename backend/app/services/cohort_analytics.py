@@ -0,0 +1,258 @@
+"""
+Vita - Cohort Analytics
+Estatísticas vetorizadas sobre a população de pacientes de um médico.
+
+Todas as agregações trabalham sobre vetores NumPy alinhados (um elemento
+por leitura) e agrupam por paciente com `np.unique`/`np.bincount`, sem
+laços Python por leitura.
+"""
+
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+AGE_BANDS = (
+    (0, "0-17"),
+    (18, "18-39"),
+    (40, "40-59"),
+    (60, "60-79"),
+    (80, "80+"),
+)
+
+# Classificação da pressão arterial (AHA/ACC 2017), da mais leve para a mais grave
+BLOOD_PRESSURE_CLASSES = (
+    "normal",
+    "elevated",
+    "hypertension_stage_1",
+    "hypertension_stage_2",
+    "hypertensive_crisis",
+)
+
+
+def age_band(birth_date: date, today: date) -> str:
+    """Retorna a faixa etária do paciente na data de referência."""
+    age = today.year - birth_date.year - (
+        (today.month, today.day) < (birth_date.month, birth_date.day)
+    )
+    label = AGE_BANDS[0][1]
+    for lower, band in AGE_BANDS:
+        if age >= lower:
+            label = band
+    return label
+
+
+def summarize(values: np.ndarray) -> dict:
+    """Contagem, média, desvio padrão e percentis dos valores não nulos."""
+    present = values[~np.isnan(values)]
+    if not present.size:
+        return {"count": 0}
+
+    percentiles = np.percentile(present, PERCENTILES)
+    summary = {
+        "count": int(present.size),
+        "mean": round(float(present.mean()), 2),
+        "std": round(float(present.std()), 2),
+    }
+    for p, value in zip(PERCENTILES, percentiles):
+        summary[f"p{p}"] = round(float(value), 2)
+
+    return summary
+
+
+def trend_slopes(
+    index: np.ndarray,
+    days: np.ndarray,
+    values: np.ndarray,
+    groups: int,
+) -> np.ndarray:
+    """
+    Inclinação da reta de mínimos quadrados (unidades por dia) por grupo.
+
+    Args:
+        index: Grupo (paciente) de cada leitura, de 0 a `groups - 1`
+        days: Tempo de cada leitura em dias, relativo ao início da janela
+        values: Valores da métrica (NaN para ausentes)
+        groups: Quantidade de grupos
+
+    Returns:
+        np.ndarray: Inclinação por grupo (NaN com menos de 2 leituras
+        em instantes distintos)
+    """
+    ok = ~np.isnan(values)
+    idx, x, y = index[ok], days[ok], values[ok]
+
+    n = np.bincount(idx, minlength=groups).astype(np.float64)
+    sx = np.bincount(idx, weights=x, minlength=groups)
+    sy = np.bincount(idx, weights=y, minlength=groups)
+    sxy = np.bincount(idx, weights=x * y, minlength=groups)
+    sxx = np.bincount(idx, weights=x * x, minlength=groups)
+
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = (n * sxy - sx * sy) / denominator
+
+    slopes[(n < 2) | (denominator <= 1e-9)] = np.nan
+    return slopes
+
+
+def bucket_means(
+    index: np.ndarray,
+    days: np.ndarray,
+    values: np.ndarray,
+    groups: int,
+    span: float,
+    buckets: int,
+) -> np.ndarray:
+    """
+    Reduz as séries de cada grupo a `buckets` médias em intervalos de tempo
+    iguais (usado para sparklines).
+
+    Args:
+        index: Grupo (paciente) de cada leitura, de 0 a `groups - 1`
+        days: Tempo de cada leitura em dias, relativo ao início da janela
+        values: Valores da métrica (NaN para ausentes)
+        groups: Quantidade de grupos
+        span: Duração da janela em dias
+        buckets: Quantidade de intervalos
+
+    Returns:
+        np.ndarray: Matriz (groups, buckets) com NaN nos intervalos vazios
+    """
+    ok = ~np.isnan(values)
+    bucket = np.clip((days[ok] / span * buckets).astype(np.int64), 0, buckets - 1)
+    cell = index[ok] * buckets + bucket
+
+    total = np.bincount(cell, weights=values[ok], minlength=groups * buckets)
+    count = np.bincount(cell, minlength=groups * buckets)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = total / count
+
+    return means.reshape(groups, buckets)
+
+
+def classify_blood_pressure(systolic: np.ndarray, diastolic: np.ndarray) -> np.ndarray:
+    """
+    Classifica pares de pressão média em índices de `BLOOD_PRESSURE_CLASSES`.
+    Retorna -1 quando alguma das médias está ausente.
+    """
+    with np.errstate(invalid="ignore"):
+        classes = np.select(
+            [
+                (systolic > 180) | (diastolic > 120),
+                (systolic >= 140) | (diastolic >= 90),
+                (systolic >= 130) | (diastolic >= 80),
+                systolic >= 120,
+            ],
+            [4, 3, 2, 1],
+            default=0,
+        )
+
+    classes[np.isnan(systolic) | np.isnan(diastolic)] = -1
+    return classes
+
+
+def _group_summary(
+    key: str,
+    rows: np.ndarray,
+    patients: np.ndarray,
+    series: dict[str, np.ndarray],
+    bp_classes: np.ndarray,
+) -> dict:
+    classes = bp_classes[patients]
+    counts = np.bincount(classes[classes >= 0], minlength=len(BLOOD_PRESSURE_CLASSES))
+
+    return {
+        "key": key,
+        "patient_count": int(patients.size),
+        "total_readings": int(rows.sum()),
+        "metrics": {metric: summarize(values[rows]) for metric, values in series.items()},
+        "blood_pressure_classes": dict(zip(BLOOD_PRESSURE_CLASSES, counts.tolist())),
+    }
+
+
+def compute_cohort(
+    patient_ids: np.ndarray,
+    days: np.ndarray,
+    series: dict[str, np.ndarray],
+    demographics: dict[int, tuple[str, date]],
+    group_by: Optional[str],
+    window_start_day: float,
+    today: date,
+) -> dict:
+    """
+    Calcula as estatísticas de coorte a partir dos vetores de leituras.
+
+    Args:
+        patient_ids: Paciente de cada leitura
+        days: Tempo de cada leitura em dias desde a época Unix
+        series: {métrica: valores float64 com NaN para ausentes}
+        demographics: {patient_id: (gênero, data de nascimento)}
+        group_by: None, "gender" ou "age_band"
+        window_start_day: Início da janela em dias desde a época Unix
+        today: Data de referência para as faixas etárias
+
+    Returns:
+        dict: Resumo geral, resumo por grupo e tendências por paciente
+    """
+    unique_patients, index = np.unique(patient_ids, return_inverse=True)
+    groups = unique_patients.size
+    relative_days = days - window_start_day
+
+    # Per-patient mean pressure drives the blood-pressure classification
+    means = {}
+    for metric in ("systolic_pressure", "diastolic_pressure"):
+        values = series[metric]
+        ok = ~np.isnan(values)
+        total = np.bincount(index[ok], weights=values[ok], minlength=groups)
+        count = np.bincount(index[ok], minlength=groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means[metric] = total / count
+    bp_classes = classify_blood_pressure(means["systolic_pressure"], means["diastolic_pressure"])
+
+    slopes = {
+        metric: trend_slopes(index, relative_days, values, groups)
+        for metric, values in series.items()
+    }
+
+    all_rows = np.ones(index.size, dtype=bool)
+    overall = _group_summary("all", all_rows, np.arange(groups), series, bp_classes)
+
+    grouped = []
+    if group_by:
+        keys = []
+        for patient_id in unique_patients.tolist():
+            gender, birth_date = demographics.get(patient_id, ("unknown", None))
+            if group_by == "gender":
+                keys.append(gender)
+            else:
+                keys.append(age_band(birth_date, today) if birth_date else "unknown")
+
+        labels, patient_group = np.unique(np.array(keys, dtype=object), return_inverse=True)
+        row_group = patient_group[index]
+
+        for g, label in enumerate(labels.tolist()):
+            grouped.append(_group_summary(
+                label,
+                row_group == g,
+                np.flatnonzero(patient_group == g),
+                series,
+                bp_classes,
+            ))
+
+    trends = []
+    for i, patient_id in enumerate(unique_patients.tolist()):
+        trends.append({
+            "patient_id": patient_id,
+            "blood_pressure_class": (
+                BLOOD_PRESSURE_CLASSES[bp_classes[i]] if bp_classes[i] >= 0 else None
+            ),
+            "slopes": {
+                metric: (None if np.isnan(values[i]) else round(float(values[i]), 4))
+                for metric, values in slopes.items()
+            },
+        })
+
+    return {"overall": overall, "groups": grouped, "trends": trends}
@@ -0,0 +1,445 @@
+"""
+Vita - Database Maintenance
+Manutenção periódica dos bancos SQLite (todos os shards).
+
+A cada `DB_MAINTENANCE_INTERVAL_MINUTES` o worker principal executa as
+tarefas leves: `PRAGMA optimize` (atualiza as estatísticas do planejador
+só onde mudaram) e um checkpoint passivo do WAL. Uma vez por dia, dentro
+da janela de baixo tráfego (`DB_MAINTENANCE_WINDOW_*_HOUR`, UTC) e se o
+worker recebeu até `DB_MAINTENANCE_IDLE_REQUESTS_PER_MINUTE` requisições
+por minuto desde a última verificação, executa também o `ANALYZE`
+completo, o checkpoint com TRUNCATE e o vacuum incremental.
+
+O vacuum incremental devolve ao sistema de arquivos as páginas livres
+deixadas por exclusões e pela compactação de sinais vitais, em fatias de
+`DB_MAINTENANCE_VACUUM_PAGES` páginas, cada uma em sua própria transação
+e seguida de uma pausa; na janela ele para se o tráfego subir. Ele exige
+`auto_vacuum=INCREMENTAL`, definido na criação de bancos novos
+(`DB_INCREMENTAL_VACUUM`); bancos existentes são convertidos pela tarefa
+`vacuum` (VACUUM completo, que bloqueia o banco e só roda a pedido de um
+administrador). O checkpoint é ignorado quando o banco não está em WAL.
+
+A primeira execução espera `DB_MAINTENANCE_STARTUP_DELAY_SECONDS`, e as
+execuções não se sobrepõem à retenção nem à compactação de sinais vitais
+(`maintenance_lock`, um lock de arquivo em `DATA_DIR` que vale entre os
+workers, qualquer que seja o que recebeu o pedido). Cada tarefa espera até
+`DB_MAINTENANCE_BUSY_TIMEOUT_MS` pelo lock do arquivo e é repetida, com
+espera crescente, se ainda assim o banco estiver bloqueado.
+
+Cada execução fica em `maintenance_runs` (banco principal) com a duração
+e o efeito de cada tarefa em cada shard.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.db.database import async_session_maker, maintenance_lock, shard_router
+from app.models import MaintenanceRun
+from app.services.job_queue import job_queue
+
+# Execution order: rebuild and free pages first, then refresh the planner
+# statistics, and checkpoint the WAL written by the others last
+TASK_ORDER = ("vacuum", "incremental_vacuum", "analyze", "optimize", "checkpoint")
+PERIODIC_TASKS = ("optimize", "checkpoint")
+WINDOW_TASKS = ("incremental_vacuum", "analyze", "optimize", "checkpoint")
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class TrafficProbe:
+    """Taxa de requisições admitidas por este worker desde a criação."""
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._admitted = admission.metrics["admitted"]
+
+    def requests_per_minute(self) -> float:
+        # Short intervals count as a full minute, so a burst is not diluted
+        elapsed = max(time.monotonic() - self._started, 60.0)
+        return (admission.metrics["admitted"] - self._admitted) * 60 / elapsed
+
+    def idle(self) -> bool:
+        return self.requests_per_minute() <= settings.DB_MAINTENANCE_IDLE_REQUESTS_PER_MINUTE
+
+
+def in_window(now: datetime) -> bool:
+    """Indica se `now` (UTC) está na janela de baixo tráfego."""
+    start = settings.DB_MAINTENANCE_WINDOW_START_HOUR
+    end = settings.DB_MAINTENANCE_WINDOW_END_HOUR
+    if start <= end:
+        return start <= now.hour < end
+    # Window across midnight (ex.: 22h às 4h)
+    return now.hour >= start or now.hour < end
+
+
+def _ordered(tasks: Iterable[str]) -> list[str]:
+    requested = set(tasks)
+    return [task for task in TASK_ORDER if task in requested]
+
+
+# ============== Tasks ==============
+
+async def _pragma(conn: AsyncConnection, statement: str):
+    return (await conn.execute(text(f"PRAGMA {statement}"))).scalar()
+
+
+def _file_bytes(conn: AsyncConnection, suffix: str = "") -> int:
+    database = conn.engine.url.database
+    if not database or database == ":memory:":
+        return 0
+    path = database + suffix
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+async def _stat_rows(conn: AsyncConnection) -> int:
+    exists = await conn.scalar(
+        text("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    )
+    if not exists:
+        return 0
+    return await conn.scalar(text("SELECT count(*) FROM sqlite_stat1"))
+
+
+async def _optimize(conn: AsyncConnection, trigger: str) -> tuple[str, dict]:
+    await conn.execute(text("PRAGMA optimize"))
+    return "completed", {"stat_rows": await _stat_rows(conn)}
+
+
+async def _analyze(conn: AsyncConnection, trigger: str) -> tuple[str, dict]:
+    before = await _stat_rows(conn)
+    await conn.execute(text("ANALYZE"))
+    return "completed", {"stat_rows_before": before, "stat_rows": await _stat_rows(conn)}
+
+
+async def _checkpoint(conn: AsyncConnection, trigger: str) -> tuple[str, dict]:
+    journal_mode = await _pragma(conn, "journal_mode")
+    if journal_mode != "wal":
+        return "skipped", {"journal_mode": journal_mode}
+
+    # Only TRUNCATE waits for readers and writers; the periodic one never blocks
+    mode = "PASSIVE" if trigger == "periodic" else "TRUNCATE"
+    wal_before = _file_bytes(conn, "-wal")
+    busy, wal_frames, checkpointed = (
+        await conn.execute(text(f"PRAGMA wal_checkpoint({mode})"))
+    ).one()
+    return "completed", {
+        "mode": mode.lower(),
+        "busy": bool(busy),
+        "wal_frames": wal_frames,
+        "checkpointed_frames": checkpointed,
+        "wal_bytes_before": wal_before,
+        "wal_bytes_after": _file_bytes(conn, "-wal"),
+    }
+
+
+async def _incremental_vacuum(conn: AsyncConnection, trigger: str) -> tuple[str, dict]:
+    auto_vacuum = AUTO_VACUUM_MODES.get(await _pragma(conn, "auto_vacuum"))
+    free_pages = await _pragma(conn, "freelist_count")
+    if auto_vacuum != "incremental":
+        return "skipped", {"auto_vacuum": auto_vacuum, "free_pages": free_pages}
+
+    page_size = await _pragma(conn, "page_size")
+    file_before = _file_bytes(conn)
+    # sqlite3 steps a statement once, and each step frees a single page:
+    # executescript runs the pragma to completion
+    driver = (await conn.get_raw_connection()).driver_connection
+    probe = TrafficProbe()
+    slices = freed = 0
+    interrupted = False
+
+    while free_pages and slices < settings.DB_MAINTENANCE_VACUUM_MAX_SLICES:
+        await driver.executescript(f"PRAGMA incremental_vacuum({settings.DB_MAINTENANCE_VACUUM_PAGES})")
+        remaining = await _pragma(conn, "freelist_count")
+        freed += free_pages - remaining
+        free_pages = remaining
+        slices += 1
+        if not free_pages:
+            break
+
+        await asyncio.sleep(settings.DB_MAINTENANCE_SLICE_PAUSE_SECONDS)
+        if trigger == "window" and not probe.idle():
+            interrupted = True
+            break
+
+    return "completed", {
+        "slices": slices,
+        "pages_freed": freed,
+        "bytes_freed": freed * page_size,
+        "free_pages_left": free_pages,
+        "file_bytes_before": file_before,
+        "file_bytes_after": _file_bytes(conn),
+        "interrupted": interrupted,
+    }
+
+
+async def _vacuum(conn: AsyncConnection, trigger: str) -> tuple[str, dict]:
+    file_before = _file_bytes(conn)
+    if settings.DB_INCREMENTAL_VACUUM:
+        # Takes effect with the rebuild below
+        await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+    await conn.execute(text("VACUUM"))
+    file_after = _file_bytes(conn)
+    return "completed", {
+        "file_bytes_before": file_before,
+        "file_bytes_after": file_after,
+        "bytes_freed": max(0, file_before - file_after),
+        "auto_vacuum": AUTO_VACUUM_MODES.get(await _pragma(conn, "auto_vacuum")),
+    }
+
+
+TASKS = {
+    "optimize": _optimize,
+    "analyze": _analyze,
+    "checkpoint": _checkpoint,
+    "incremental_vacuum": _incremental_vacuum,
+    "vacuum": _vacuum,
+}
+
+
+def _is_locked(exc: Exception) -> bool:
+    # Raised by SQLAlchemy or, for executescript, directly by sqlite3
+    return "database is locked" in str(exc) or "database table is locked" in str(exc)
+
+
+async def _run_task(conn: AsyncConnection, shard: int, task: str, trigger: str) -> dict:
+    started = time.perf_counter()
+    error = None
+    attempt = 0
+    while True:
+        try:
+            status, details = await TASKS[task](conn, trigger)
+            break
+        except Exception as exc:
+            if not _is_locked(exc) or attempt == settings.DB_MAINTENANCE_LOCK_RETRIES:
+                status, details, error = "failed", {"attempts": attempt + 1}, str(exc)
+                break
+        await asyncio.sleep(2 ** attempt)
+        attempt += 1
+
+    return {
+        "shard": shard,
+        "task": task,
+        "status": status,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "details": details,
+        "error": error,
+    }
+
+
+async def maintain_shard(shard: int, tasks: Iterable[str], trigger: str) -> list[dict]:
+    """
+    Executa as tarefas em um shard, na ordem de `TASK_ORDER`. A falha de
+    uma tarefa é registrada e não impede as seguintes.
+
+    Args:
+        shard: Número do shard
+        tasks: Tarefas (chaves de `TASKS`)
+        trigger: Origem da execução (periodic, window ou admin)
+
+    Returns:
+        list: Resultado de cada tarefa (status, duração e efeito)
+    """
+    results = []
+    async with shard_router.engines[shard].connect() as conn:
+        # VACUUM and the pragmas that write manage their own transactions
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # The connection goes back to the pool afterwards: restore its timeout
+        busy_timeout = await _pragma(conn, "busy_timeout")
+        await conn.execute(text(f"PRAGMA busy_timeout = {settings.DB_MAINTENANCE_BUSY_TIMEOUT_MS}"))
+        try:
+            for task in _ordered(tasks):
+                results.append(await _run_task(conn, shard, task, trigger))
+        finally:
+            await conn.execute(text(f"PRAGMA busy_timeout = {busy_timeout}"))
+    return results
+
+
+# ============== Runs ==============
+
+async def create_run(
+    db: AsyncSession,
+    tasks: Iterable[str],
+    trigger: str,
+    shard: Optional[int] = None,
+) -> MaintenanceRun:
+    """
+    Registra uma execução da manutenção (status `queued`).
+
+    Args:
+        db: Sessão do banco principal
+        tasks: Tarefas a executar
+        trigger: Origem da execução (periodic, window ou admin)
+        shard: Shard alvo (None: todos)
+
+    Returns:
+        MaintenanceRun: Execução criada
+    """
+    run = MaintenanceRun(trigger=trigger, tasks=",".join(_ordered(tasks)), shard=shard)
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+async def request_run(db: AsyncSession, tasks: Iterable[str], shard: Optional[int] = None) -> MaintenanceRun:
+    """
+    Registra uma execução solicitada por um administrador e a enfileira.
+
+    Args:
+        db: Sessão do banco principal
+        tasks: Tarefas a executar
+        shard: Shard alvo (None: todos)
+
+    Returns:
+        MaintenanceRun: Execução criada (status `queued`)
+    """
+    run = await create_run(db, tasks, "admin", shard)
+    await job_queue.enqueue("db_maintenance.run", run.id, {"run_id": run.id})
+    return run
+
+
+async def execute_run(run_id: int) -> Optional[MaintenanceRun]:
+    """
+    Executa uma execução registrada e grava duração e resultados.
+    Execuções já concluídas não são repetidas.
+
+    Args:
+        run_id: ID da execução
+
+    Returns:
+        MaintenanceRun: Execução atualizada (None se não existir)
+    """
+    async with maintenance_lock:
+        async with async_session_maker() as db:
+            run = await db.get(MaintenanceRun, run_id)
+            if run is None or run.status in ("completed", "failed"):
+                return run
+
+            run.status = "running"
+            run.started_at = datetime.utcnow()
+            await db.commit()
+
+            started = time.perf_counter()
+            shards = [run.shard] if run.shard is not None else range(shard_router.count)
+            results = []
+            try:
+                for shard in shards:
+                    results.extend(await maintain_shard(shard, run.tasks.split(","), run.trigger))
+                errors = [
+                    f"shard {result['shard']} {result['task']}: {result['error']}"
+                    for result in results
+                    if result["status"] == "failed"
+                ]
+                run.status = "failed" if errors else "completed"
+                run.error = "; ".join(errors) or None
+            except Exception as exc:
+                run.status = "failed"
+                run.error = str(exc)
+
+            run.results = json.dumps(results)
+            run.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            run.finished_at = datetime.utcnow()
+            await db.commit()
+            return run
+
+
+@job_queue.handler("db_maintenance.run")
+async def process_maintenance_runs(payloads: list[dict]) -> None:
+    """
+    Handler da fila: executa as execuções solicitadas por administradores.
+
+    Args:
+        payloads: [{"run_id": int}, ...]
+    """
+    for run_id in dict.fromkeys(payload["run_id"] for payload in payloads):
+        await execute_run(run_id)
+
+
+async def _window_done(db: AsyncSession, now: datetime) -> bool:
+    """Indica se a janela corrente já teve uma execução completa."""
+    window_start = now.replace(
+        hour=settings.DB_MAINTENANCE_WINDOW_START_HOUR, minute=0, second=0, microsecond=0
+    )
+    if window_start > now:
+        window_start -= timedelta(days=1)
+    found = await db.scalar(
+        select(MaintenanceRun.id)
+        .where(
+            MaintenanceRun.trigger == "window",
+            MaintenanceRun.status == "completed",
+            MaintenanceRun.started_at >= window_start,
+        )
+        .limit(1)
+    )
+    return found is not None
+
+
+async def prune_history(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    Remove as execuções mais antigas que `DB_MAINTENANCE_HISTORY_DAYS`.
+
+    Returns:
+        int: Número de execuções removidas
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=settings.DB_MAINTENANCE_HISTORY_DAYS)
+    result = await db.execute(delete(MaintenanceRun).where(MaintenanceRun.created_at < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+def _summary(run: MaintenanceRun) -> str:
+    results = json.loads(run.results)
+    freed = sum(result["details"].get("bytes_freed", 0) for result in results)
+    analyzed = sum(1 for result in results if result["task"] == "analyze" and result["status"] == "completed")
+    return (
+        f"{analyzed} shards analisados, {freed / 1024:,.0f} KiB devolvidos ao disco "
+        f"({run.duration_ms / 1000:.1f} s)"
+    )
+
+
+async def maintenance_loop() -> None:
+    """
+    Tarefa de background que executa a manutenção periódica e, na janela
+    de baixo tráfego, a diária. Desativada por `DB_MAINTENANCE_ENABLED`.
+    """
+    if not settings.DB_MAINTENANCE_ENABLED:
+        return
+
+    interval = settings.DB_MAINTENANCE_INTERVAL_MINUTES * 60
+    # Startup already runs retention, compaction and the backfills
+    await asyncio.sleep(settings.DB_MAINTENANCE_STARTUP_DELAY_SECONDS)
+    probe = TrafficProbe()
+
+    while True:
+        try:
+            now = datetime.utcnow()
+            trigger, tasks = "periodic", PERIODIC_TASKS
+            async with async_session_maker() as db:
+                if in_window(now) and not await _window_done(db, now):
+                    rate = probe.requests_per_minute()
+                    if rate <= settings.DB_MAINTENANCE_IDLE_REQUESTS_PER_MINUTE:
+                        trigger, tasks = "window", WINDOW_TASKS
+                    else:
+                        print(f"🕒 Manutenção diária do banco adiada ({rate:.0f} req/min)")
+                await prune_history(db, now)
+                run = await create_run(db, tasks, trigger)
+
+            run = await execute_run(run.id)
+            if run.status == "failed":
+                print(f"⚠️  Falha na manutenção do banco: {run.error}")
+            elif trigger == "window":
+                print(f"🧹 Manutenção diária do banco: {_summary(run)}")
+        except Exception as exc:
+            print(f"⚠️  Falha na manutenção do banco: {exc}")
+
+        probe = TrafficProbe()
+        await asyncio.sleep(interval)
@@ -0,0 +1,307 @@
+"""
+Vita - Job Queue
+Fila assíncrona em processo para trabalho derivado de escritas.
+
+Rotas de escrita enfileiram jobs (`kind`, `key`, payload) depois do commit
+e respondem sem esperar pelo processamento. Características:
+
+- capacidade limitada (`JOB_QUEUE_MAX_SIZE` chaves); quando a fila está
+  cheia, `enqueue` espera até `JOB_QUEUE_ENQUEUE_TIMEOUT_SECONDS` e então
+  despeja o job no SQLite, para ser recarregado quando a fila esvaziar;
+- jobs com a mesma (kind, key) são agrupados: enquanto a chave aguarda na
+  fila, novos payloads entram no mesmo lote e o handler recebe a lista;
+- uma mesma chave nunca é processada por dois workers ao mesmo tempo;
+- um lote cujo handler falha é repetido até `JOB_QUEUE_MAX_ATTEMPTS`
+  vezes, com espera de `JOB_QUEUE_RETRY_BACKOFF_SECONDS` dobrada a cada
+  tentativa; enquanto espera, a chave continua ocupada, então payloads
+  novos não passam à frente. Esgotadas as tentativas, os payloads vão
+  para `pending_jobs` e são retomados na próxima inicialização;
+- handlers assíncronos rodam em `JOB_QUEUE_WORKERS` workers; handlers
+  síncronos (`in_thread=True`) rodam em um pool de
+  `JOB_QUEUE_THREAD_WORKERS` threads;
+- no encerramento a fila é drenada por até
+  `JOB_QUEUE_DRAIN_TIMEOUT_SECONDS`; o que sobrar é persistido em
+  `pending_jobs` e recarregado na próxima inicialização.
+
+Payloads precisam ser serializáveis em JSON. Jobs interrompidos pelo
+limite de drenagem são reexecutados (entrega pelo menos uma vez). Com
+`serve.py`, cada worker tem sua fila e todos retomam jobs de
+`pending_jobs`: cada linha é reivindicada por um único worker (removida
+com `DELETE ... RETURNING`).
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from sqlalchemy import select, delete
+
+from app.core.config import settings
+from app.db.database import async_session_maker
+from app.models import PendingJob
+
+JobKey = tuple[str, str]
+
+
+@dataclass
+class JobHandler:
+    """Função que processa um lote de payloads de um tipo de job."""
+    func: Callable[[list[dict]], Any]
+    in_thread: bool = False
+
+
+class JobQueue:
+    """Fila de jobs pós-escrita com agrupamento por chave."""
+
+    def __init__(self):
+        self._handlers: dict[str, JobHandler] = {}
+        self._pending: dict[JobKey, list[dict]] = {}
+        self._queued: set[JobKey] = set()
+        self._running: dict[JobKey, list[dict]] = {}
+        self._attempts: dict[JobKey, int] = {}
+        self._retries: set[asyncio.Task] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._restore_lock: Optional[asyncio.Lock] = None
+        self._spilled = False
+        self._accepting = False
+
+    # ============== Registration ==============
+
+    def handler(self, kind: str, in_thread: bool = False):
+        """Decorator que registra o handler de um tipo de job."""
+        def decorator(func):
+            self._handlers[kind] = JobHandler(func=func, in_thread=in_thread)
+            return func
+        return decorator
+
+    # ============== Lifecycle ==============
+
+    async def start(self) -> int:
+        """
+        Inicia os workers e recarrega os jobs persistidos.
+
+        Returns:
+            int: Quantidade de jobs recarregados do SQLite
+        """
+        self._queue = asyncio.Queue(maxsize=settings.JOB_QUEUE_MAX_SIZE)
+        self._restore_lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.JOB_QUEUE_THREAD_WORKERS,
+            thread_name_prefix="vita-jobs",
+        )
+        self._accepting = True
+        self._spilled = True
+
+        restored = await self._restore()
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(settings.JOB_QUEUE_WORKERS)
+        ]
+        return restored
+
+    async def stop(self) -> int:
+        """
+        Drena a fila e persiste os jobs que não foram concluídos.
+
+        Returns:
+            int: Quantidade de jobs persistidos para a próxima execução
+        """
+        self._accepting = False
+
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.JOB_QUEUE_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        # Batches waiting for a retry are still in _running and get persisted
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        self._attempts.clear()
+
+        leftovers = [
+            (kind, key, payload)
+            for (kind, key), payloads in [*self._running.items(), *self._pending.items()]
+            for payload in payloads
+        ]
+        self._running.clear()
+        self._pending.clear()
+        self._queued.clear()
+
+        await self._persist(leftovers)
+        self._executor.shutdown(wait=True)
+
+        return len(leftovers)
+
+    # ============== Producing ==============
+
+    async def enqueue(self, kind: str, key: Any, payload: dict) -> None:
+        """
+        Enfileira um job. Retorna assim que o job estiver na fila (ou
+        agrupado a um lote pendente, ou persistido).
+
+        Args:
+            kind: Tipo do job (handler registrado)
+            key: Chave de agrupamento (ex.: ID do paciente)
+            payload: Dados do job (serializáveis em JSON)
+
+        Raises:
+            ValueError: Se não houver handler para o tipo
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+
+        if not self._accepting:
+            await self._persist([(kind, str(key), payload)])
+            return
+
+        job_key = (kind, str(key))
+        batch = self._pending.get(job_key)
+        if batch is not None:
+            batch.append(payload)
+            return
+
+        self._pending[job_key] = [payload]
+        if job_key not in self._running:
+            await self._schedule(job_key, wait=True)
+
+    async def _schedule(self, job_key: JobKey, wait: bool) -> None:
+        self._queued.add(job_key)
+        try:
+            if wait:
+                await asyncio.wait_for(
+                    self._queue.put(job_key), settings.JOB_QUEUE_ENQUEUE_TIMEOUT_SECONDS
+                )
+            else:
+                self._queue.put_nowait(job_key)
+        except (asyncio.TimeoutError, asyncio.QueueFull):
+            # Backpressure: the queue stayed full, spill the batch to SQLite
+            self._queued.discard(job_key)
+            payloads = self._pending.pop(job_key, [])
+            await self._persist([(*job_key, payload) for payload in payloads])
+            self._spilled = True
+
+    # ============== Consuming ==============
+
+    async def _worker(self) -> None:
+        while True:
+            job_key = await self._queue.get()
+            self._queued.discard(job_key)
+
+            try:
+                payloads = self._pending.pop(job_key, [])
+                if payloads:
+                    self._running[job_key] = payloads
+                    error = await self._run(job_key[0], payloads)
+                    if error is None:
+                        self._running.pop(job_key, None)
+                        self._attempts.pop(job_key, None)
+                    else:
+                        await self._retry(job_key, payloads, error)
+            finally:
+                self._queue.task_done()
+
+            # Payloads that arrived while the key was running go back in line
+            if (
+                job_key in self._pending
+                and job_key not in self._queued
+                and job_key not in self._running
+            ):
+                await self._schedule(job_key, wait=False)
+
+            if self._spilled and self._queue.empty():
+                await self._restore()
+
+    async def _run(self, kind: str, payloads: list[dict]) -> Optional[Exception]:
+        handler = self._handlers[kind]
+        try:
+            if handler.in_thread:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, handler.func, payloads)
+            else:
+                await handler.func(payloads)
+        except Exception as exc:
+            print(f"⚠️  Falha ao processar job {kind} ({len(payloads)} itens): {exc}")
+            return exc
+        return None
+
+    async def _retry(self, job_key: JobKey, payloads: list[dict], error: Exception) -> None:
+        """Agenda uma nova tentativa do lote ou, esgotadas, o grava em `pending_jobs`."""
+        attempts = self._attempts.get(job_key, 0) + 1
+        if attempts >= settings.JOB_QUEUE_MAX_ATTEMPTS:
+            self._running.pop(job_key, None)
+            self._attempts.pop(job_key, None)
+            await self._persist([(*job_key, payload) for payload in payloads])
+            print(
+                f"⚠️  Job {job_key[0]} gravado em pending_jobs após {attempts} tentativas: {error}"
+            )
+            return
+
+        self._attempts[job_key] = attempts
+        delay = settings.JOB_QUEUE_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+        task = asyncio.create_task(self._requeue(job_key, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(self, job_key: JobKey, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # The failed payloads go ahead of the ones that arrived meanwhile
+        payloads = self._running.pop(job_key, [])
+        self._pending[job_key] = payloads + self._pending.get(job_key, [])
+        if job_key not in self._queued:
+            await self._schedule(job_key, wait=False)
+
+    # ============== Persistence ==============
+
+    async def _persist(self, jobs: list[tuple[str, str, dict]]) -> None:
+        if not jobs:
+            return
+
+        async with async_session_maker() as db:
+            db.add_all([
+                PendingJob(kind=kind, key=key, payload=json.dumps(payload))
+                for kind, key, payload in jobs
+            ])
+            await db.commit()
+
+    async def _restore(self) -> int:
+        """Move jobs persistidos de volta para a fila, até a capacidade livre."""
+        async with self._restore_lock:
+            if not self._spilled:
+                return 0
+
+            free = self._queue.maxsize - self._queue.qsize()
+            async with async_session_maker() as db:
+                # Claim and remove in one statement: other workers restore too
+                result = await db.execute(
+                    delete(PendingJob)
+                    .where(PendingJob.id.in_(
+                        select(PendingJob.id).order_by(PendingJob.id).limit(free)
+                    ))
+                    .returning(PendingJob.id, PendingJob.kind, PendingJob.key, PendingJob.payload)
+                )
+                jobs = sorted(result.all(), key=lambda job: job.id)
+                await db.commit()
+
+            self._spilled = len(jobs) == free
+
+            for job in jobs:
+                if job.kind not in self._handlers:
+                    print(f"⚠️  Job persistido sem handler descartado: {job.kind}")
+                    continue
+
+                job_key = (job.kind, job.key)
+                self._pending.setdefault(job_key, []).append(json.loads(job.payload))
+                if job_key not in self._queued and job_key not in self._running:
+                    await self._schedule(job_key, wait=False)
+
+            return len(jobs)
+
+
+job_queue = JobQueue()
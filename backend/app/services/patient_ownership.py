@@ -0,0 +1,69 @@
+"""
+Vita - Patient Ownership
+Cache dos IDs de pacientes de cada médico para verificação de acesso.
+
+As rotas com escopo de paciente só precisam saber se o paciente pertence
+ao médico autenticado. Em vez de carregar a linha completa de `Patient` a
+cada requisição, o conjunto compacto de IDs do médico é carregado uma vez
+e a verificação vira um teste de pertinência em memória.
+
+O conjunto fica no cache compartilhado entre workers. É invalidado (em
+todos os workers) quando pacientes são criados ou desativados e expira
+após `PATIENT_OWNERSHIP_TTL_SECONDS`, o que limita a defasagem causada por
+escritas feitas fora da API (seed, scripts).
+"""
+
+from typing import Iterable
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.shared_cache import shared_cache
+from app.models import Patient
+
+
+PATIENT_IDS_QUERY = select(Patient.id).where(Patient.doctor_id == bindparam("doctor_id"))
+
+
+def _scope(doctor_id: int) -> tuple:
+    return ("patient_ownership", doctor_id)
+
+
+class PatientOwnershipCache:
+    """Conjuntos de IDs de pacientes por médico, carregados sob demanda."""
+
+    async def patient_ids(self, db: AsyncSession, doctor_id: int) -> frozenset[int]:
+        """
+        Retorna os IDs dos pacientes do médico (ativos e inativos).
+
+        Args:
+            db: Sessão do banco de dados
+            doctor_id: ID do médico
+
+        Returns:
+            frozenset[int]: IDs dos pacientes
+        """
+        scope = _scope(doctor_id)
+        ids = shared_cache.get(scope, scope)
+        if ids is not None:
+            return ids
+
+        # A set loaded across a concurrent invalidation is stored already stale
+        generation = shared_cache.generation(scope)
+        result = await db.execute(PATIENT_IDS_QUERY, {"doctor_id": doctor_id})
+        ids = frozenset(result.scalars().all())
+
+        shared_cache.put(scope, scope, ids, settings.PATIENT_OWNERSHIP_TTL_SECONDS, generation)
+        return ids
+
+    async def owns(self, db: AsyncSession, doctor_id: int, patient_ids: Iterable[int]) -> bool:
+        """Verifica se todos os pacientes informados pertencem ao médico."""
+        return frozenset(patient_ids) <= await self.patient_ids(db, doctor_id)
+
+    def invalidate(self, doctor_id: int) -> None:
+        """Descarta o conjunto do médico (após criar ou desativar pacientes)."""
+        shared_cache.invalidate(_scope(doctor_id))
+
+
+ownership_cache = PatientOwnershipCache()
@@ -0,0 +1,48 @@
+"""
+Vita - Post-Write Jobs
+Handlers da fila de jobs para o trabalho derivado das escritas.
+
+    vitals.ingested  (chave: paciente) - anomalias e sketches de quantis
+
+Os handlers são registrados na inicialização por `register`.
+"""
+
+from sqlalchemy import select
+
+from app.db.database import shard_router
+from app.models import VitalSign
+from app.services import anomaly_detection, quantile_sketches
+from app.services.job_queue import JobQueue
+
+
+async def process_ingested_vitals(payloads: list[dict]) -> None:
+    """
+    Atualiza linhas de base, anomalias e sketches diários de um paciente
+    com um lote de leituras recém gravadas, em uma única transação.
+
+    Args:
+        payloads: [{"vital_sign_id": int, "doctor_id": int}, ...]
+    """
+    ids = [payload["vital_sign_id"] for payload in payloads]
+    # One patient per batch, so one doctor and one shard
+    session_maker = await shard_router.sessionmaker_for(payloads[0].get("doctor_id"))
+
+    async with session_maker() as db:
+        result = await db.execute(select(VitalSign).where(VitalSign.id.in_(ids)))
+        vitals = result.scalars().all()
+        if not vitals:
+            return
+
+        await anomaly_detection.process_vitals(db, vitals)
+        await quantile_sketches.add_vitals(db, vitals)
+        await db.commit()
+
+
+def register(queue: JobQueue) -> None:
+    """
+    Registra os handlers pós-escrita na fila.
+
+    Args:
+        queue: Fila de jobs do processo
+    """
+    queue.handler("vitals.ingested")(process_ingested_vitals)
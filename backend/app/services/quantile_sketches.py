@@ -0,0 +1,274 @@
+"""
+Vita - Quantile Sketches
+Sketches de quantis mergeáveis por paciente/métrica/dia.
+
+Como toda métrica de `VitalSignBase` tem faixa validada (ge/le), cada
+sketch é um histograma de resolução fixa sobre essa faixa, guardado de
+forma esparsa (índices de bins + contagens). Sketches diários são somados
+para responder percentis sobre qualquer janela, com custo proporcional ao
+número de dias e bins, e não ao número de leituras.
+
+Garantias de erro (percentil por posto mais próximo, nearest-rank):
+    - métricas inteiras (resolução 1): resultado exato;
+    - temperatura e peso (resolução 0.1) e altura (resolução 0.5): o valor
+      retornado difere no máximo meia resolução de um valor real com o
+      posto pedido.
+A janela é arredondada para dias UTC inteiros.
+"""
+
+import math
+from collections import defaultdict
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+from annotated_types import Ge, Le
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient, VitalSign, VitalDailySketch
+from app.schemas import VitalSignBase
+from app.services import vital_partitions
+
+PERCENTILES = (5, 50, 95)
+
+FLOAT_RESOLUTION = {
+    "temperature": 0.1,
+    "weight": 0.1,
+    "height": 0.5,
+}
+
+
+def _build_specs() -> dict[str, tuple[float, float, int]]:
+    """(mínimo, resolução, quantidade de bins) por métrica de `VitalSignBase`."""
+    specs = {}
+    for name, field in VitalSignBase.model_fields.items():
+        bounds = {type(m): m for m in field.metadata if isinstance(m, (Ge, Le))}
+        if Ge not in bounds or Le not in bounds:
+            continue
+
+        low, high = float(bounds[Ge].ge), float(bounds[Le].le)
+        resolution = FLOAT_RESOLUTION.get(name, 1.0)
+        specs[name] = (low, resolution, int(round((high - low) / resolution)) + 1)
+    return specs
+
+
+SKETCH_SPECS = _build_specs()
+METRICS = tuple(SKETCH_SPECS)
+
+
+def to_bins(metric: str, values: np.ndarray) -> np.ndarray:
+    """Converte valores da métrica em índices de bin."""
+    low, resolution, size = SKETCH_SPECS[metric]
+    bins = np.rint((np.asarray(values, dtype=np.float64) - low) / resolution)
+    return np.clip(bins, 0, size - 1).astype(np.uint16)
+
+
+def encode(bins: np.ndarray, counts: np.ndarray) -> bytes:
+    """Serializa um sketch esparso (bins em ordem crescente)."""
+    return bins.astype("<u2").tobytes() + counts.astype("<u4").tobytes()
+
+
+def decode(blob: bytes) -> tuple[np.ndarray, np.ndarray]:
+    size = len(blob) // 6
+    bins = np.frombuffer(blob, dtype="<u2", count=size)
+    counts = np.frombuffer(blob, dtype="<u4", count=size, offset=size * 2)
+    return bins, counts
+
+
+def _merge(sketches: Sequence[bytes], bins: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Soma sketches esparsos (e bins avulsos com contagem 1)."""
+    all_bins = [decode(s)[0] for s in sketches]
+    all_counts = [decode(s)[1] for s in sketches]
+    if bins is not None and bins.size:
+        all_bins.append(bins)
+        all_counts.append(np.ones(bins.size, dtype=np.uint32))
+
+    if not all_bins:
+        return np.empty(0, dtype=np.uint16), np.empty(0, dtype=np.uint32)
+
+    merged, inverse = np.unique(np.concatenate(all_bins), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate(all_counts)).astype(np.uint32)
+    return merged, counts
+
+
+def quantiles(metric: str, bins: np.ndarray, counts: np.ndarray) -> dict:
+    """Percentis por posto mais próximo a partir de um sketch mesclado."""
+    total = int(counts.sum())
+    if not total:
+        return {"count": 0}
+
+    low, resolution, _ = SKETCH_SPECS[metric]
+    cumulative = np.cumsum(counts, dtype=np.int64)
+    result = {"count": total}
+
+    for p in PERCENTILES:
+        rank = max(1, math.ceil(p / 100 * total))
+        position = int(np.searchsorted(cumulative, rank))
+        result[f"p{p}"] = round(low + int(bins[position]) * resolution, 2)
+
+    return result
+
+
+async def add_vitals(db: AsyncSession, vitals: Sequence[VitalSign]) -> None:
+    """
+    Incorpora novas leituras aos sketches diários (chamado na ingestão).
+    Todos os sketches afetados são carregados em uma única consulta.
+    """
+    pending: dict[tuple, list] = defaultdict(list)
+    for vital in vitals:
+        day = vital.recorded_at.date()
+        for metric in METRICS:
+            value = getattr(vital, metric)
+            if value is not None:
+                pending[(vital.patient_id, day, metric)].append(value)
+
+    if not pending:
+        return
+
+    result = await db.execute(
+        select(VitalDailySketch).where(
+            tuple_(
+                VitalDailySketch.patient_id,
+                VitalDailySketch.day,
+                VitalDailySketch.metric,
+            ).in_(list(pending))
+        )
+    )
+    existing = {(s.patient_id, s.day, s.metric): s for s in result.scalars().all()}
+
+    for key, values in pending.items():
+        patient_id, day, metric = key
+        sketch = existing.get(key)
+        previous = [sketch.bins] if sketch else []
+        bins, counts = _merge(previous, to_bins(metric, np.array(values)))
+
+        if sketch is None:
+            sketch = VitalDailySketch(patient_id=patient_id, day=day, metric=metric)
+            db.add(sketch)
+
+        sketch.bins = encode(bins, counts)
+        sketch.count = int(counts.sum())
+
+
+async def window_percentiles(
+    db: AsyncSession,
+    patient_id: int,
+    start: date,
+    end: Optional[date] = None,
+) -> dict[str, dict]:
+    """
+    Percentis de todas as métricas no intervalo de dias [start, end].
+
+    Args:
+        db: Sessão do banco de dados
+        patient_id: ID do paciente
+        start: Primeiro dia (UTC) da janela
+        end: Último dia (UTC) da janela
+
+    Returns:
+        dict: {métrica: {"count", "p5", "p50", "p95"}}
+    """
+    percentiles = await batch_window_percentiles(db, [patient_id], start, end)
+    return percentiles[patient_id]
+
+
+async def batch_window_percentiles(
+    db: AsyncSession,
+    patient_ids: Sequence[int],
+    start: date,
+    end: Optional[date] = None,
+) -> dict[int, dict[str, dict]]:
+    """
+    Percentis de `window_percentiles` para vários pacientes em uma consulta.
+
+    Returns:
+        dict: {patient_id: {métrica: {"count", "p5", "p50", "p95"}}}
+    """
+    query = select(
+        VitalDailySketch.patient_id, VitalDailySketch.metric, VitalDailySketch.bins
+    ).where(
+        VitalDailySketch.patient_id.in_(patient_ids),
+        VitalDailySketch.day >= start,
+    )
+    if end:
+        query = query.where(VitalDailySketch.day <= end)
+
+    blobs: dict[tuple, list[bytes]] = defaultdict(list)
+    for patient_id, metric, blob in (await db.execute(query)).all():
+        blobs[(patient_id, metric)].append(blob)
+
+    percentiles = {}
+    for patient_id in patient_ids:
+        percentiles[patient_id] = {}
+        for metric in METRICS:
+            bins, counts = _merge(blobs.get((patient_id, metric), []))
+            percentiles[patient_id][metric] = quantiles(metric, bins, counts)
+
+    return percentiles
+
+
+async def rebuild_patient_sketches(db: AsyncSession, patient_id: int) -> int:
+    """
+    Reconstrói os sketches de um paciente a partir do histórico completo
+    (tabela quente e segmentos arquivados).
+
+    Returns:
+        int: Quantidade de sketches gravados
+    """
+    timestamps, series = await vital_partitions.fetch_series(db, patient_id, METRICS)
+    days = timestamps.astype("M8[D]")
+    written = 0
+
+    await db.execute(
+        delete(VitalDailySketch).where(VitalDailySketch.patient_id == patient_id)
+    )
+
+    for metric, values in series.items():
+        present = ~np.isnan(values)
+        if not present.any():
+            continue
+
+        _, _, size = SKETCH_SPECS[metric]
+        keys = days[present].astype(np.int64) * size + to_bins(metric, values[present])
+        unique_keys, counts = np.unique(keys, return_counts=True)
+
+        # unique_keys is sorted, so each day's bins are contiguous
+        key_days, key_bins = np.divmod(unique_keys, size)
+        boundaries = np.flatnonzero(np.diff(key_days)) + 1
+
+        first_days = key_days[np.concatenate(([0], boundaries))]
+
+        for day, day_bins, day_counts in zip(
+            first_days.tolist(), np.split(key_bins, boundaries), np.split(counts, boundaries)
+        ):
+            db.add(VitalDailySketch(
+                patient_id=patient_id,
+                day=np.datetime64(day, "D").item(),
+                metric=metric,
+                count=int(day_counts.sum()),
+                bins=encode(day_bins, day_counts),
+            ))
+            written += 1
+
+    return written
+
+
+async def ensure_sketches(db: AsyncSession) -> int:
+    """
+    Constrói os sketches na primeira inicialização após a implantação,
+    quando já existem sinais vitais mas nenhum sketch.
+
+    Returns:
+        int: Quantidade de pacientes processados
+    """
+    has_sketches = (await db.execute(select(VitalDailySketch.id).limit(1))).first()
+    if has_sketches:
+        return 0
+
+    patient_ids = (await db.execute(select(Patient.id))).scalars().all()
+    for patient_id in patient_ids:
+        await rebuild_patient_sketches(db, patient_id)
+        await db.commit()
+
+    return len(patient_ids)
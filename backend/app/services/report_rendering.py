@@ -0,0 +1,210 @@
+"""
+Vita - Report Rendering
+Renderização do relatório HTML de um paciente (gráficos em SVG inline).
+
+Executado nos processos do pool de relatórios: as funções recebem apenas
+dados já carregados (dicts, listas e arrays numpy) e não acessam o banco
+nem a configuração, para que os processos filhos sejam leves.
+"""
+
+import html
+import os
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+# Bump when the layout changes so cached artifacts are re-rendered
+RENDERER_VERSION = "1"
+
+CHART_POINTS = 120
+CHART_WIDTH = 640
+CHART_HEIGHT = 160
+
+CHARTS = (
+    ("heart_rate", "Frequência cardíaca", "bpm", 0),
+    ("systolic_pressure", "Pressão sistólica", "mmHg", 0),
+    ("diastolic_pressure", "Pressão diastólica", "mmHg", 0),
+    ("temperature", "Temperatura", "°C", 1),
+    ("oxygen_saturation", "Saturação de O₂", "%", 0),
+)
+
+STATUS_LABELS = {
+    "scheduled": "Agendada",
+    "confirmed": "Confirmada",
+    "in_progress": "Em andamento",
+    "completed": "Concluída",
+    "cancelled": "Cancelada",
+    "no_show": "Não compareceu",
+}
+
+STYLE = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; color: #1f2937; margin: 32px; }
+h1 { margin: 0 0 4px; font-size: 24px; }
+h2 { margin: 32px 0 12px; font-size: 18px; border-bottom: 1px solid #e5e7eb; padding-bottom: 4px; }
+.meta { color: #6b7280; font-size: 13px; }
+table { border-collapse: collapse; width: 100%; font-size: 13px; }
+th, td { text-align: left; padding: 6px 8px; border-bottom: 1px solid #f3f4f6; vertical-align: top; }
+th { color: #6b7280; font-weight: 600; }
+.chart { margin-bottom: 16px; }
+.chart h3 { margin: 0 0 4px; font-size: 14px; }
+.empty { color: #9ca3af; font-style: italic; }
+"""
+
+
+def _text(value) -> str:
+    return html.escape(str(value)) if value not in (None, "") else "—"
+
+
+def _number(value: Optional[float], decimals: int = 1) -> str:
+    return "—" if value is None else f"{value:.{decimals}f}".replace(".", ",")
+
+
+def _downsample(days: np.ndarray, values: np.ndarray, span: float) -> np.ndarray:
+    """Médias em `CHART_POINTS` intervalos iguais da janela (NaN nos vazios)."""
+    ok = ~np.isnan(values)
+    bucket = np.clip((days[ok] / span * CHART_POINTS).astype(np.int64), 0, CHART_POINTS - 1)
+    total = np.bincount(bucket, weights=values[ok], minlength=CHART_POINTS)
+    count = np.bincount(bucket, minlength=CHART_POINTS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return total / count
+
+
+def _svg_chart(means: np.ndarray, unit: str, decimals: int) -> str:
+    present = np.flatnonzero(~np.isnan(means))
+    if present.size == 0:
+        return '<p class="empty">Sem leituras no período.</p>'
+
+    low, high = float(np.nanmin(means)), float(np.nanmax(means))
+    if high - low < 1e-9:
+        low, high = low - 1, high + 1
+
+    pad = 8
+    x_step = (CHART_WIDTH - 2 * pad) / (CHART_POINTS - 1)
+    y_scale = (CHART_HEIGHT - 2 * pad) / (high - low)
+
+    # Gaps (empty buckets) break the line into separate segments
+    segments = np.split(present, np.flatnonzero(np.diff(present) > 1) + 1)
+    lines = []
+    for segment in segments:
+        coordinates = " ".join(
+            f"{pad + i * x_step:.1f},{CHART_HEIGHT - pad - (means[i] - low) * y_scale:.1f}"
+            for i in segment.tolist()
+        )
+        if segment.size == 1:
+            x, y = coordinates.split(",")
+            lines.append(f'<circle cx="{x}" cy="{y}" r="2" fill="#2563eb"/>')
+        else:
+            lines.append(
+                f'<polyline points="{coordinates}" fill="none" stroke="#2563eb" stroke-width="1.5"/>'
+            )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" '
+        f'viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}">'
+        f'<rect width="100%" height="100%" fill="#f9fafb"/>'
+        f'<text x="{pad}" y="{pad + 10}" font-size="10" fill="#6b7280">'
+        f'{_number(high, decimals)} {html.escape(unit)}</text>'
+        f'<text x="{pad}" y="{CHART_HEIGHT - pad}" font-size="10" fill="#6b7280">'
+        f'{_number(low, decimals)} {html.escape(unit)}</text>'
+        + "".join(lines)
+        + "</svg>"
+    )
+
+
+def _stats_table(stats: dict, percentiles: dict) -> str:
+    rows = []
+    for metric, label, unit, decimals in CHARTS:
+        p = percentiles.get(metric) or {}
+        rows.append(
+            f"<tr><td>{label}</td><td>{_number(stats.get(metric), decimals)} {unit}</td>"
+            f"<td>{_number(p.get('p5'), decimals)}</td><td>{_number(p.get('p50'), decimals)}</td>"
+            f"<td>{_number(p.get('p95'), decimals)}</td></tr>"
+        )
+    return (
+        "<table><thead><tr><th>Métrica</th><th>Média</th><th>P5</th><th>P50</th><th>P95</th>"
+        "</tr></thead><tbody>" + "".join(rows) + "</tbody></table>"
+        f'<p class="meta">{stats.get("total_records", 0)} leituras no período · '
+        f'FC mín. {_number(stats.get("min_heart_rate"), 0)} · '
+        f'FC máx. {_number(stats.get("max_heart_rate"), 0)} bpm</p>'
+    )
+
+
+def _appointments_table(appointments: list[dict]) -> str:
+    if not appointments:
+        return '<p class="empty">Nenhuma consulta no período.</p>'
+
+    rows = "".join(
+        f"<tr><td>{_text(a['scheduled_at'][:16].replace('T', ' '))}</td>"
+        f"<td>{_text(a['appointment_type'])}</td>"
+        f"<td>{_text(STATUS_LABELS.get(a['status'], a['status']))}</td>"
+        f"<td>{_text(a['reason'])}</td><td>{_text(a['diagnosis'])}</td>"
+        f"<td>{_text(a['prescription'])}</td></tr>"
+        for a in appointments
+    )
+    return (
+        "<table><thead><tr><th>Data</th><th>Tipo</th><th>Status</th><th>Motivo</th>"
+        "<th>Diagnóstico</th><th>Prescrição</th></tr></thead><tbody>" + rows + "</tbody></table>"
+    )
+
+
+def render_report(data: dict) -> str:
+    """
+    Monta o HTML do relatório de um paciente.
+
+    Args:
+        data: Dados do relatório (ver `reports.collect_report_data`)
+
+    Returns:
+        str: Documento HTML completo
+    """
+    patient = data["patient"]
+    window = data["window"]
+    series = data["series"]
+
+    charts = []
+    for metric, label, unit, decimals in CHARTS:
+        means = _downsample(series["days"], series[metric], window["days"])
+        charts.append(
+            f'<div class="chart"><h3>{label}</h3>{_svg_chart(means, unit, decimals)}</div>'
+        )
+
+    birth_date = date.fromisoformat(patient["birth_date"])
+    date_from = date.fromisoformat(window["date_from"])
+    date_to = date.fromisoformat(window["date_to"])
+
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f"<title>Relatório - {html.escape(patient['full_name'])}</title>"
+        f"<style>{STYLE}</style></head><body>"
+        f"<h1>{html.escape(patient['full_name'])}</h1>"
+        f'<p class="meta">Nascimento {birth_date:%d/%m/%Y} · {_text(patient["gender"])} · '
+        f'Tipo sanguíneo {_text(patient["blood_type"])} · Alergias {_text(patient["allergies"])}</p>'
+        f'<p class="meta">Período: {date_from:%d/%m/%Y} a {date_to:%d/%m/%Y} '
+        f"({window['days']} dias)</p>"
+        "<h2>Estatísticas</h2>"
+        + _stats_table(data["stats"], data["percentiles"])
+        + "<h2>Sinais vitais</h2>"
+        + "".join(charts)
+        + "<h2>Consultas</h2>"
+        + _appointments_table(data["appointments"])
+        + "</body></html>"
+    )
+
+
+def render_report_file(path: str, data: dict) -> int:
+    """
+    Renderiza o relatório direto no arquivo de destino (escrita atômica).
+
+    Returns:
+        int: Tamanho do arquivo em bytes
+    """
+    content = render_report(data).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as fh:
+        fh.write(content)
+    os.replace(temporary, path)
+
+    return len(content)
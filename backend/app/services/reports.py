@@ -0,0 +1,348 @@
+"""
+Vita - Patient Reports
+Jobs de geração de relatórios de pacientes.
+
+`POST /api/reports` cria um `ReportJob` e o enfileira na fila de jobs
+(`reports.render`, chave: ID do job). O handler processa os pacientes em
+blocos de `REPORT_CHUNK_SIZE`:
+
+- os dados de cada bloco são buscados em lote, com as mesmas consultas
+  agrupadas das rotas de sinais vitais (estatísticas, percentis e séries)
+  e uma única consulta de consultas;
+- cada relatório é identificado pela versão dos seus dados (hash do
+  conteúdo + versão do layout). Se o arquivo dessa versão já existe em
+  disco, é reaproveitado;
+- os que faltam são renderizados em paralelo em um `ProcessPoolExecutor`
+  (`REPORT_PROCESS_WORKERS`, padrão: um por núcleo), que grava o HTML
+  direto no arquivo final, sem bloquear o event loop;
+- depois do bloco, as versões substituídas de cada paciente são apagadas
+  quando não são usadas há mais de `REPORT_ARTIFACT_TTL_HOURS` (jobs
+  recentes que apontam para elas continuam baixáveis nesse intervalo).
+
+A janela do relatório é em dias inteiros (até o fim do dia atual), de modo
+que pedidos repetidos no mesmo dia, sem dados novos, não renderizam nada.
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.database import shard_router
+from app.models import Appointment, Patient, ReportJob
+from app.services import quantile_sketches, vital_partitions
+from app.services.job_queue import job_queue
+from app.services.report_rendering import CHARTS, RENDERER_VERSION, render_report_file
+
+REPORTS_DIR = "reports"
+
+CHART_METRICS = tuple(metric for metric, *_ in CHARTS)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _renderer() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: children must not inherit the event loop or open connections
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_renderer() -> None:
+    """Encerra os processos de renderização (no desligamento da aplicação)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def artifact_path(patient_id: int, version: str) -> Path:
+    """Arquivo do relatório de um paciente em uma versão dos dados."""
+    return Path(settings.DATA_DIR) / REPORTS_DIR / f"patient-{patient_id}" / f"{version}.html"
+
+
+def prune_artifacts(patient_id: int, current: str) -> int:
+    """
+    Apaga as versões substituídas do relatório de um paciente que não são
+    usadas há mais de `REPORT_ARTIFACT_TTL_HOURS`. A versão atual tem o
+    horário de modificação renovado, marcando seu último uso.
+
+    Args:
+        patient_id: ID do paciente
+        current: Versão atual (mantida)
+
+    Returns:
+        int: Arquivos apagados
+    """
+    keep = artifact_path(patient_id, current)
+    try:
+        os.utime(keep)
+    except FileNotFoundError:
+        pass
+
+    cutoff = (datetime.now() - timedelta(hours=settings.REPORT_ARTIFACT_TTL_HOURS)).timestamp()
+    removed = 0
+    # Also sweeps *.tmp files left behind by a renderer that died mid-write
+    for path in keep.parent.glob("*.html*"):
+        if path == keep:
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Removed concurrently by another job
+            continue
+    return removed
+
+
+def report_window(days: int, now: Optional[datetime] = None) -> tuple[datetime, datetime]:
+    """Janela do relatório em dias inteiros, terminando no fim do dia atual."""
+    today = (now or datetime.utcnow()).date()
+    return (
+        datetime.combine(today - timedelta(days=days - 1), time.min),
+        datetime.combine(today, time.max),
+    )
+
+
+def data_version(data: dict) -> str:
+    """Hash do conteúdo do relatório e da versão do layout."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(RENDERER_VERSION.encode())
+
+    series = data["series"]
+    scalars = {key: value for key, value in data.items() if key != "series"}
+    digest.update(json.dumps(scalars, sort_keys=True, default=str).encode())
+    for key in sorted(series):
+        digest.update(key.encode())
+        digest.update(np.ascontiguousarray(series[key]).tobytes())
+
+    return digest.hexdigest()
+
+
+async def collect_report_data(
+    db: AsyncSession,
+    patient_ids: Sequence[int],
+    days: int,
+) -> dict[int, dict]:
+    """
+    Busca em lote os dados dos relatórios de vários pacientes: dados
+    cadastrais, estatísticas, percentis, séries e consultas do período.
+
+    Returns:
+        dict: {patient_id: dados do relatório}
+    """
+    start, end = report_window(days)
+
+    patients = (
+        await db.execute(select(Patient).where(Patient.id.in_(patient_ids)))
+    ).scalars().all()
+
+    stats = await vital_partitions.batch_vital_stats(db, patient_ids, start=start, end=end)
+    percentiles = await quantile_sketches.batch_window_percentiles(
+        db, patient_ids, start.date(), end.date()
+    )
+    row_patients, row_days, series = await vital_partitions.fetch_patients_series(
+        db, patient_ids, CHART_METRICS, start, end
+    )
+
+    appointments_result = await db.execute(
+        select(Appointment)
+        .where(
+            Appointment.patient_id.in_(patient_ids),
+            Appointment.scheduled_at >= start,
+            Appointment.scheduled_at <= end,
+        )
+        .order_by(Appointment.scheduled_at.desc())
+    )
+    appointments: dict[int, list[dict]] = {patient_id: [] for patient_id in patient_ids}
+    for a in appointments_result.scalars().all():
+        appointments[a.patient_id].append({
+            "scheduled_at": a.scheduled_at.isoformat(),
+            "appointment_type": a.appointment_type,
+            "status": a.status.value,
+            "reason": a.reason,
+            "diagnosis": a.diagnosis,
+            "prescription": a.prescription,
+        })
+
+    # Group the series rows by patient, in chronological order
+    start_day = (start - datetime(1970, 1, 1)) / timedelta(days=1)
+    order = np.lexsort((row_days, row_patients))
+    row_patients, row_days = row_patients[order], row_days[order] - start_day
+    series = {metric: values[order] for metric, values in series.items()}
+
+    by_id = {patient.id: patient for patient in patients}
+    data = {}
+    for patient_id in patient_ids:
+        patient = by_id.get(patient_id)
+        if patient is None:
+            continue
+
+        lo, hi = np.searchsorted(row_patients, [patient_id, patient_id + 1]).tolist()
+        raw = stats[patient.id]
+        data[patient.id] = {
+            "patient": {
+                "full_name": patient.full_name,
+                "birth_date": patient.birth_date.isoformat(),
+                "gender": patient.gender,
+                "blood_type": patient.blood_type,
+                "allergies": patient.allergies,
+            },
+            "window": {
+                "days": days,
+                "date_from": start.date().isoformat(),
+                "date_to": end.date().isoformat(),
+            },
+            "stats": {
+                **{metric: raw[key] for metric, key in vital_partitions.STAT_METRICS.items()},
+                "min_heart_rate": raw["min_heart_rate"],
+                "max_heart_rate": raw["max_heart_rate"],
+                "total_records": raw["total_records"],
+            },
+            "percentiles": percentiles[patient.id],
+            "series": {
+                "days": row_days[lo:hi],
+                **{metric: values[lo:hi] for metric, values in series.items()},
+            },
+            "appointments": appointments[patient.id],
+        }
+
+    return data
+
+
+# ============== Jobs ==============
+
+async def create_job(db: AsyncSession, doctor_id: int, patient_ids: list[int], days: int) -> ReportJob:
+    """
+    Registra um job de relatórios e o enfileira para processamento.
+
+    Args:
+        db: Sessão do banco de dados
+        doctor_id: ID do médico
+        patient_ids: Pacientes (já autorizados)
+        days: Período em dias
+
+    Returns:
+        ReportJob: Job criado (status `queued`)
+    """
+    job = ReportJob(
+        doctor_id=doctor_id,
+        days=days,
+        patient_ids=json.dumps(patient_ids),
+        total=len(patient_ids),
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    await job_queue.enqueue("reports.render", job.id, {"job_id": job.id, "doctor_id": doctor_id})
+    return job
+
+
+async def _render_chunk(
+    session_maker: async_sessionmaker, patient_ids: list[int], days: int
+) -> dict[str, dict]:
+    """Busca os dados de um bloco e renderiza o que não estiver em cache."""
+    async with session_maker() as db:
+        data = await collect_report_data(db, patient_ids, days)
+
+    loop = asyncio.get_running_loop()
+    artifacts: dict[str, dict] = {}
+    pending = []
+
+    for patient_id, report in data.items():
+        version = data_version(report)
+        path = artifact_path(patient_id, version)
+        cached = path.exists()
+        artifacts[str(patient_id)] = {"version": version, "cached": cached}
+        if not cached:
+            pending.append(
+                loop.run_in_executor(_renderer(), render_report_file, str(path), report)
+            )
+
+    await asyncio.gather(*pending)
+
+    for patient_id, artifact in artifacts.items():
+        await asyncio.to_thread(prune_artifacts, int(patient_id), artifact["version"])
+    return artifacts
+
+
+async def run_job(job_id: int, doctor_id: Optional[int] = None) -> None:
+    """
+    Processa um job de relatórios, bloco a bloco, registrando o progresso.
+
+    Args:
+        job_id: ID do job
+        doctor_id: Médico dono do job (define o shard; None para jobs
+            enfileirados antes do sharding)
+    """
+    session_maker = await shard_router.sessionmaker_for(doctor_id)
+
+    async with session_maker() as db:
+        job = await db.get(ReportJob, job_id)
+        if job is None or job.status == "completed":
+            return
+
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.completed = 0
+        job.artifacts = "{}"
+        job.error = None
+        await db.commit()
+
+        patient_ids = json.loads(job.patient_ids)
+        days = job.days
+
+    artifacts: dict[str, dict] = {}
+    try:
+        for offset in range(0, len(patient_ids), settings.REPORT_CHUNK_SIZE):
+            chunk = patient_ids[offset:offset + settings.REPORT_CHUNK_SIZE]
+            artifacts.update(await _render_chunk(session_maker, chunk, days))
+
+            async with session_maker() as db:
+                job = await db.get(ReportJob, job_id)
+                job.completed = min(offset + len(chunk), job.total)
+                job.artifacts = json.dumps(artifacts)
+                await db.commit()
+    except Exception as exc:
+        async with session_maker() as db:
+            job = await db.get(ReportJob, job_id)
+            job.status = "failed"
+            job.error = str(exc) or type(exc).__name__
+            job.finished_at = datetime.utcnow()
+            await db.commit()
+        raise
+
+    async with session_maker() as db:
+        job = await db.get(ReportJob, job_id)
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        await db.commit()
+
+
+@job_queue.handler("reports.render")
+async def process_report_jobs(payloads: list[dict]) -> None:
+    """
+    Handler da fila: executa os jobs de relatórios do lote.
+
+    Args:
+        payloads: [{"job_id": int, "doctor_id": int}, ...]
+    """
+    jobs = {payload["job_id"]: payload.get("doctor_id") for payload in payloads}
+    for job_id, doctor_id in jobs.items():
+        await run_job(job_id, doctor_id)
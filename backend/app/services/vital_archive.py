@@ -0,0 +1,372 @@
+"""
+Vita - Columnar Vitals Archive
+Formato colunar para segmentos arquivados de sinais vitais.
+
+Cada arquivo guarda um paciente/mês como vetores tipados (um por coluna),
+ordenados por `recorded_at`. Colunas numéricas são gravadas como diferenças
+entre linhas consecutivas (inteiros; floats pela menor escala decimal exata)
+comprimidas com zlib, e decodificadas uma vez por segmento aberto. Quando a
+compressão não ganha espaço, a coluna fica descomprimida e alinhada, lida
+por `mmap` com views NumPy sem cópia. Ausência de valor é representada por
+um bitmap de validade (`np.packbits`).
+
+Layout do arquivo:
+
+    b"VCOL" | versão (u4) | tamanho do cabeçalho (u8) | cabeçalho JSON
+    | blocos de dados alinhados em 8 bytes
+
+Codecs por coluna:
+    raw   - vetor tipado, com bitmap de validade opcional
+    delta - diferenças inteiras comprimidas com zlib, com bitmap opcional
+    const - todas as linhas têm o mesmo valor (guardado no cabeçalho)
+    null  - todas as linhas são nulas (nada é gravado)
+    zlib  - lista JSON comprimida (usada para `notes`)
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+MAGIC = b"VCOL"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+PREAMBLE = struct.Struct("<4sIQ")
+ALIGNMENT = 8
+OPEN_SEGMENTS_CACHE_SIZE = 256
+MAX_DECIMAL_SCALE = 4
+DELTA_DTYPES = ("<i1", "<i2", "<i4", "<i8")
+
+COLUMN_DTYPES = {
+    "id": "<i8",
+    "recorded_at": "<M8[us]",
+    "recorded_by": "<i4",
+    "heart_rate": "<u1",
+    "systolic_pressure": "<u2",
+    "diastolic_pressure": "<u1",
+    "temperature": "<f8",
+    "oxygen_saturation": "<u1",
+    "respiratory_rate": "<u1",
+    "weight": "<f8",
+    "height": "<f8",
+    "glucose_level": "<u2",
+}
+
+METRIC_COLUMNS = (
+    "heart_rate",
+    "systolic_pressure",
+    "diastolic_pressure",
+    "temperature",
+    "oxygen_saturation",
+    "respiratory_rate",
+    "weight",
+    "height",
+    "glucose_level",
+)
+
+TEXT_COLUMNS = ("notes",)
+
+
+def _pad(buffer: bytearray) -> None:
+    buffer.extend(b"\0" * (-len(buffer) % ALIGNMENT))
+
+
+def _integer_form(array: np.ndarray) -> Optional[tuple[np.ndarray, int]]:
+    """
+    Representação inteira exata da coluna e sua escala decimal.
+    Retorna None para floats sem escala exata até `MAX_DECIMAL_SCALE`.
+    """
+    if array.dtype.kind != "f":
+        return array.view("<i8") if array.dtype.kind == "M" else array.astype("<i8"), 0
+
+    for scale in range(MAX_DECIMAL_SCALE + 1):
+        scaled = np.round(array * 10 ** scale)
+        if np.abs(scaled).max() >= 2 ** 53:
+            return None
+        if np.array_equal(scaled / 10 ** scale, array):
+            return scaled.astype("<i8"), scale
+    return None
+
+
+def _delta_payload(array: np.ndarray, present: np.ndarray) -> Optional[tuple[bytes, dict]]:
+    """Diferenças consecutivas no menor tipo inteiro que as cobre, comprimidas."""
+    form = _integer_form(array)
+    if form is None:
+        return None
+    integers, scale = form
+
+    # Nulls repeat the previous value so they don't add two large deltas
+    previous = np.maximum.accumulate(np.where(present, np.arange(present.size), 0))
+    integers = integers[previous]
+
+    deltas = np.diff(integers)
+    low, high = (int(deltas.min()), int(deltas.max())) if deltas.size else (0, 0)
+    dtype = next(
+        d for d in DELTA_DTYPES if np.iinfo(d).min <= low and high <= np.iinfo(d).max
+    )
+
+    payload = zlib.compress(deltas.astype(dtype).tobytes())
+    return payload, {"base": int(integers[0]), "dtype": dtype, "scale": scale}
+
+
+def _encode_column(name: str, values: list, blocks: bytearray) -> dict:
+    present = [v is not None for v in values]
+
+    if not any(present):
+        return {"codec": "null"}
+
+    if all(present) and len(set(values)) == 1:
+        value = values[0]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        return {"codec": "const", "value": value}
+
+    dtype = np.dtype(COLUMN_DTYPES[name])
+    filled = [v if v is not None else 0 for v in values]
+    if dtype.kind == "M":
+        array = np.array(filled, dtype="M8[us]")
+    else:
+        array = np.array(filled, dtype=dtype)
+
+    encoded = _delta_payload(array, np.array(present, dtype=bool))
+    if encoded is not None and len(encoded[0]) < array.nbytes:
+        payload, params = encoded
+        meta = {"codec": "delta", "offset": len(blocks), "size": len(payload), **params}
+        blocks.extend(payload)
+    else:
+        meta = {"codec": "raw", "offset": len(blocks)}
+        blocks.extend(array.tobytes())
+    _pad(blocks)
+
+    if not all(present):
+        meta["valid"] = len(blocks)
+        blocks.extend(np.packbits(np.array(present, dtype=bool)).tobytes())
+        _pad(blocks)
+
+    return meta
+
+
+def encode_segment(patient_id: int, rows: list[dict]) -> bytes:
+    """
+    Serializa as linhas de um paciente/mês no formato colunar.
+
+    Args:
+        patient_id: ID do paciente dono do segmento
+        rows: Linhas com as colunas de `VitalSign` (`recorded_at` como datetime)
+
+    Returns:
+        bytes: Conteúdo do arquivo
+    """
+    rows = sorted(rows, key=lambda r: r["recorded_at"])
+    blocks = bytearray()
+    columns = {}
+
+    for name in COLUMN_DTYPES:
+        columns[name] = _encode_column(name, [r[name] for r in rows], blocks)
+
+    for name in TEXT_COLUMNS:
+        values = [r.get(name) for r in rows]
+        if any(v is not None for v in values):
+            payload = zlib.compress(json.dumps(values).encode("utf-8"))
+            columns[name] = {"codec": "zlib", "offset": len(blocks), "size": len(payload)}
+            blocks.extend(payload)
+            _pad(blocks)
+        else:
+            columns[name] = {"codec": "null"}
+
+    header = bytearray(json.dumps(
+        {"rows": len(rows), "patient_id": patient_id, "columns": columns},
+        separators=(",", ":"),
+    ).encode("utf-8"))
+    header.extend(b" " * (-len(header) % ALIGNMENT))
+
+    return PREAMBLE.pack(MAGIC, VERSION, len(header)) + bytes(header) + bytes(blocks)
+
+
+def write_segment(target: Path, patient_id: int, rows: list[dict]) -> int:
+    """Grava o segmento de forma atômica e retorna o tamanho em bytes."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+
+    with open(tmp, "wb") as fh:
+        fh.write(encode_segment(patient_id, rows))
+    os.replace(tmp, target)
+    _forget(target)
+
+    return target.stat().st_size
+
+
+class ColumnarSegment:
+    """
+    Segmento colunar aberto via `mmap`.
+    Colunas `raw` são expostas como views NumPy sobre o arquivo mapeado;
+    colunas `delta` são decodificadas no primeiro acesso e guardadas.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_size = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Arquivo de segmento inválido: {path}")
+
+        header = json.loads(bytes(self._map[PREAMBLE.size:PREAMBLE.size + header_size]))
+        self._data_offset = PREAMBLE.size + header_size
+        self._columns: dict = header["columns"]
+        self.rows: int = header["rows"]
+        self.patient_id: int = header["patient_id"]
+        self._decoded: dict[str, np.ndarray] = {}
+
+    def _view(self, dtype: str, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(
+            self._map, dtype=dtype, count=count, offset=self._data_offset + offset
+        )
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Retorna a coluna como vetor NumPy. Posições nulas contêm zero;
+        use `valid` para distingui-las.
+        """
+        meta = self._columns[name]
+        dtype = COLUMN_DTYPES[name]
+
+        if meta["codec"] == "raw":
+            return self._view(dtype, meta["offset"], self.rows)
+        if meta["codec"] == "delta":
+            values = self._decoded.get(name)
+            if values is None:
+                values = self._decoded[name] = self._decode_delta(name, meta)
+            return values
+        if meta["codec"] == "const":
+            value = meta["value"]
+            if name == "recorded_at":
+                value = np.datetime64(value, "us")
+            return np.full(self.rows, value, dtype=dtype)
+        return np.zeros(self.rows, dtype=dtype)
+
+    def _decode_delta(self, name: str, meta: dict) -> np.ndarray:
+        start = self._data_offset + meta["offset"]
+        deltas = np.frombuffer(
+            zlib.decompress(self._map[start:start + meta["size"]]), dtype=meta["dtype"]
+        )
+
+        integers = np.empty(self.rows, dtype="<i8")
+        integers[0] = meta["base"]
+        np.cumsum(deltas, dtype="<i8", out=integers[1:])
+        integers[1:] += meta["base"]
+
+        dtype = np.dtype(COLUMN_DTYPES[name])
+        if dtype.kind == "M":
+            values = integers.view(dtype)
+        elif dtype.kind == "f":
+            values = integers / 10 ** meta["scale"]
+        else:
+            values = integers.astype(dtype)
+
+        # Same contract as raw columns: zero where null, read-only
+        mask = self.valid(name)
+        if mask is not None:
+            values[~mask] = 0
+        values.flags.writeable = False
+        return values
+
+    def valid(self, name: str) -> Optional[np.ndarray]:
+        """
+        Máscara booleana de valores presentes.
+        Retorna None quando todos os valores da coluna estão presentes.
+        """
+        meta = self._columns[name]
+
+        if meta["codec"] == "null":
+            return np.zeros(self.rows, dtype=bool)
+        if "valid" not in meta:
+            return None
+
+        packed = self._view("u1", meta["valid"], (self.rows + 7) // 8)
+        return np.unpackbits(packed, count=self.rows).astype(bool)
+
+    def has_values(self, name: str) -> bool:
+        return self._columns[name]["codec"] != "null"
+
+    def window(self, start: Optional[datetime], end: Optional[datetime]) -> slice:
+        """Intervalo de linhas com `recorded_at` dentro de [start, end]."""
+        timestamps = self.column("recorded_at")
+        lo = np.searchsorted(timestamps, np.datetime64(start, "us"), "left") if start else 0
+        hi = np.searchsorted(timestamps, np.datetime64(end, "us"), "right") if end else self.rows
+        return slice(int(lo), int(hi))
+
+    def text(self, name: str) -> list:
+        meta = self._columns[name]
+        if meta["codec"] == "null":
+            return [None] * self.rows
+
+        start = self._data_offset + meta["offset"]
+        payload = self._map[start:start + meta["size"]]
+        return json.loads(zlib.decompress(payload))
+
+    def to_rows(self, window: slice = slice(None)) -> list[dict]:
+        """Materializa as linhas do intervalo como dicionários Python."""
+        count = len(range(*window.indices(self.rows)))
+        data = {"patient_id": [self.patient_id] * count}
+
+        for name in COLUMN_DTYPES:
+            values = self.column(name)[window]
+            if name == "recorded_at":
+                values = values.astype(datetime)
+            values = values.tolist()
+
+            mask = self.valid(name)
+            if mask is not None:
+                values = [v if ok else None for v, ok in zip(values, mask[window])]
+            data[name] = values
+
+        for name in TEXT_COLUMNS:
+            data[name] = self.text(name)[window]
+
+        return [
+            {name: values[i] for name, values in data.items()}
+            for i in range(count)
+        ]
+
+
+_open_segments: "OrderedDict[tuple, ColumnarSegment]" = OrderedDict()
+_open_segments_lock = Lock()
+
+
+def _forget(path: Path) -> None:
+    with _open_segments_lock:
+        for key in [k for k in _open_segments if k[0] == str(path)]:
+            del _open_segments[key]
+
+
+def open_segment(path: Path) -> ColumnarSegment:
+    """
+    Abre (ou reaproveita) o mapeamento de um segmento.
+    Mantém um LRU de arquivos mapeados; o mapeamento é liberado pelo
+    coletor quando nenhuma view o referencia mais.
+    """
+    key = (str(path), path.stat().st_mtime_ns)
+
+    with _open_segments_lock:
+        segment = _open_segments.get(key)
+        if segment is not None:
+            _open_segments.move_to_end(key)
+            return segment
+
+    segment = ColumnarSegment(path)
+
+    with _open_segments_lock:
+        _open_segments[key] = segment
+        while len(_open_segments) > OPEN_SEGMENTS_CACHE_SIZE:
+            _open_segments.popitem(last=False)
+
+    return segment
@@ -0,0 +1,372 @@
+"""
+Vita - Vital Signs Compaction
+Compactação das leituras brutas antigas de sinais vitais.
+
+Monitores gravam uma leitura a cada poucos segundos; passada a janela
+aguda, essa resolução não é mais lida, mas continua pesando nos índices e
+em toda varredura. A compactação substitui as leituras de cada intervalo
+por um único registro com as médias do intervalo (`recorded_at` = início
+do intervalo): por minuto após `VITALS_COMPACTION_MINUTE_AFTER_DAYS` dias
+e por hora após `VITALS_COMPACTION_HOUR_AFTER_DAYS`. O número de leituras
+substituídas, quantas tinham cada métrica e o mínimo/máximo de cada
+métrica ficam em `vital_rollups`; no nível por hora, os agregados por
+minuto são recombinados ponderados por essas contagens, e as estatísticas
+e contagens de leituras (`vital_partitions`, `vital_counters`) também.
+
+Ficam como estão os intervalos com uma única leitura (nada a ganhar), as
+leituras com observações e as que geraram eventos de anomalia. Os sketches
+de quantis não são alterados: continuam descrevendo as leituras brutas.
+
+As trocas passam pelo ORM, então os contadores diários e o log de
+alterações são atualizados na mesma transação. Cada paciente avança em
+transações de até `VITALS_COMPACTION_CHUNK_ROWS` leituras, com uma pausa
+entre elas para não segurar o lock de escrita; `vital_compaction_marks`
+guarda até onde cada paciente já foi compactado em cada nível.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import Integer, and_, case, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.shared_cache import shared_cache
+from app.db.database import maintenance_lock, shard_router
+from app.models import Patient, VitalAnomaly, VitalCompactionMark, VitalRollup, VitalSign
+from app.services.vital_archive import METRIC_COLUMNS
+
+EPOCH = datetime(1970, 1, 1)
+
+INTEGER_METRICS = frozenset(
+    metric for metric in METRIC_COLUMNS
+    if isinstance(VitalSign.__table__.c[metric].type, Integer)
+)
+
+
+@dataclass
+class CompactionReport:
+    """Resultado de uma execução da compactação."""
+    patients: int = 0
+    rows_removed: int = 0  # leituras substituídas
+    rows_written: int = 0  # registros agregados gravados
+    bytes_reclaimed: int = 0
+    duration_ms: float = 0.0
+
+    @property
+    def rows_reclaimed(self) -> int:
+        return self.rows_removed - self.rows_written
+
+    @classmethod
+    def total(cls, reports: Iterable["CompactionReport"]) -> "CompactionReport":
+        """Soma os relatórios de vários shards (a duração é a do mais lento)."""
+        total = cls()
+        for report in reports:
+            total.patients += report.patients
+            total.rows_removed += report.rows_removed
+            total.rows_written += report.rows_written
+            total.bytes_reclaimed += report.bytes_reclaimed
+            total.duration_ms = max(total.duration_ms, report.duration_ms)
+        return total
+
+
+def tiers() -> list[tuple[int, int]]:
+    """
+    Níveis ativos como (segundos do intervalo, idade mínima em dias), do
+    mais grosso ao mais fino: leituras antigas vão direto para a hora, sem
+    passar por agregados por minuto.
+    """
+    configured = (
+        (3600, settings.VITALS_COMPACTION_HOUR_AFTER_DAYS),
+        (60, settings.VITALS_COMPACTION_MINUTE_AFTER_DAYS),
+    )
+    return [(seconds, days) for seconds, days in configured if days > 0]
+
+
+def bucket_start(value: datetime, seconds: int) -> datetime:
+    """Início do intervalo de `seconds` segundos (alinhado ao UTC) de `value`."""
+    step = timedelta(seconds=seconds)
+    return EPOCH + (value - EPOCH) // step * step
+
+
+def _average(metric: str, value: float) -> float:
+    return round(value) if metric in INTEGER_METRICS else round(value, 2)
+
+
+async def _used_bytes(db: AsyncSession) -> int:
+    """Bytes ocupados no arquivo (páginas em uso, fora da lista de livres)."""
+    connection = await db.connection()
+    page_size = (await connection.execute(text("PRAGMA page_size"))).scalar()
+    page_count = (await connection.execute(text("PRAGMA page_count"))).scalar()
+    free_pages = (await connection.execute(text("PRAGMA freelist_count"))).scalar()
+    return (page_count - free_pages) * page_size
+
+
+def rollup_samples(rollup: VitalRollup, metric: Optional[str] = None) -> int:
+    """Leituras substituídas pelo agregado (as que tinham `metric`, se dada)."""
+    count = getattr(rollup, f"{metric}_count") if metric else None
+    return rollup.sample_count if count is None else count
+
+
+def _aggregate(
+    vitals: Sequence[VitalSign],
+    rollups: dict[int, VitalRollup],
+    start: datetime,
+    seconds: int,
+) -> tuple[VitalSign, VitalRollup]:
+    first = vitals[0]
+    aggregate = VitalSign(patient_id=first.patient_id, recorded_by=first.recorded_by, recorded_at=start)
+    rollup = VitalRollup(
+        patient_id=first.patient_id,
+        bucket_start=start,
+        bucket_seconds=seconds,
+        # A previous (finer) aggregate stands for all the readings it replaced
+        sample_count=sum(
+            rollup_samples(rollups[vital.id]) if vital.id in rollups else 1 for vital in vitals
+        ),
+    )
+
+    for metric in METRIC_COLUMNS:
+        total = weight = 0
+        low = high = None
+        for vital in vitals:
+            value = getattr(vital, metric)
+            if value is None:
+                continue
+            previous = rollups.get(vital.id)
+            samples = rollup_samples(previous, metric) if previous else 1
+            vital_low = getattr(previous, f"{metric}_min") if previous else value
+            vital_high = getattr(previous, f"{metric}_max") if previous else value
+
+            total += value * samples
+            weight += samples
+            low = vital_low if low is None else min(low, vital_low)
+            high = vital_high if high is None else max(high, vital_high)
+
+        setattr(rollup, f"{metric}_count", weight)
+        if weight:
+            setattr(aggregate, metric, _average(metric, total / weight))
+            setattr(rollup, f"{metric}_min", low)
+            setattr(rollup, f"{metric}_max", high)
+
+    return aggregate, rollup
+
+
+async def _compact_rows(
+    db: AsyncSession,
+    vitals: Sequence[VitalSign],
+    seconds: int,
+) -> tuple[int, int]:
+    """
+    Substitui as leituras de cada intervalo por um registro agregado.
+
+    Returns:
+        tuple: (leituras removidas, registros agregados gravados)
+    """
+    groups: dict[tuple, list[VitalSign]] = defaultdict(list)
+    for vital in vitals:
+        groups[(bucket_start(vital.recorded_at, seconds), vital.recorded_by)].append(vital)
+
+    groups = {key: group for key, group in groups.items() if len(group) > 1}
+    if not groups:
+        return 0, 0
+
+    ids = [vital.id for group in groups.values() for vital in group]
+    result = await db.execute(select(VitalRollup).where(VitalRollup.vital_sign_id.in_(ids)))
+    rollups = {rollup.vital_sign_id: rollup for rollup in result.scalars().all()}
+
+    pending = []
+    for (start, _), group in groups.items():
+        aggregate, rollup = _aggregate(group, rollups, start, seconds)
+        db.add(aggregate)
+        pending.append((aggregate, rollup))
+        for vital in group:
+            await db.delete(vital)
+    for rollup in rollups.values():
+        await db.delete(rollup)
+
+    # Ids of the aggregates are only known after the flush
+    await db.flush()
+    for aggregate, rollup in pending:
+        rollup.vital_sign_id = aggregate.id
+        db.add(rollup)
+
+    return len(ids), len(pending)
+
+
+async def backfill_rollup_counts(db: AsyncSession) -> list[int]:
+    """
+    Preenche as contagens por métrica dos agregados gravados antes de elas
+    existirem: todas as leituras do intervalo contam para cada métrica que
+    o agregado tem (mínimo presente), e nenhuma para as demais.
+
+    Returns:
+        list[int]: Pacientes com agregados preenchidos
+    """
+    legacy = and_(*(getattr(VitalRollup, f"{m}_count").is_(None) for m in METRIC_COLUMNS))
+    patient_ids = (await db.execute(
+        select(VitalRollup.patient_id).where(legacy).distinct()
+    )).scalars().all()
+    if not patient_ids:
+        return []
+
+    await db.execute(
+        update(VitalRollup).where(legacy).values({
+            f"{metric}_count": case(
+                (getattr(VitalRollup, f"{metric}_min").is_not(None), VitalRollup.sample_count),
+                else_=0,
+            )
+            for metric in METRIC_COLUMNS
+        })
+    )
+    return list(patient_ids)
+
+
+async def _set_mark(db: AsyncSession, patient_id: int, seconds: int, until: datetime) -> None:
+    mark = await db.get(VitalCompactionMark, (patient_id, seconds))
+    if mark is None:
+        db.add(VitalCompactionMark(patient_id=patient_id, bucket_seconds=seconds, compacted_until=until))
+    else:
+        mark.compacted_until = until
+
+
+async def compact_patient(
+    db: AsyncSession,
+    patient_id: int,
+    seconds: int,
+    cutoff: datetime,
+) -> tuple[int, int]:
+    """
+    Compacta as leituras do paciente anteriores a `cutoff` em intervalos de
+    `seconds` segundos, a partir de onde a execução anterior parou. Cada
+    bloco de até `VITALS_COMPACTION_CHUNK_ROWS` leituras é confirmado em
+    sua própria transação.
+
+    Args:
+        db: Sessão do banco de dados
+        patient_id: ID do paciente
+        seconds: Duração do intervalo (60 ou 3600)
+        cutoff: Leituras a partir deste instante não são tocadas
+
+    Returns:
+        tuple: (leituras removidas, registros agregados gravados)
+    """
+    # A bucket never straddles the cutoff
+    cutoff = bucket_start(cutoff, seconds)
+    mark = await db.get(VitalCompactionMark, (patient_id, seconds))
+    start = mark.compacted_until if mark else None
+    if start is not None and start >= cutoff:
+        return 0, 0
+
+    flagged = select(VitalAnomaly.vital_sign_id).where(VitalAnomaly.patient_id == patient_id)
+    removed = written = 0
+
+    while True:
+        query = select(VitalSign).where(
+            VitalSign.patient_id == patient_id,
+            VitalSign.recorded_at < cutoff,
+            VitalSign.notes.is_(None),
+            VitalSign.id.not_in(flagged),
+        )
+        if start is not None:
+            query = query.where(VitalSign.recorded_at >= start)
+        query = query.order_by(VitalSign.recorded_at, VitalSign.id).limit(
+            settings.VITALS_COMPACTION_CHUNK_ROWS
+        )
+        vitals = (await db.execute(query)).scalars().all()
+
+        full = len(vitals) == settings.VITALS_COMPACTION_CHUNK_ROWS
+        next_start = cutoff
+        if full:
+            # The last bucket may continue past the chunk: it goes to the next one
+            last = bucket_start(vitals[-1].recorded_at, seconds)
+            if bucket_start(vitals[0].recorded_at, seconds) != last:
+                vitals = [vital for vital in vitals if vital.recorded_at < last]
+            next_start = last
+
+        chunk_removed, chunk_written = await _compact_rows(db, vitals, seconds)
+        if full and not chunk_removed and next_start == bucket_start(vitals[0].recorded_at, seconds):
+            # A single bucket filled the chunk and nothing in it could be merged
+            next_start += timedelta(seconds=seconds)
+
+        await _set_mark(db, patient_id, seconds, next_start)
+        await db.commit()
+
+        removed += chunk_removed
+        written += chunk_written
+        if not full:
+            break
+
+        start = next_start
+        await asyncio.sleep(settings.VITALS_COMPACTION_PAUSE_SECONDS)
+
+    if removed:
+        # Charts and summaries of the patient are served from the shared cache
+        shared_cache.invalidate(("vitals", patient_id))
+    return removed, written
+
+
+async def compact_vitals(db: AsyncSession, now: Optional[datetime] = None) -> CompactionReport:
+    """
+    Aplica os níveis de compactação a todos os pacientes do banco (shard).
+
+    Args:
+        db: Sessão do banco de dados
+        now: Referência de data atual
+
+    Returns:
+        CompactionReport: Leituras removidas, agregados gravados e espaço
+        recuperado no arquivo (páginas que voltaram para a lista de livres)
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    report = CompactionReport()
+    used_before = await _used_bytes(db)
+
+    patient_ids = (await db.execute(select(Patient.id))).scalars().all()
+    compacted = set()
+    for seconds, days in tiers():
+        cutoff = now - timedelta(days=days)
+        for patient_id in patient_ids:
+            removed, written = await compact_patient(db, patient_id, seconds, cutoff)
+            if removed:
+                compacted.add(patient_id)
+                report.rows_removed += removed
+                report.rows_written += written
+
+    report.patients = len(compacted)
+    report.bytes_reclaimed = max(0, used_before - await _used_bytes(db))
+    report.duration_ms = (time.perf_counter() - started) * 1000
+    return report
+
+
+async def compaction_loop() -> None:
+    """
+    Tarefa de background que compacta os sinais vitais periodicamente em
+    todos os shards. Desativada por `VITALS_COMPACTION_ENABLED` ou quando
+    nenhum nível está configurado.
+    """
+    if not settings.VITALS_COMPACTION_ENABLED or not tiers():
+        return
+
+    interval = settings.VITALS_COMPACTION_INTERVAL_HOURS * 3600
+
+    while True:
+        try:
+            async with maintenance_lock:
+                report = CompactionReport.total(await shard_router.fan_out(compact_vitals))
+            if report.rows_removed:
+                print(
+                    f"🗜️  Sinais vitais compactados: {report.rows_removed:,} leituras de "
+                    f"{report.patients} pacientes em {report.rows_written:,} agregados "
+                    f"({report.rows_reclaimed:,} linhas e {report.bytes_reclaimed / 1024:,.0f} KiB "
+                    f"recuperados, {report.duration_ms / 1000:.1f} s)"
+                )
+        except Exception as exc:
+            print(f"⚠️  Falha ao compactar sinais vitais: {exc}")
+
+        await asyncio.sleep(interval)
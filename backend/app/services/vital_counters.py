@@ -0,0 +1,169 @@
+"""
+Vita - Vital Counters
+Contadores diários de sinais vitais por paciente.
+
+`vital_daily_counts` guarda quantas leituras cada paciente tem em cada dia
+(UTC), somando tabela quente e arquivo. O contador é mantido na mesma
+transação da escrita (listener de flush), então é exato; o arquivamento
+por retenção move linhas com Core e não altera a contagem lógica. Um
+registro compactado conta como as leituras que substituiu: seu
+`VitalRollup` soma as demais (`sample_count - 1`).
+
+Com ele, a contagem de uma janela custa uma soma sobre os dias inteiros
+da janela mais a leitura, pelo índice, apenas dos dias das bordas,
+independente do tamanho do histórico.
+"""
+
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Patient, VitalDailyCount, VitalRollup, VitalSign
+from app.services import vital_compaction, vital_partitions
+
+
+def _upsert(counts: Counter):
+    statement = insert(VitalDailyCount).values([
+        {"patient_id": patient_id, "day": day, "count": count}
+        for (patient_id, day), count in counts.items()
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=["patient_id", "day"],
+        set_={"count": VitalDailyCount.count + statement.excluded.count},
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def record_counts(session: Session, flush_context) -> None:
+    """Atualiza os contadores com as leituras inseridas/removidas no flush."""
+    counts: Counter = Counter()
+    for objects, delta in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if isinstance(obj, VitalSign):
+                counts[(obj.patient_id, obj.recorded_at.date())] += delta
+            elif isinstance(obj, VitalRollup):
+                counts[(obj.patient_id, obj.bucket_start.date())] += delta * (obj.sample_count - 1)
+
+    counts = Counter({key: delta for key, delta in counts.items() if delta})
+    if counts:
+        session.connection().execute(_upsert(counts))
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _day_end(day: date) -> datetime:
+    return datetime.combine(day, time.max)
+
+
+async def count_window(
+    db: AsyncSession,
+    patient_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> int:
+    """
+    Conta as leituras do paciente na janela (inclusiva).
+
+    Dias inteiramente dentro da janela vêm dos contadores; os dias das
+    bordas (quando a janela não começa/termina no limite do dia) são
+    contados nas partições.
+
+    Args:
+        db: Sessão do banco de dados
+        patient_id: ID do paciente
+        start: Início da janela (inclusivo)
+        end: Fim da janela (inclusivo)
+
+    Returns:
+        int: Quantidade de leituras
+    """
+    if start and end and start.date() == end.date():
+        return await vital_partitions.count_vitals(db, patient_id, start, end)
+
+    # Edge days only need reading when the window cuts them
+    first_day = start.date() if start else None
+    if start and start == _day_start(first_day):
+        first_day -= timedelta(days=1)
+        start = None
+
+    last_day = end.date() if end else None
+    if end and end >= _day_end(last_day):
+        last_day += timedelta(days=1)
+        end = None
+
+    query = select(func.coalesce(func.sum(VitalDailyCount.count), 0)).where(
+        VitalDailyCount.patient_id == patient_id
+    )
+    if first_day:
+        query = query.where(VitalDailyCount.day > first_day)
+    if last_day:
+        query = query.where(VitalDailyCount.day < last_day)
+    total = (await db.execute(query)).scalar()
+
+    if start:
+        total += await vital_partitions.count_vitals(db, patient_id, start, _day_end(first_day))
+    if end:
+        total += await vital_partitions.count_vitals(db, patient_id, _day_start(last_day), end)
+
+    return total
+
+
+async def rebuild_patient_counts(db: AsyncSession, patient_id: int) -> int:
+    """
+    Reconstrói os contadores de um paciente a partir do histórico completo
+    (tabela quente, segmentos arquivados e leituras substituídas pela
+    compactação).
+
+    Returns:
+        int: Quantidade de dias com leituras
+    """
+    timestamps, _ = await vital_partitions.fetch_series(db, patient_id, ())
+    days, counts = np.unique(timestamps.astype("M8[D]"), return_counts=True)
+    per_day = Counter(dict(zip(days.tolist(), counts.tolist())))
+
+    # Rollups outlive archiving, so they cover hot and archived aggregates
+    rollups = await db.execute(
+        select(VitalRollup.bucket_start, VitalRollup.sample_count)
+        .where(VitalRollup.patient_id == patient_id)
+    )
+    for start, samples in rollups.all():
+        per_day[start.date()] += samples - 1
+
+    await db.execute(delete(VitalDailyCount).where(VitalDailyCount.patient_id == patient_id))
+    db.add_all([
+        VitalDailyCount(patient_id=patient_id, day=day, count=count)
+        for day, count in per_day.items()
+    ])
+    return len(per_day)
+
+
+async def ensure_counts(db: AsyncSession) -> int:
+    """
+    Constrói os contadores na primeira inicialização após a implantação,
+    quando já existem sinais vitais mas nenhum contador, e reconstrói os
+    dos pacientes compactados antes de os agregados contarem como leituras.
+
+    Returns:
+        int: Quantidade de pacientes processados
+    """
+    recount = await vital_compaction.backfill_rollup_counts(db)
+
+    has_counts = (await db.execute(select(VitalDailyCount.id).limit(1))).first()
+    if has_counts:
+        patient_ids = recount
+    else:
+        patient_ids = (await db.execute(select(Patient.id))).scalars().all()
+
+    for patient_id in patient_ids:
+        await rebuild_patient_counts(db, patient_id)
+        await db.commit()
+
+    return len(patient_ids)
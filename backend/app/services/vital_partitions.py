@@ -0,0 +1,894 @@
+"""
+Vita - Vital Signs Partitioning
+Particionamento mensal dos sinais vitais com política de retenção.
+
+Registros recentes vivem na tabela quente `vital_signs`. Meses mais antigos
+que a janela de retenção são movidos para arquivos colunares (um por
+paciente/mês, ver `vital_archive`) catalogados em `vital_archive_segments`.
+As funções de leitura deste módulo roteiam cada consulta apenas para as
+partições que intersectam a janela pedida, de forma transparente para as
+rotas. Agregações e séries sobre segmentos arquivados são vetorizadas.
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import case, select, func, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import settings
+from app.db.database import maintenance_lock, shard_router
+from app.models import Patient, VitalSign, VitalArchiveSegment, VitalRollup
+from app.services import vital_archive, vital_compaction
+
+ARCHIVE_DIR = "vitals_archive"
+DELETE_CHUNK_SIZE = 500
+JULIAN_UNIX_EPOCH = 2440587.5
+
+VITAL_COLUMNS = (
+    "id",
+    "patient_id",
+    "recorded_by",
+    "recorded_at",
+    "heart_rate",
+    "systolic_pressure",
+    "diastolic_pressure",
+    "temperature",
+    "oxygen_saturation",
+    "respiratory_rate",
+    "weight",
+    "height",
+    "glucose_level",
+    "notes",
+)
+
+STAT_METRICS = {
+    "heart_rate": "avg_heart_rate",
+    "systolic_pressure": "avg_systolic",
+    "diastolic_pressure": "avg_diastolic",
+    "temperature": "avg_temperature",
+    "oxygen_saturation": "avg_oxygen",
+}
+
+
+# ============== Month helpers ==============
+
+def month_start(value: datetime) -> datetime:
+    """Retorna o primeiro instante do mês de `value`."""
+    return datetime(value.year, value.month, 1)
+
+
+def shift_months(value: datetime, months: int) -> datetime:
+    """Desloca o início do mês de `value` em `months` meses."""
+    year, month = divmod(value.year * 12 + value.month - 1 + months, 12)
+    return datetime(year, month + 1, 1)
+
+
+def month_key(value: datetime) -> str:
+    """Chave da partição mensal no formato YYYY-MM."""
+    return value.strftime("%Y-%m")
+
+
+def archive_root() -> Path:
+    """Diretório raiz dos arquivos de dados."""
+    return Path(settings.DATA_DIR)
+
+
+# ============== Segment files ==============
+
+def _segment_path(month: str, patient_id: int) -> str:
+    return f"{ARCHIVE_DIR}/{month}/patient-{patient_id}.vcol"
+
+
+def _vital_to_row(vital: VitalSign) -> dict:
+    return {column: getattr(vital, column) for column in VITAL_COLUMNS}
+
+
+def _write_segment(path: str, patient_id: int, rows: list[dict]) -> int:
+    return vital_archive.write_segment(archive_root() / path, patient_id, rows)
+
+
+def _read_legacy_segment(path: str) -> list[dict]:
+    """Lê segmentos no formato anterior (JSON comprimido com gzip)."""
+    with gzip.open(archive_root() / path, "rt", encoding="utf-8") as fh:
+        rows = json.load(fh)
+
+    for row in rows:
+        row["recorded_at"] = datetime.fromisoformat(row["recorded_at"])
+    return rows
+
+
+# Segments are opened, mapped and decoded only inside these helpers, which
+# async callers run with asyncio.to_thread so the event loop never blocks
+
+def _open_segment(segment: VitalArchiveSegment) -> vital_archive.ColumnarSegment:
+    return vital_archive.open_segment(archive_root() / segment.path)
+
+
+def _read_segment(
+    segment: VitalArchiveSegment,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[dict]:
+    columns = _open_segment(segment)
+    return columns.to_rows(columns.window(start, end))
+
+
+def _segment_window(
+    segment: VitalArchiveSegment,
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> slice:
+    return _open_segment(segment).window(start, end)
+
+
+def _segment_stats(
+    segment: VitalArchiveSegment,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    rollups: dict[int, VitalRollup],
+) -> tuple[int, dict[str, tuple[float, int]], np.ndarray]:
+    """
+    Leituras do intervalo, (soma, leituras) de cada métrica de
+    `STAT_METRICS` e os valores de frequência cardíaca presentes. Registros
+    agregados pesam as leituras que seu rollup conta.
+    """
+    columns = _open_segment(segment)
+    window = columns.window(start, end)
+    ids = columns.column("id")[window].tolist() if rollups else []
+
+    def weights(metric: Optional[str] = None) -> np.ndarray:
+        if not rollups:
+            return np.ones(window.stop - window.start)
+        return np.array([
+            vital_compaction.rollup_samples(rollups[i], metric) if i in rollups else 1
+            for i in ids
+        ], dtype=np.float64)
+
+    totals = {}
+    heart_rate = np.empty(0)
+    for metric in STAT_METRICS:
+        values = columns.column(metric)[window].astype(np.float64)
+        metric_weights = weights(metric)
+        mask = columns.valid(metric)
+        if mask is not None:
+            values, metric_weights = values[mask[window]], metric_weights[mask[window]]
+
+        totals[metric] = (float(values @ metric_weights), int(metric_weights.sum()))
+        if metric == "heart_rate":
+            heart_rate = values
+
+    return int(weights().sum()), totals, heart_rate
+
+
+def _segment_series(
+    segment: VitalArchiveSegment,
+    metrics: Sequence[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """`recorded_at` e métricas (float64, NaN para ausentes) do intervalo."""
+    columns = _open_segment(segment)
+    window = columns.window(start, end)
+
+    series = {}
+    for metric in metrics:
+        values = columns.column(metric)[window].astype(np.float64)
+        mask = columns.valid(metric)
+        if mask is not None:
+            values[~mask[window]] = np.nan
+        series[metric] = values
+
+    return columns.column("recorded_at")[window], series
+
+
+async def _load_segment(
+    segment: VitalArchiveSegment,
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> list[VitalSign]:
+    rows = await asyncio.to_thread(_read_segment, segment, start, end)
+    return [VitalSign(**row) for row in rows]
+
+
+async def _overlapping_segments(
+    db: AsyncSession,
+    patient_id: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Sequence[VitalArchiveSegment]:
+    query = select(VitalArchiveSegment).where(VitalArchiveSegment.patient_id == patient_id)
+
+    if start:
+        query = query.where(VitalArchiveSegment.last_recorded_at >= start)
+
+    if end:
+        query = query.where(VitalArchiveSegment.first_recorded_at <= end)
+
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def _segments_for_patients(
+    db: AsyncSession,
+    patient_ids: Sequence[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Sequence[VitalArchiveSegment]:
+    query = select(VitalArchiveSegment).where(VitalArchiveSegment.patient_id.in_(patient_ids))
+
+    if start:
+        query = query.where(VitalArchiveSegment.last_recorded_at >= start)
+
+    if end:
+        query = query.where(VitalArchiveSegment.first_recorded_at <= end)
+
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+def _window_filter(query, start: Optional[datetime], end: Optional[datetime]):
+    if start:
+        query = query.where(VitalSign.recorded_at >= start)
+    if end:
+        query = query.where(VitalSign.recorded_at <= end)
+    return query
+
+
+# ============== Compacted records ==============
+# A compacted row stands for the readings its rollup counts; raw rows (no
+# rollup) for one. Rollups outlive archiving, so those without a hot row
+# belong to aggregates that are now in segments.
+
+def _samples(metric: Optional[str] = None):
+    """Leituras representadas pelo registro (as que tinham `metric`, se dada)."""
+    if metric is None:
+        return func.coalesce(VitalRollup.sample_count, 1)
+    return func.coalesce(getattr(VitalRollup, f"{metric}_count"), VitalRollup.sample_count, 1)
+
+
+def _with_rollups(query):
+    return query.select_from(VitalSign).outerjoin(
+        VitalRollup, VitalRollup.vital_sign_id == VitalSign.id
+    )
+
+
+def _archived_rollups(
+    query,
+    patient_ids: Sequence[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+):
+    query = (
+        query.select_from(VitalRollup)
+        .outerjoin(VitalSign, VitalSign.id == VitalRollup.vital_sign_id)
+        .where(VitalSign.id.is_(None), VitalRollup.patient_id.in_(patient_ids))
+    )
+    if start:
+        query = query.where(VitalRollup.bucket_start >= start)
+    if end:
+        query = query.where(VitalRollup.bucket_start <= end)
+    return query
+
+
+# ============== Routed reads ==============
+
+async def fetch_vitals(
+    db: AsyncSession,
+    patient_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    before: Optional[tuple[datetime, int]] = None,
+) -> list[VitalSign]:
+    """
+    Busca sinais vitais de um paciente em uma janela, unindo a tabela quente
+    com os segmentos arquivados que intersectam o período.
+
+    Args:
+        db: Sessão do banco de dados
+        patient_id: ID do paciente
+        start: Início da janela (inclusivo)
+        end: Fim da janela (inclusivo)
+        descending: Ordena do mais recente para o mais antigo
+        limit: Quantidade máxima de resultados
+        columns: Colunas a carregar da tabela quente (padrão: todas)
+        before: Cursor `(recorded_at, id)`: só registros estritamente anteriores
+
+    Returns:
+        list[VitalSign]: Registros ordenados por `(recorded_at, id)`
+    """
+    # id breaks ties between readings recorded at the same instant, so pages
+    # are deterministic and a compound cursor never skips a row
+    if descending:
+        order = (VitalSign.recorded_at.desc(), VitalSign.id.desc())
+    else:
+        order = (VitalSign.recorded_at, VitalSign.id)
+    query = _window_filter(
+        select(VitalSign).where(VitalSign.patient_id == patient_id), start, end
+    ).order_by(*order)
+
+    if before:
+        query = query.where(tuple_(VitalSign.recorded_at, VitalSign.id) < tuple_(*before))
+
+    if columns:
+        # recorded_at is always needed to merge with archived segments
+        query = query.options(load_only(*(
+            getattr(VitalSign, c)
+            for c in dict.fromkeys((*columns, "recorded_at"))
+            if c in VitalSign.__table__.columns
+        )))
+
+    if limit:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    vitals = list(result.scalars().all())
+
+    segments = await _overlapping_segments(db, patient_id, start, end)
+    if not segments:
+        return vitals
+
+    # Visit segments closest to the requested edge first so we can stop early
+    if descending:
+        segments = sorted(segments, key=lambda s: s.last_recorded_at, reverse=True)
+    else:
+        segments = sorted(segments, key=lambda s: s.first_recorded_at)
+
+    def sort_key(v: VitalSign) -> tuple[datetime, int]:
+        return v.recorded_at, v.id
+
+    for segment in segments:
+        if limit and len(vitals) >= limit:
+            boundary = vitals[-1].recorded_at
+            if descending and segment.last_recorded_at < boundary:
+                break
+            if not descending and segment.first_recorded_at > boundary:
+                break
+
+        loaded = await _load_segment(segment, start, end)
+        if before:
+            loaded = [v for v in loaded if sort_key(v) < before]
+        vitals.extend(loaded)
+        vitals.sort(key=sort_key, reverse=descending)
+
+        if limit:
+            vitals = vitals[:limit]
+
+    return vitals
+
+
+async def count_vitals(
+    db: AsyncSession,
+    patient_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> int:
+    """
+    Conta as leituras de um paciente em todas as partições da janela;
+    registros compactados contam as leituras que substituíram.
+
+    Segmentos totalmente contidos na janela usam a contagem do catálogo;
+    apenas os que cruzam as bordas são lidos.
+    """
+    count_query = _window_filter(
+        _with_rollups(select(func.sum(_samples()))).where(VitalSign.patient_id == patient_id),
+        start,
+        end,
+    )
+    total = (await db.execute(count_query)).scalar() or 0
+
+    segments = await _overlapping_segments(db, patient_id, start, end)
+    if segments:
+        archived_query = _archived_rollups(
+            select(func.sum(VitalRollup.sample_count - 1)), [patient_id], start, end
+        )
+        total += (await db.execute(archived_query)).scalar() or 0
+
+    for segment in segments:
+        covered = (
+            (start is None or segment.first_recorded_at >= start)
+            and (end is None or segment.last_recorded_at <= end)
+        )
+        if covered:
+            total += segment.row_count
+        else:
+            window = await asyncio.to_thread(_segment_window, segment, start, end)
+            total += window.stop - window.start
+
+    return total
+
+
+async def vital_stats(
+    db: AsyncSession,
+    patient_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    """
+    Calcula médias, mínimos/máximos de frequência cardíaca e total de
+    registros combinando a tabela quente e os segmentos arquivados.
+
+    Returns:
+        dict: Valores brutos (sem arredondamento) com as chaves de
+        `VitalStatsResponse`
+    """
+    stats = await batch_vital_stats(db, [patient_id], start, end)
+    return stats[patient_id]
+
+
+async def batch_vital_stats(
+    db: AsyncSession,
+    patient_ids: Sequence[int],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict[int, dict]:
+    """
+    Estatísticas de `vital_stats` para vários pacientes de uma vez: uma
+    consulta agrupada (GROUP BY patient_id) na tabela quente e uma consulta
+    ao catálogo de segmentos, independentemente da quantidade de pacientes.
+
+    Médias, extremos e totais são das leituras: cada registro compactado
+    pesa as leituras que substituiu (por métrica) e contribui com o
+    mínimo/máximo guardado no seu rollup.
+
+    Returns:
+        dict: {patient_id: estatísticas no formato de `vital_stats`}
+    """
+    columns = []
+    for metric in STAT_METRICS:
+        column = getattr(VitalSign, metric)
+        weight = _samples(metric)
+        columns += [func.sum(column * weight), func.sum(case((column.is_not(None), weight)))]
+
+    hot_query = _window_filter(
+        _with_rollups(select(
+            VitalSign.patient_id,
+            *columns,
+            func.min(func.coalesce(VitalRollup.heart_rate_min, VitalSign.heart_rate)),
+            func.max(func.coalesce(VitalRollup.heart_rate_max, VitalSign.heart_rate)),
+            func.sum(_samples()),
+        )).where(VitalSign.patient_id.in_(patient_ids)),
+        start,
+        end,
+    ).group_by(VitalSign.patient_id)
+
+    accumulators = {
+        patient_id: {
+            "sums": dict.fromkeys(STAT_METRICS, 0),
+            "counts": dict.fromkeys(STAT_METRICS, 0),
+            "min_hr": None,
+            "max_hr": None,
+            "total": 0,
+        }
+        for patient_id in patient_ids
+    }
+
+    offset = len(STAT_METRICS) * 2 + 1
+    for row in (await db.execute(hot_query)).all():
+        acc = accumulators[row[0]]
+        for i, metric in enumerate(STAT_METRICS):
+            acc["sums"][metric] = row[i * 2 + 1] or 0
+            acc["counts"][metric] = row[i * 2 + 2] or 0
+        acc["min_hr"], acc["max_hr"] = row[offset], row[offset + 1]
+        acc["total"] = row[offset + 2] or 0
+
+    def extremes(acc: dict, low: Optional[float], high: Optional[float]) -> None:
+        if low is not None:
+            acc["min_hr"] = low if acc["min_hr"] is None else min(acc["min_hr"], low)
+        if high is not None:
+            acc["max_hr"] = high if acc["max_hr"] is None else max(acc["max_hr"], high)
+
+    segments = await _segments_for_patients(db, patient_ids, start, end)
+    archived: dict[int, dict[int, VitalRollup]] = {patient_id: {} for patient_id in patient_ids}
+    if segments:
+        result = await db.execute(_archived_rollups(select(VitalRollup), patient_ids, start, end))
+        for rollup in result.scalars().all():
+            archived[rollup.patient_id][rollup.vital_sign_id] = rollup
+            extremes(accumulators[rollup.patient_id], rollup.heart_rate_min, rollup.heart_rate_max)
+
+    for segment in segments:
+        acc = accumulators[segment.patient_id]
+        readings, totals, heart_rate = await asyncio.to_thread(
+            _segment_stats, segment, start, end, archived[segment.patient_id]
+        )
+        acc["total"] += readings
+
+        for metric, (total, count) in totals.items():
+            acc["sums"][metric] += total
+            acc["counts"][metric] += count
+
+        if heart_rate.size:
+            extremes(acc, int(heart_rate.min()), int(heart_rate.max()))
+
+    results = {}
+    for patient_id, acc in accumulators.items():
+        sums, counts = acc["sums"], acc["counts"]
+        stats = {
+            label: (sums[metric] / counts[metric] if counts[metric] else None)
+            for metric, label in STAT_METRICS.items()
+        }
+        stats.update(
+            min_heart_rate=acc["min_hr"],
+            max_heart_rate=acc["max_hr"],
+            total_records=acc["total"],
+        )
+        results[patient_id] = stats
+
+    return results
+
+
+async def fetch_series(
+    db: AsyncSession,
+    patient_id: int,
+    metrics: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Busca séries temporais de métricas em formato colunar.
+
+    A tabela quente é lida apenas nas colunas pedidas (sem ORM) e os
+    segmentos arquivados são fatiados direto das views mapeadas.
+
+    Args:
+        db: Sessão do banco de dados
+        patient_id: ID do paciente
+        metrics: Colunas de `VitalSign` desejadas
+        start: Início da janela (inclusivo)
+        end: Fim da janela (inclusivo)
+
+    Returns:
+        tuple: (`recorded_at` como datetime64[us], {métrica: float64 com NaN
+        para valores ausentes}), em ordem cronológica
+    """
+    timestamps = []
+    series: dict[str, list[np.ndarray]] = {metric: [] for metric in metrics}
+
+    for segment in await _overlapping_segments(db, patient_id, start, end):
+        segment_timestamps, values = await asyncio.to_thread(
+            _segment_series, segment, metrics, start, end
+        )
+        timestamps.append(segment_timestamps)
+        for metric in metrics:
+            series[metric].append(values[metric])
+
+    query = _window_filter(
+        select(VitalSign.recorded_at, *[getattr(VitalSign, m) for m in metrics])
+        .where(VitalSign.patient_id == patient_id),
+        start,
+        end,
+    ).order_by(VitalSign.recorded_at)
+    rows = (await db.execute(query)).all()
+
+    if rows:
+        hot = list(zip(*rows))
+        timestamps.append(np.array(hot[0], dtype="M8[us]"))
+        for i, metric in enumerate(metrics, start=1):
+            series[metric].append(np.array(hot[i], dtype=np.float64))
+
+    if not timestamps:
+        return np.empty(0, dtype="M8[us]"), {m: np.empty(0) for m in metrics}
+
+    merged_timestamps = np.concatenate(timestamps)
+    order = np.argsort(merged_timestamps, kind="stable")
+
+    return merged_timestamps[order], {
+        metric: np.concatenate(parts)[order] for metric, parts in series.items()
+    }
+
+
+async def fetch_cohort_series(
+    db: AsyncSession,
+    doctor_id: int,
+    metrics: Sequence[str],
+    start: datetime,
+    end: datetime,
+) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    """
+    Busca, em uma única leitura colunar, as métricas de todos os pacientes
+    de um médico dentro da janela (tabela quente + segmentos arquivados).
+
+    Args:
+        db: Sessão do banco de dados
+        doctor_id: ID do médico
+        metrics: Colunas de `VitalSign` desejadas
+        start: Início da janela (inclusivo)
+        end: Fim da janela (inclusivo)
+
+    Returns:
+        tuple: (patient_id int64, tempo em dias desde a época Unix float64,
+        {métrica: float64 com NaN para valores ausentes}), sem ordenação
+    """
+    hot_query = (
+        _grouped_series_query(metrics, start, end)
+        .join(Patient, Patient.id == VitalSign.patient_id)
+        .where(Patient.doctor_id == doctor_id)
+    )
+    segments_result = await db.execute(
+        select(VitalArchiveSegment)
+        .join(Patient, Patient.id == VitalArchiveSegment.patient_id)
+        .where(
+            Patient.doctor_id == doctor_id,
+            VitalArchiveSegment.last_recorded_at >= start,
+            VitalArchiveSegment.first_recorded_at <= end,
+        )
+    )
+
+    return await _grouped_series(
+        db, hot_query, segments_result.scalars().all(), metrics, start, end
+    )
+
+
+async def fetch_patients_series(
+    db: AsyncSession,
+    patient_ids: Sequence[int],
+    metrics: Sequence[str],
+    start: datetime,
+    end: datetime,
+) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    """
+    Igual a `fetch_cohort_series`, restrita a uma lista de pacientes.
+    Uma consulta na tabela quente e uma no catálogo de segmentos.
+    """
+    hot_query = _grouped_series_query(metrics, start, end).where(
+        VitalSign.patient_id.in_(patient_ids)
+    )
+    segments = await _segments_for_patients(db, patient_ids, start, end)
+
+    return await _grouped_series(db, hot_query, segments, metrics, start, end)
+
+
+def _grouped_series_query(metrics: Sequence[str], start: datetime, end: datetime):
+    return select(
+        VitalSign.patient_id,
+        func.julianday(VitalSign.recorded_at) - JULIAN_UNIX_EPOCH,
+        *[getattr(VitalSign, m) for m in metrics],
+    ).where(
+        VitalSign.recorded_at >= start,
+        VitalSign.recorded_at <= end,
+    )
+
+
+def _fetch_matrix(session: Session, query) -> Optional[np.ndarray]:
+    """
+    Executa uma consulta só de colunas numéricas e devolve as linhas como
+    matriz float64 (NaN para nulos), ou None sem linhas.
+
+    As tuplas são lidas direto do cursor do driver, sem montar objetos Row;
+    os parâmetros continuam passando pelo SQLAlchemy.
+    """
+    result = session.connection().execute(query)
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+
+    return np.array(rows, dtype=np.float64) if rows else None
+
+
+async def _grouped_series(
+    db: AsyncSession,
+    hot_query,
+    segments: Sequence[VitalArchiveSegment],
+    metrics: Sequence[str],
+    start: datetime,
+    end: datetime,
+) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    patient_ids: list[np.ndarray] = []
+    days: list[np.ndarray] = []
+    series: dict[str, list[np.ndarray]] = {metric: [] for metric in metrics}
+
+    hot = await db.run_sync(_fetch_matrix, hot_query)
+
+    if hot is not None:
+        patient_ids.append(hot[:, 0].astype(np.int64))
+        days.append(hot[:, 1])
+        for i, metric in enumerate(metrics, start=2):
+            series[metric].append(hot[:, i])
+
+    one_day = np.timedelta64(1, "D")
+    for segment in segments:
+        timestamps, values = await asyncio.to_thread(
+            _segment_series, segment, metrics, start, end
+        )
+
+        patient_ids.append(np.full(timestamps.size, segment.patient_id, dtype=np.int64))
+        days.append((timestamps - np.datetime64(0, "us")) / one_day)
+
+        for metric in metrics:
+            series[metric].append(values[metric])
+
+    if not days:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), empty, {m: empty for m in metrics}
+
+    return np.concatenate(patient_ids), np.concatenate(days), {
+        metric: np.concatenate(parts) for metric, parts in series.items()
+    }
+
+
+# ============== Retention ==============
+
+async def _archive_patient_month(
+    db: AsyncSession,
+    patient_id: int,
+    start: datetime,
+    end: datetime,
+) -> int:
+    month = month_key(start)
+
+    result = await db.execute(
+        select(VitalSign)
+        .where(
+            VitalSign.patient_id == patient_id,
+            VitalSign.recorded_at >= start,
+            VitalSign.recorded_at < end,
+        )
+        .order_by(VitalSign.recorded_at)
+    )
+    vitals = result.scalars().all()
+    if not vitals:
+        return 0
+
+    segment_result = await db.execute(
+        select(VitalArchiveSegment).where(
+            VitalArchiveSegment.patient_id == patient_id,
+            VitalArchiveSegment.month == month,
+        )
+    )
+    segment = segment_result.scalar_one_or_none()
+
+    # Late rows for an already archived month are merged into its segment
+    rows = {row["id"]: row for row in [_vital_to_row(v) for v in vitals]}
+    if segment:
+        for row in await asyncio.to_thread(_read_segment, segment):
+            rows.setdefault(row["id"], row)
+
+    merged = sorted(rows.values(), key=lambda r: r["recorded_at"])
+    path = _segment_path(month, patient_id)
+    size = await asyncio.to_thread(_write_segment, path, patient_id, merged)
+
+    if segment is None:
+        segment = VitalArchiveSegment(patient_id=patient_id, month=month)
+        db.add(segment)
+
+    segment.path = path
+    segment.row_count = len(merged)
+    segment.size_bytes = size
+    segment.first_recorded_at = merged[0]["recorded_at"]
+    segment.last_recorded_at = merged[-1]["recorded_at"]
+    segment.archived_at = datetime.utcnow()
+
+    ids = [v.id for v in vitals]
+    for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+        await db.execute(delete(VitalSign).where(VitalSign.id.in_(ids[i:i + DELETE_CHUNK_SIZE])))
+
+    return len(ids)
+
+
+async def archive_cold_partitions(
+    db: AsyncSession,
+    retain_months: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> list[str]:
+    """
+    Move para arquivo as partições mensais mais antigas que a retenção.
+
+    Cada mês é processado paciente a paciente e confirmado em sua própria
+    transação; o arquivo é gravado antes da remoção das linhas quentes.
+
+    Args:
+        db: Sessão do banco de dados
+        retain_months: Meses mantidos na tabela quente (padrão: configuração)
+        now: Referência de data atual
+
+    Returns:
+        list[str]: Meses (YYYY-MM) arquivados nesta execução
+    """
+    if retain_months is None:
+        retain_months = settings.VITALS_HOT_RETENTION_MONTHS
+
+    cutoff = shift_months(now or datetime.utcnow(), -retain_months)
+    archived: list[str] = []
+
+    while True:
+        oldest_result = await db.execute(
+            select(func.min(VitalSign.recorded_at)).where(VitalSign.recorded_at < cutoff)
+        )
+        oldest = oldest_result.scalar()
+        if oldest is None:
+            break
+
+        start = month_start(oldest)
+        end = shift_months(start, 1)
+
+        patients_result = await db.execute(
+            select(VitalSign.patient_id)
+            .where(VitalSign.recorded_at >= start, VitalSign.recorded_at < end)
+            .distinct()
+        )
+        for patient_id in patients_result.scalars().all():
+            await _archive_patient_month(db, patient_id, start, end)
+            await db.commit()
+
+        archived.append(month_key(start))
+
+    return archived
+
+
+async def upgrade_legacy_segments(db: AsyncSession) -> int:
+    """
+    Converte segmentos gravados no formato JSON+gzip para o formato colunar.
+    Um segmento ilegível é registrado e mantido no formato antigo; os
+    demais seguem sendo convertidos.
+
+    Returns:
+        int: Quantidade de segmentos convertidos
+    """
+    result = await db.execute(
+        select(VitalArchiveSegment).where(VitalArchiveSegment.path.like("%.json.gz"))
+    )
+    segments = result.scalars().all()
+
+    upgraded = 0
+    for segment in segments:
+        legacy_path = segment.path
+        try:
+            rows = await asyncio.to_thread(_read_legacy_segment, legacy_path)
+        except Exception as exc:
+            print(f"⚠️  Segmento {legacy_path} não convertido: {exc}")
+            continue
+        path = _segment_path(segment.month, segment.patient_id)
+
+        segment.size_bytes = await asyncio.to_thread(
+            _write_segment, path, segment.patient_id, rows
+        )
+        segment.path = path
+        await db.commit()
+
+        (archive_root() / legacy_path).unlink(missing_ok=True)
+        upgraded += 1
+
+    return upgraded
+
+
+async def retention_loop() -> None:
+    """
+    Tarefa de background que aplica a retenção periodicamente.
+    Segmentos no formato antigo são convertidos na primeira execução; a
+    retenção em si fica desativada quando `VITALS_HOT_RETENTION_MONTHS` é zero.
+    Falhas são registradas e não interrompem a tarefa.
+    """
+    try:
+        async with maintenance_lock:
+            upgraded = sum(await shard_router.fan_out(upgrade_legacy_segments))
+        if upgraded:
+            print(f"🗄️  {upgraded} segmentos de sinais vitais convertidos para o formato colunar")
+    except Exception as exc:
+        print(f"⚠️  Falha ao converter segmentos de sinais vitais: {exc}")
+
+    if settings.VITALS_HOT_RETENTION_MONTHS <= 0:
+        return
+
+    interval = settings.VITALS_RETENTION_INTERVAL_HOURS * 3600
+
+    while True:
+        try:
+            async with maintenance_lock:
+                archived = await shard_router.fan_out(archive_cold_partitions)
+            months = sorted({month for shard_months in archived for month in shard_months})
+            if months:
+                print(f"🗄️  Partições de sinais vitais arquivadas: {', '.join(months)}")
+        except Exception as exc:
+            print(f"⚠️  Falha ao aplicar retenção de sinais vitais: {exc}")
+
+        await asyncio.sleep(interval)
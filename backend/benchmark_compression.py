@@ -0,0 +1,133 @@
+"""
+Vita - Compression Benchmark
+Mede a economia de banda e o custo de CPU de cada codificação negociada
+pelo `CompressionMiddleware`, por tipo de payload.
+
+Os payloads são gerados com os próprios schemas de resposta (mesma
+serialização JSON das rotas), com dados sintéticos realistas.
+
+Uso:
+    python benchmark_compression.py [repetições]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.core.compression import available_encodings, compress
+from app.schemas import (
+    AppointmentListResponse,
+    AppointmentResponse,
+    ChartDataPoint,
+    VitalChartData,
+    VitalSignListResponse,
+    VitalSignResponse,
+)
+
+
+def chart_payload(days: int) -> bytes:
+    """Gráfico de um paciente com 3 leituras por dia."""
+    start = datetime(2024, 1, 1)
+    labels = [
+        (start + timedelta(hours=8 * i)).strftime("%d/%m") for i in range(days * 3)
+    ]
+
+    def series(base: float, spread: float, decimals: int = 0) -> list[ChartDataPoint]:
+        return [
+            ChartDataPoint(name=label, value=round(random.gauss(base, spread), decimals))
+            for label in labels
+        ]
+
+    return VitalChartData(
+        heart_rate=series(75, 8),
+        blood_pressure=series(125, 10),
+        temperature=series(36.7, 0.3, 1),
+        oxygen_saturation=series(97, 1.5),
+    ).model_dump_json().encode()
+
+
+def vitals_list_payload(count: int) -> bytes:
+    """Listagem de sinais vitais (limite máximo da rota)."""
+    start = datetime(2024, 1, 1)
+    items = [
+        VitalSignResponse(
+            id=i + 1,
+            patient_id=1,
+            recorded_by=1,
+            recorded_at=start + timedelta(hours=8 * i),
+            heart_rate=random.randint(60, 100),
+            systolic_pressure=random.randint(110, 140),
+            diastolic_pressure=random.randint(70, 90),
+            temperature=round(random.uniform(36.0, 37.5), 1),
+            oxygen_saturation=random.randint(94, 100),
+            respiratory_rate=random.randint(12, 20),
+            weight=round(random.uniform(60, 90), 1),
+            height=172.0,
+            glucose_level=random.randint(80, 140),
+            notes=random.choice([None, "Paciente em repouso", "Após exercício"]),
+        )
+        for i in range(count)
+    ]
+    return VitalSignListResponse(items=items, total=count).model_dump_json().encode()
+
+
+def appointments_payload(count: int) -> bytes:
+    """Página de consultas."""
+    now = datetime(2024, 1, 1, 8)
+    items = [
+        AppointmentResponse(
+            id=i + 1,
+            doctor_id=1,
+            patient_id=random.randint(1, 50),
+            scheduled_at=now + timedelta(minutes=30 * i),
+            duration_minutes=30,
+            status=random.choice(["scheduled", "confirmed", "completed"]),
+            appointment_type=random.choice(["consultation", "follow_up", "exam"]),
+            reason=random.choice(["Consulta de rotina", "Retorno", "Dor no peito"]),
+            notes=None,
+            is_telemedicine=random.random() < 0.3,
+            meeting_url=None,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+    return AppointmentListResponse(
+        items=items, total=count, page=1, page_size=count, total_pages=1
+    ).model_dump_json().encode()
+
+
+def benchmark(name: str, body: bytes, repetitions: int) -> None:
+    print(f"\n📦 {name}: {len(body) / 1024:.1f} KiB")
+    print(f"   {'codificação':<12}{'tamanho':>12}{'economia':>10}{'CPU/payload':>14}{'MB/s':>9}")
+
+    for encoding in available_encodings():
+        started = time.perf_counter()
+        for _ in range(repetitions):
+            compressed = compress(encoding, body)
+        elapsed = (time.perf_counter() - started) / repetitions
+
+        saved = 1 - len(compressed) / len(body)
+        throughput = len(body) / elapsed / 1e6
+        print(
+            f"   {encoding:<12}{len(compressed) / 1024:>10.1f}Ki{saved:>10.1%}"
+            f"{elapsed * 1000:>12.2f}ms{throughput:>9.0f}"
+        )
+
+
+def main() -> None:
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    random.seed(42)
+
+    print("⚙️  Benchmark de compressão de respostas")
+    print(f"   Codificações disponíveis: {', '.join(available_encodings())}")
+
+    benchmark("Gráfico de sinais vitais (365 dias)", chart_payload(365), repetitions)
+    benchmark("Gráfico de sinais vitais (30 dias)", chart_payload(30), repetitions)
+    benchmark("Listagem de sinais vitais (500)", vitals_list_payload(500), repetitions)
+    benchmark("Listagem de consultas (100)", appointments_payload(100), repetitions)
+
+
+if __name__ == "__main__":
+    main()
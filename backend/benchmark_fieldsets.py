@@ -0,0 +1,156 @@
+"""
+Vita - Sparse Fieldsets Benchmark
+Compara tamanho do payload e latência das rotas de listagem com e sem o
+parâmetro `fields`.
+
+Roda a API completa (via TestClient) sobre um banco SQLite temporário,
+populado com pacientes e consultas com campos de texto longos
+(endereço, observações, diagnóstico, prescrição).
+
+Uso:
+    python benchmark_fieldsets.py [repetições]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# The benchmark gets its own database and must not be throttled
+_workdir = tempfile.mkdtemp(prefix="vita-bench-")
+os.environ["VITA_DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/bench.db"
+os.environ["VITA_DATA_DIR"] = _workdir
+os.environ["VITA_DEBUG"] = "false"
+os.environ["VITA_ADMISSION_ENABLED"] = "false"
+os.environ["VITA_COMPRESSION_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.db.database import async_session_maker, init_db  # noqa: E402
+from app.models import Appointment, AppointmentStatus, Patient, User, UserRole  # noqa: E402
+from main import app  # noqa: E402
+
+PATIENTS = 100
+APPOINTMENTS_PER_PATIENT = 10
+
+LOREM = (
+    "Paciente relata melhora parcial dos sintomas, mantém uso regular da "
+    "medicação e segue orientações de dieta e atividade física. "
+)
+
+
+def long_text(sentences: int) -> str:
+    return LOREM * random.randint(sentences // 2, sentences)
+
+
+async def seed() -> int:
+    """Cria um médico com pacientes e consultas sintéticos; retorna o ID do médico."""
+    await init_db()
+
+    async with async_session_maker() as db:
+        doctor = User(
+            email="bench@vita.med.br",
+            hashed_password=get_password_hash("bench"),
+            full_name="Dr. Benchmark",
+            role=UserRole.DOCTOR,
+        )
+        db.add(doctor)
+        await db.flush()
+
+        patients = [
+            Patient(
+                doctor_id=doctor.id,
+                full_name=f"Paciente {i:03d}",
+                cpf=f"{i:03d}.000.000-{i % 100:02d}",
+                birth_date=date(1950, 1, 1) + timedelta(days=i * 97),
+                gender=random.choice(["Masculino", "Feminino"]),
+                phone="(11) 90000-0000",
+                email=f"paciente{i}@email.com",
+                address=long_text(4),
+                allergies=long_text(2),
+                medical_notes=long_text(12),
+            )
+            for i in range(PATIENTS)
+        ]
+        db.add_all(patients)
+        await db.flush()
+
+        start = datetime.utcnow() - timedelta(days=180)
+        db.add_all([
+            Appointment(
+                doctor_id=doctor.id,
+                patient_id=patient.id,
+                scheduled_at=start + timedelta(hours=random.randint(0, 24 * 360)),
+                status=random.choice(list(AppointmentStatus)),
+                reason=long_text(2),
+                notes=long_text(8),
+                diagnosis=long_text(4),
+                prescription=long_text(4),
+            )
+            for patient in patients
+            for _ in range(APPOINTMENTS_PER_PATIENT)
+        ])
+        await db.commit()
+        return doctor.id
+
+
+def measure(client: TestClient, url: str, repetitions: int) -> tuple[int, float]:
+    """Tamanho do corpo e latência mediana (ms) de uma rota."""
+    client.get(url)  # warm-up
+    timings = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    response.raise_for_status()
+    return len(response.content), statistics.median(timings)
+
+
+def compare(client: TestClient, name: str, url: str, fields: str, repetitions: int) -> None:
+    separator = "&" if "?" in url else "?"
+    full_size, full_ms = measure(client, url, repetitions)
+    sparse_size, sparse_ms = measure(client, f"{url}{separator}fields={fields}", repetitions)
+
+    print(f"\n📦 {name}")
+    print(f"   fields={fields}")
+    print(f"   {'':<10}{'tamanho':>12}{'latência':>12}")
+    print(f"   {'completo':<10}{full_size / 1024:>10.1f}Ki{full_ms:>10.2f}ms")
+    print(f"   {'esparso':<10}{sparse_size / 1024:>10.1f}Ki{sparse_ms:>10.2f}ms")
+    print(
+        f"   redução: {1 - sparse_size / full_size:.1%} do payload, "
+        f"{1 - sparse_ms / full_ms:.1%} da latência"
+    )
+
+
+def main() -> None:
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    random.seed(42)
+
+    print("⚙️  Benchmark de fieldsets esparsos")
+    print(f"   {PATIENTS} pacientes, {PATIENTS * APPOINTMENTS_PER_PATIENT} consultas")
+
+    with TestClient(app) as client:
+        doctor_id = client.portal.call(seed)
+        token = create_access_token({"sub": str(doctor_id)})
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        compare(
+            client, "Listagem de pacientes (100)",
+            "/api/patients?page_size=100", "full_name,phone,birth_date", repetitions,
+        )
+        compare(
+            client, "Listagem de consultas (100)",
+            "/api/appointments?page_size=100", "scheduled_at,status,patient_id", repetitions,
+        )
+        compare(
+            client, "Detalhe de paciente",
+            "/api/patients/1", "full_name,phone", repetitions,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Vita - Sharding Benchmark
+Mede a vazão de escrita (transações confirmadas por segundo) com 1, 2 e 4
+shards.
+
+Para cada configuração, um banco temporário recebe um médico por processo
+escritor, distribuídos entre os shards, cada um com um paciente. Os
+escritores gravam então, ao mesmo tempo e durante alguns segundos, um
+sinal vital por transação pela mesma camada das rotas (sessão do shard do
+médico, IDs globais, contadores diários e log de alterações). Com um único
+arquivo, todas as transações disputam o mesmo lock de escrita; com N
+shards, cada arquivo recebe só as escritas dos seus médicos.
+
+Uso:
+    python benchmark_shards.py [segundos] [escritores]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARD_COUNTS = (1, 2, 4)
+
+
+def _environment(workdir: str, shards: int) -> dict:
+    return {
+        **os.environ,
+        "VITA_DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "VITA_SHARD_URL_TEMPLATE": f"sqlite+aiosqlite:///{workdir}/bench-shard-{{shard}}.db",
+        "VITA_DATA_DIR": workdir,
+        "VITA_DEBUG": "false",
+        "VITA_SHARD_COUNT": str(shards),
+    }
+
+
+async def _setup(writers: int) -> None:
+    from app.core.security import get_password_hash
+    from app.db.database import init_db, session_scope, shard_router
+    from app.models import DoctorShard, Patient, User, UserRole
+
+    await init_db()
+    password = get_password_hash("bench")
+
+    for writer in range(writers):
+        async with session_scope() as db:
+            doctor = User(
+                email=f"bench{writer}@vita.med.br",
+                hashed_password=password,
+                full_name=f"Benchmark {writer}",
+                role=UserRole.DOCTOR,
+            )
+            db.add(doctor)
+            await db.flush()
+            shard = writer % shard_router.count
+            if shard_router.enabled:
+                db.add(DoctorShard(doctor_id=doctor.id, shard=shard))
+
+        async with session_scope(shard_router.session_makers[shard]) as db:
+            db.add(Patient(
+                doctor_id=doctor.id,
+                full_name=f"Paciente {writer}",
+                cpf=f"000.000.000-{writer:02d}",
+                birth_date=date(1980, 1, 1),
+                gender="Feminino",
+                phone="(11) 90000-0000",
+            ))
+
+
+async def _write(writer: int, start: float, seconds: float) -> None:
+    from sqlalchemy import select
+
+    from app.db.database import session_scope, shard_router
+    from app.models import Patient, User, VitalSign
+
+    async with session_scope() as db:
+        doctor_id = await db.scalar(select(User.id).where(User.email == f"bench{writer}@vita.med.br"))
+    session_maker = await shard_router.sessionmaker_for(doctor_id)
+    async with session_scope(session_maker) as db:
+        patient_id = await db.scalar(select(Patient.id).where(Patient.doctor_id == doctor_id))
+
+    await asyncio.sleep(max(0.0, start - time.time()))
+    deadline = time.monotonic() + seconds
+    commits = 0
+    while time.monotonic() < deadline:
+        async with session_scope(session_maker) as db:
+            db.add(VitalSign(
+                patient_id=patient_id,
+                recorded_by=doctor_id,
+                heart_rate=60 + commits % 40,
+                oxygen_saturation=97,
+            ))
+        commits += 1
+    print(commits)
+
+
+def _run(shards: int, seconds: float, writers: int) -> float:
+    with tempfile.TemporaryDirectory(prefix="vita-bench-") as workdir:
+        env = _environment(workdir, shards)
+        subprocess.run(
+            [sys.executable, __file__, "--setup", str(writers)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+
+        # Writers start together once every process has imported the app
+        start = time.time() + 3
+        processes = [
+            subprocess.Popen(
+                [sys.executable, __file__, "--writer", str(writer), str(start), str(seconds)],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for writer in range(writers)
+        ]
+        commits = 0
+        for process in processes:
+            output, _ = process.communicate()
+            if process.returncode != 0:
+                raise SystemExit(f"Escritor terminou com código {process.returncode}")
+            commits += int(output.strip().splitlines()[-1])
+    return commits / seconds
+
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f"{writers} escritores, {seconds:.0f} s por configuração\n")
+    print(f"{'shards':>6}  {'commits/s':>10}  {'ganho':>6}")
+    baseline = None
+    for shards in SHARD_COUNTS:
+        throughput = _run(shards, seconds, writers)
+        baseline = baseline or throughput
+        print(f"{shards:>6}  {throughput:>10,.0f}  {throughput / baseline:>5.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--setup":
+        asyncio.run(_setup(int(sys.argv[2])))
+    elif len(sys.argv) > 4 and sys.argv[1] == "--writer":
+        asyncio.run(_write(int(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4])))
+    else:
+        main()
@@ -0,0 +1,136 @@
+"""
+Vita - Shared Cache Benchmark
+Compara o cache compartilhado entre workers (`SharedMemoryCache`) com um
+LRU por processo (`LocalCache`) com 1, 4 e 8 workers.
+
+Cada worker executa a mesma carga: leituras com distribuição Zipf sobre
+chaves de médicos (valores pequenos, como conjuntos de pacientes) e de
+gráficos (valores de alguns KB), com uma fração de escritas que invalida o
+escopo da chave. Uma falta no cache simula a consulta ao banco com um
+custo fixo.
+
+Métricas por configuração:
+- ops/s: leituras por segundo, somando os workers;
+- cargas: consultas ao "banco" (faltas no cache);
+- leituras obsoletas: acertos que devolveram um valor anterior à última
+  escrita feita por qualquer worker (a versão verdadeira de cada escopo
+  fica em um array compartilhado).
+
+Uso:
+    python benchmark_shared_cache.py [operações por worker]
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.core.shared_cache import LocalCache, SharedMemoryCache
+
+SCOPES = 2000
+WRITE_RATIO = 0.01
+LOAD_COST_SECONDS = 0.0005
+TTL_SECONDS = 300
+ZIPF_S = 1.1
+
+
+def _zipf_weights(n: int) -> list[float]:
+    return [1 / (rank ** ZIPF_S) for rank in range(1, n + 1)]
+
+
+def _value(scope_id: int, version: int):
+    # One in four scopes holds a serialized chart, as the chart cache stores them
+    if scope_id % 4 == 0:
+        points = ",".join(
+            f'{{"name":"{d % 28 + 1:02d}/01","value":{70 + d % 30}}}' for d in range(300)
+        )
+        return (version, f'{{"heart_rate":[{points}]}}')
+    return (version, frozenset(range(scope_id, scope_id + 40)))
+
+
+def _worker(backend: str, path: str, operations: int, versions, results, seed: int) -> None:
+    random.seed(seed)
+    if backend == "shared":
+        cache = SharedMemoryCache(path, small_slots=16384, large_slots=512)
+    else:
+        cache = LocalCache(max_entries=16384 + 512)
+
+    scope_ids = random.choices(range(SCOPES), weights=_zipf_weights(SCOPES), k=operations)
+    writes = [random.random() < WRITE_RATIO for _ in range(operations)]
+
+    loads = stale = 0
+    started = time.perf_counter()
+    for scope_id, write in zip(scope_ids, writes):
+        scope = ("bench", scope_id)
+
+        if write:
+            with versions.get_lock():
+                versions[scope_id] += 1
+            cache.invalidate(scope)
+            continue
+
+        cached = cache.get(scope, scope)
+        if cached is not None:
+            if cached[0] < versions[scope_id]:
+                stale += 1
+            continue
+
+        generation = cache.generation(scope)
+        version = versions[scope_id]
+        time.sleep(LOAD_COST_SECONDS)
+        loads += 1
+        cache.put(scope, scope, _value(scope_id, version), TTL_SECONDS, generation)
+
+    elapsed = time.perf_counter() - started
+    results.put((operations - sum(writes), elapsed, loads, stale))
+
+
+def run(backend: str, workers: int, operations: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    versions = context.Array("q", SCOPES)
+    results = context.Queue()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "shared-cache.bin")
+        processes = [
+            context.Process(
+                target=_worker, args=(backend, path, operations, versions, results, seed)
+            )
+            for seed in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = sum(r[0] for r in collected)
+    wall = max(r[1] for r in collected)
+    return {
+        "ops": reads / wall,
+        "loads": sum(r[2] for r in collected),
+        "stale": sum(r[3] for r in collected),
+        "reads": reads,
+    }
+
+
+def main() -> None:
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    print(f"{operations} operações por worker, {SCOPES} escopos, {WRITE_RATIO:.0%} escritas, "
+          f"custo de carga {LOAD_COST_SECONDS * 1000:.1f} ms\n")
+    print(f"{'workers':>7}  {'backend':<7}  {'ops/s':>10}  {'cargas':>8}  {'obsoletas':>10}")
+
+    for workers in (1, 4, 8):
+        for backend in ("local", "shared"):
+            result = run(backend, workers, operations)
+            print(
+                f"{workers:>7}  {backend:<7}  {result['ops']:>10,.0f}  {result['loads']:>8}  "
+                f"{result['stale']:>6} ({result['stale'] / result['reads']:.2%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
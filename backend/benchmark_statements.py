@@ -0,0 +1,117 @@
+"""
+Vita - Statement Cache Benchmark
+Mede o tempo de CPU por requisição das consultas quentes (dashboard,
+alertas críticos, consultas do dia e próximas consultas) com o cache de SQL
+compilado ativo (`DB_STATEMENT_CACHE_SIZE`) e desativado.
+
+O banco temporário é populado uma vez com `seed_data.py`. Cada configuração
+roda em um processo próprio, chamando os handlers diretamente (sem os
+caches de resultado), com uma sessão por requisição; o tempo medido é o de
+CPU do processo inteiro, incluindo a thread do driver.
+
+Uso:
+    python benchmark_statements.py [requisições por rota]
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WARMUP_REQUESTS = 20
+
+
+def _environment(workdir: str, cache_size: int) -> dict:
+    return {
+        **os.environ,
+        "VITA_DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "VITA_DATA_DIR": workdir,
+        "VITA_DEBUG": "false",
+        "VITA_DB_STATEMENT_CACHE_SIZE": str(cache_size),
+    }
+
+
+async def _measure(requests: int) -> dict:
+    from sqlalchemy import select
+
+    from app.api.routes import appointments, dashboard, vitals
+    from app.db.database import async_session_maker
+    from app.db.statement_cache import statement_cache_stats
+    from app.models import User
+
+    async with async_session_maker() as db:
+        doctor = (await db.execute(select(User).where(User.email == "dr.silva@vita.med.br"))).scalar_one()
+        db.expunge(doctor)
+
+    routes = {
+        "dashboard": lambda db: dashboard._compute_dashboard_stats(db, doctor.id),
+        "alertas críticos": lambda db: vitals.get_critical_vitals(current_user=doctor, db=db, hours=168),
+        "consultas do dia": lambda db: appointments.list_today_appointments(current_user=doctor, db=db),
+        "próximas consultas": lambda db: appointments.list_upcoming_appointments(
+            current_user=doctor, db=db, limit=10
+        ),
+    }
+
+    results = {}
+    for name, handler in routes.items():
+        for _ in range(WARMUP_REQUESTS):
+            async with async_session_maker() as db:
+                await handler(db)
+
+        started = time.process_time()
+        for _ in range(requests):
+            async with async_session_maker() as db:
+                await handler(db)
+        results[name] = (time.process_time() - started) / requests * 1_000_000
+
+    return {"cpu_us": results, "cache": statement_cache_stats.snapshot()}
+
+
+def _child(requests: int) -> None:
+    print(json.dumps(asyncio.run(_measure(requests))))
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    with tempfile.TemporaryDirectory(prefix="vita-bench-") as workdir:
+        subprocess.run(
+            [sys.executable, "seed_data.py"],
+            cwd=BACKEND_DIR,
+            env=_environment(workdir, 0),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+        runs = {}
+        for cache_size in (0, 1200):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(requests)],
+                cwd=BACKEND_DIR,
+                env=_environment(workdir, cache_size),
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            runs[cache_size] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{requests} requisições por rota; CPU por requisição (µs)\n")
+    print(f"{'rota':<20}  {'sem cache':>10}  {'com cache':>10}  {'economia':>9}")
+    for name, uncached in runs[0]["cpu_us"].items():
+        cached = runs[1200]["cpu_us"][name]
+        print(f"{name:<20}  {uncached:>10,.0f}  {cached:>10,.0f}  {1 - cached / uncached:>9.0%}")
+
+    cache = runs[1200]["cache"]
+    print(f"\ncache de SQL compilado: {cache['hits']} acertos, {cache['misses']} faltas "
+          f"(taxa {cache['hit_rate']:.2%}), {cache['entries']}/{cache['capacity']} entradas")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        _child(int(sys.argv[2]))
+    else:
+        main()
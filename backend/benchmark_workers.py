@@ -0,0 +1,180 @@
+"""
+Vita - Workers Benchmark
+Compara a vazão do servidor de produção (`serve.py`) com 1 worker e com N
+workers, sobre o mesmo banco.
+
+O banco temporário é populado uma vez com `seed_data.py`; para cada
+configuração o servidor é iniciado em uma porta livre e recebe, durante
+alguns segundos, requisições concorrentes de vários processos cliente
+(listagens, dashboard, estatísticas e gráficos de sinais vitais). Os
+limites de admissão são desativados para medir só a capacidade do
+servidor.
+
+Uso:
+    python benchmark_workers.py [workers] [segundos] [conexões por cliente]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from serve import available_cpus
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENT_PROCESSES = 4
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _environment(workdir: str, workers: int, port: int) -> dict:
+    return {
+        **os.environ,
+        "VITA_DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "VITA_DATA_DIR": workdir,
+        "VITA_DEBUG": "false",
+        "VITA_ADMISSION_ENABLED": "false",
+        "VITA_HOST": "127.0.0.1",
+        "VITA_PORT": str(port),
+        "VITA_WORKERS": str(workers),
+    }
+
+
+def _wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Servidor não respondeu a tempo")
+
+
+def _targets(base_url: str) -> tuple[dict, list[str]]:
+    response = httpx.post(
+        f"{base_url}/api/auth/login",
+        json={"email": "dr.silva@vita.med.br", "password": "123456"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    patients = httpx.get(f"{base_url}/api/patients", headers=headers).json()["items"]
+    paths = ["/api/patients", "/api/dashboard/stats", "/api/appointments"]
+    for patient in patients:
+        paths += [
+            f"/api/vitals/{patient['id']}?limit=50",
+            f"/api/vitals/{patient['id']}/stats?days=90",
+            f"/api/vitals/{patient['id']}/chart?days=90",
+        ]
+    return headers, paths
+
+
+async def _drive(base_url: str, headers: dict, paths: list[str], seconds: float, connections: int):
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        limits=httpx.Limits(max_connections=connections),
+        timeout=30,
+    ) as client:
+
+        async def loop():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(random.choice(paths))
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(loop() for _ in range(connections)))
+
+    return latencies, errors
+
+
+def _client(args) -> tuple[list[float], int]:
+    return asyncio.run(_drive(*args))
+
+
+def run(workdir: str, workers: int, seconds: float, connections: int) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py"],
+        cwd=BACKEND_DIR,
+        env=_environment(workdir, workers, port),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(base_url)
+        headers, paths = _targets(base_url)
+
+        # Warm the caches and connections before measuring
+        _client((base_url, headers, paths, 1, connections))
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(CLIENT_PROCESSES) as pool:
+            started = time.perf_counter()
+            results = pool.map(
+                _client, [(base_url, headers, paths, seconds, connections)] * CLIENT_PROCESSES
+            )
+            elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": quantiles[49] * 1000,
+        "p99": quantiles[98] * 1000,
+        "errors": sum(result[1] for result in results),
+    }
+
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else available_cpus()
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    connections = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    with tempfile.TemporaryDirectory(prefix="vita-bench-") as workdir:
+        subprocess.run(
+            [sys.executable, "seed_data.py"],
+            cwd=BACKEND_DIR,
+            env=_environment(workdir, 1, 0),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+        print(f"{available_cpus()} núcleos disponíveis, {CLIENT_PROCESSES} processos cliente × "
+              f"{connections} conexões, {seconds:.0f} s por configuração\n")
+        print(f"{'workers':>7}  {'req/s':>8}  {'p50 ms':>7}  {'p99 ms':>7}  {'erros':>5}")
+
+        for count in sorted({1, workers}):
+            result = run(workdir, count, seconds, connections)
+            print(f"{count:>7}  {result['rps']:>8,.0f}  {result['p50']:>7.1f}  "
+                  f"{result['p99']:>7.1f}  {result['errors']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,56 @@ Vita - Main Application Entry Point
 Ponto de entrada principal da API FastAPI.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.db.database import init_db
-from app.api.routes import auth, patients, appointments, vitals, dashboard
+from app.core.admission import AdmissionMiddleware, admission
+from app.core.compression import CompressionMiddleware
+from app.core.idempotency import IdempotencyMiddleware, expiry_loop, idempotency_store
+from app.core.shared_cache import shared_cache
+from app.db.database import init_db, shard_router
+from app.db.statement_cache import statement_cache_stats
+from app.api.warmup import StartupTimings, warm_up
+from app.api.routes import auth, patients, appointments, vitals, dashboard, analytics, batch, changes, reports, admin
+from app.services import change_feed, db_maintenance, quantile_sketches, vital_compaction, vital_counters, vital_partitions
+from app.services.reports import shutdown_renderer
+from app.services import post_write
+from app.services.job_queue import job_queue
+
+
+async def prepare_database(timings: StartupTimings) -> None:
+    """
+    Confere a versão do esquema (criando as tabelas só quando ela muda) e
+    executa os preenchimentos de inicialização (sketches, contadores e log
+    de alterações) em todos os shards. Com `serve.py`, roda uma única vez
+    no processo principal, antes de criar os workers.
+
+    Args:
+        timings: Medidor das fases da inicialização
+    """
+    with timings.phase("esquema"):
+        applied = await init_db()
+    if applied:
+        print("✅ Banco de dados inicializado (nova versão do esquema aplicada)")
+    else:
+        print("✅ Banco de dados inicializado (esquema já atualizado)")
+
+    with timings.phase("preenchimentos"):
+        rebuilt = sum(await shard_router.fan_out(quantile_sketches.ensure_sketches))
+        if rebuilt:
+            print(f"📊 Sketches de quantis construídos para {rebuilt} pacientes")
+
+        counted = sum(await shard_router.fan_out(vital_counters.ensure_counts))
+        if counted:
+            print(f"🔢 Contadores diários de sinais vitais construídos para {counted} pacientes")
+
+        logged = sum(await shard_router.fan_out(change_feed.ensure_change_log))
+        if logged:
+            print(f"🔁 Log de alterações preenchido com {logged} registros")
 
 
 @asynccontextmanager
@@ -20,12 +62,42 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     print(f"🚀 Iniciando {settings.APP_NAME} v{settings.APP_VERSION}")
-    await init_db()
-    print("✅ Banco de dados inicializado")
+    timings = StartupTimings()
+    if not app.state.database_prepared:
+        await prepare_database(timings)
+
+    post_write.register(job_queue)
+    restored_jobs = await job_queue.start()
+    if restored_jobs:
+        print(f"📬 {restored_jobs} jobs pendentes recarregados")
+
+    # Each process has its own pool and compiled statement cache
+    if settings.STARTUP_WARMUP_ENABLED:
+        await warm_up(app, timings)
+    app.state.startup_timings = timings.snapshot()
+    print(f"⏱️  Inicialização: {timings.report()}")
+
+    # Process-wide maintenance runs in a single worker
+    maintenance_tasks = []
+    if app.state.primary_worker:
+        maintenance_tasks = [
+            asyncio.create_task(vital_partitions.retention_loop()),
+            asyncio.create_task(vital_compaction.compaction_loop()),
+            asyncio.create_task(db_maintenance.maintenance_loop()),
+        ]
+    idempotency_task = asyncio.create_task(expiry_loop())
 
     yield
 
     # Shutdown
+    for task in maintenance_tasks:
+        task.cancel()
+    idempotency_task.cancel()
+
+    persisted_jobs = await job_queue.stop()
+    if persisted_jobs:
+        print(f"📬 {persisted_jobs} jobs pendentes salvos para a próxima inicialização")
+    shutdown_renderer()
     print("👋 Encerrando aplicação")
 
 
@@ -40,6 +112,17 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# serve.py sets these before forking the workers
+app.state.database_prepared = False
+app.state.primary_worker = True
+app.state.startup_timings = {}
+
+# Admission control runs inside CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+# Replayed creates skip admission; stored bodies are kept uncompressed
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -55,6 +138,11 @@ app.include_router(dashboard.router, prefix="/api")
 app.include_router(patients.router, prefix="/api")
 app.include_router(appointments.router, prefix="/api")
 app.include_router(vitals.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
+app.include_router(changes.router, prefix="/api")
+app.include_router(reports.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/", tags=["Health"])
@@ -82,6 +170,46 @@ async def health_check():
     }
 
 
+@app.get("/health/admission", tags=["Health"])
+async def admission_metrics():
+    """
+    Métricas do controle de admissão (requisições rejeitadas e enfileiradas).
+    """
+    return admission.snapshot()
+
+
+@app.get("/health/idempotency", tags=["Health"])
+async def idempotency_metrics():
+    """
+    Métricas do armazenamento de Idempotency-Key (entradas, bytes e repetições).
+    """
+    return idempotency_store.snapshot()
+
+
+@app.get("/health/startup", tags=["Health"])
+async def startup_metrics():
+    """
+    Duração das fases da inicialização deste processo.
+    """
+    return app.state.startup_timings
+
+
+@app.get("/health/statements", tags=["Health"])
+async def statement_cache_metrics():
+    """
+    Acertos e faltas do cache de SQL compilado (neste worker).
+    """
+    return statement_cache_stats.snapshot()
+
+
+@app.get("/health/cache", tags=["Health"])
+async def cache_metrics():
+    """
+    Métricas do cache compartilhado entre workers (neste worker).
+    """
+    return shared_cache.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
 
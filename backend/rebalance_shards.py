@@ -0,0 +1,270 @@
+"""
+Vita - Shard Rebalancing
+Move médicos, com todos os seus dados, entre shards.
+
+Sem argumentos, mostra o volume de cada shard (linhas de pacientes,
+sinais vitais e consultas) e um plano guloso: enquanto for possível
+diminuir a diferença entre o shard mais cheio e o mais vazio, move do mais
+cheio o médico que deixa os dois mais próximos. `--apply` executa o plano;
+`--doctor ID --to SHARD` move um médico específico.
+
+Cada movimentação:
+1. marca o médico como `moving` (as rotas dele respondem 503 com
+   Retry-After) e espera `--grace` segundos pelas requisições em andamento;
+2. copia, em uma única transação no destino, pacientes, sinais vitais,
+   consultas, relatórios e os dados derivados, mantendo os IDs (que são
+   globais). Contadores, sketches e o log de alterações recebem chaves
+   novas no destino; a sequência do log é avançada além da origem, para
+   que os cursores de sincronização dos clientes continuem válidos;
+3. apaga os dados da origem e grava o novo shard, liberando o médico.
+
+Uma movimentação interrompida pode ser repetida: a cópia descarta antes o
+que já estiver no destino. Com o cache compartilhado desativado, os
+workers só percebem a marcação após `SHARD_MAP_CACHE_TTL_SECONDS`, e
+`--grace` deve ser maior que esse valor.
+
+Uso:
+    python rebalance_shards.py [--apply] [--grace segundos]
+    python rebalance_shards.py --doctor ID --to SHARD [--grace segundos]
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.database import Base, async_session_maker, init_db, shard_router
+from app.models import DoctorShard
+
+COPY_CHUNK_SIZE = 5000
+
+# Copied in this order and deleted in reverse
+DOCTOR_TABLES = ("patients", "appointments", "report_jobs", "change_log")
+PATIENT_TABLES = (
+    "vital_signs",
+    "vital_archive_segments",
+    "vital_baselines",
+    "vital_anomalies",
+    "vital_daily_sketches",
+    "vital_daily_counts",
+    "vital_rollups",
+    "vital_compaction_marks",
+)
+
+# Shard-local keys, never exposed: the target assigns new ones
+REKEYED_COLUMNS = {
+    "vital_daily_sketches": "id",
+    "vital_daily_counts": "id",
+    "change_log": "seq",
+}
+
+
+def _doctor_filter(name: str, doctor_id: int):
+    table = Base.metadata.tables[name]
+    if name in DOCTOR_TABLES:
+        return table.c.doctor_id == doctor_id
+    patients = Base.metadata.tables["patients"]
+    return table.c.patient_id.in_(select(patients.c.id).where(patients.c.doctor_id == doctor_id))
+
+
+async def _delete_doctor(conn: AsyncConnection, doctor_id: int) -> None:
+    # Patient-scoped rows first: their filter goes through the patients table
+    for name in reversed(DOCTOR_TABLES + PATIENT_TABLES):
+        table = Base.metadata.tables[name]
+        await conn.execute(delete(table).where(_doctor_filter(name, doctor_id)))
+
+
+async def _advance_change_log(conn: AsyncConnection, floor: int) -> None:
+    """Faz a próxima `seq` do log no destino ficar acima de `floor`."""
+    result = await conn.execute(
+        text("UPDATE sqlite_sequence SET seq = max(seq, :floor) WHERE name = 'change_log'"),
+        {"floor": floor},
+    )
+    if result.rowcount == 0:
+        await conn.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', :floor)"),
+            {"floor": floor},
+        )
+
+
+async def _copy_doctor(source: AsyncConnection, target: AsyncConnection, doctor_id: int) -> int:
+    change_log = Base.metadata.tables["change_log"]
+    floor = await source.scalar(
+        select(func.coalesce(func.max(change_log.c.seq), 0)).where(change_log.c.doctor_id == doctor_id)
+    )
+    await _advance_change_log(target, floor)
+
+    copied = 0
+    for name in DOCTOR_TABLES + PATIENT_TABLES:
+        table = Base.metadata.tables[name]
+        rekeyed = REKEYED_COLUMNS.get(name)
+        columns = [column for column in table.c if column.name != rekeyed]
+
+        # change_log rows keep their order, so the new seqs do too
+        query = select(*columns).where(_doctor_filter(name, doctor_id))
+        if rekeyed:
+            query = query.order_by(table.c[rekeyed])
+
+        result = await source.stream(query)
+        async for partition in result.partitions(COPY_CHUNK_SIZE):
+            await target.execute(insert(table), [dict(row._mapping) for row in partition])
+            copied += len(partition)
+    return copied
+
+
+async def _set_assignment(doctor_id: int, shard: int, moving: bool) -> None:
+    async with async_session_maker() as db:
+        statement = sqlite_insert(DoctorShard).values(doctor_id=doctor_id, shard=shard, moving=moving)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=["doctor_id"], set_={"shard": shard, "moving": moving}
+        ))
+        await db.commit()
+    shard_router.invalidate(doctor_id)
+
+
+async def current_shard(doctor_id: int) -> int:
+    async with async_session_maker() as db:
+        shard = await db.scalar(
+            select(DoctorShard.shard).where(DoctorShard.doctor_id == doctor_id)
+        )
+    return shard or 0
+
+
+async def move_doctor(doctor_id: int, target_shard: int, grace: float) -> int:
+    """
+    Move os dados do médico para `target_shard`.
+
+    Returns:
+        int: Número de linhas copiadas
+    """
+    source_shard = await current_shard(doctor_id)
+    if source_shard == target_shard:
+        raise SystemExit(f"Médico {doctor_id} já está no shard {target_shard}")
+
+    await _set_assignment(doctor_id, source_shard, moving=True)
+    await asyncio.sleep(grace)
+
+    source_engine = shard_router.engines[source_shard]
+    target_engine = shard_router.engines[target_shard]
+
+    async with source_engine.connect() as source, target_engine.begin() as target:
+        await _delete_doctor(target, doctor_id)
+        copied = await _copy_doctor(source, target, doctor_id)
+
+    async with source_engine.begin() as source:
+        await _delete_doctor(source, doctor_id)
+
+    await _set_assignment(doctor_id, target_shard, moving=False)
+    return copied
+
+
+async def doctor_loads() -> dict[int, dict[int, int]]:
+    """Linhas (pacientes, sinais vitais e consultas) de cada médico, por shard."""
+    patients = Base.metadata.tables["patients"]
+    vital_signs = Base.metadata.tables["vital_signs"]
+    appointments = Base.metadata.tables["appointments"]
+
+    async def loads(db) -> dict[int, int]:
+        rows: dict[int, int] = defaultdict(int)
+        for query in (
+            select(patients.c.doctor_id, func.count()).group_by(patients.c.doctor_id),
+            select(patients.c.doctor_id, func.count())
+            .select_from(vital_signs.join(patients, patients.c.id == vital_signs.c.patient_id))
+            .group_by(patients.c.doctor_id),
+            select(appointments.c.doctor_id, func.count()).group_by(appointments.c.doctor_id),
+        ):
+            for doctor_id, count in (await db.execute(query)).all():
+                rows[doctor_id] += count
+        return dict(rows)
+
+    return dict(enumerate(await shard_router.fan_out(loads)))
+
+
+def plan_moves(loads: dict[int, dict[int, int]]) -> list[tuple[int, int, int]]:
+    """
+    Plano guloso de movimentações.
+
+    Returns:
+        list: [(médico, shard de origem, shard de destino), ...]
+    """
+    loads = {shard: dict(doctors) for shard, doctors in loads.items()}
+    moves = []
+    while True:
+        totals = {shard: sum(doctors.values()) for shard, doctors in loads.items()}
+        fullest = max(totals, key=totals.get)
+        emptiest = min(totals, key=totals.get)
+        gap = totals[fullest] - totals[emptiest]
+
+        # Moving w rows turns the gap into |gap - 2w|: only 0 < w < gap helps
+        candidates = [
+            (abs(gap - 2 * rows), doctor_id)
+            for doctor_id, rows in loads[fullest].items()
+            if 0 < rows < gap
+        ]
+        if not candidates:
+            return moves
+
+        _, doctor_id = min(candidates)
+        loads[emptiest][doctor_id] = loads[fullest].pop(doctor_id)
+        moves.append((doctor_id, fullest, emptiest))
+
+
+def _print_loads(loads: dict[int, dict[int, int]]) -> None:
+    print(f"{'shard':>5}  {'médicos':>7}  {'linhas':>10}")
+    for shard, doctors in loads.items():
+        print(f"{shard:>5}  {len(doctors):>7}  {sum(doctors.values()):>10,}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Move médicos entre shards")
+    parser.add_argument("--apply", action="store_true", help="executa o plano de rebalanceamento")
+    parser.add_argument("--doctor", type=int, help="médico a mover")
+    parser.add_argument("--to", type=int, dest="target", help="shard de destino")
+    parser.add_argument("--grace", type=float, default=5.0, help="espera após bloquear o médico (s)")
+    args = parser.parse_args()
+
+    if not shard_router.enabled:
+        raise SystemExit("Sharding desativado (SHARD_COUNT=1)")
+    if not settings.SHARED_CACHE_ENABLED and args.grace <= settings.SHARD_MAP_CACHE_TTL_SECONDS:
+        print(f"⚠️  Cache compartilhado desativado: use --grace maior que "
+              f"{settings.SHARD_MAP_CACHE_TTL_SECONDS} s")
+
+    await init_db()
+
+    if args.doctor is not None:
+        if args.target is None or not 0 <= args.target < shard_router.count:
+            raise SystemExit(f"Informe --to entre 0 e {shard_router.count - 1}")
+        copied = await move_doctor(args.doctor, args.target, args.grace)
+        print(f"✅ Médico {args.doctor} movido para o shard {args.target} ({copied:,} linhas)")
+        return
+
+    loads = await doctor_loads()
+    _print_loads(loads)
+
+    moves = plan_moves(loads)
+    if not moves:
+        print("\n✅ Shards já equilibrados")
+        return
+
+    print("\nPlano:")
+    for doctor_id, source, target in moves:
+        print(f"  médico {doctor_id}: shard {source} → {target} ({loads[source][doctor_id]:,} linhas)")
+
+    if not args.apply:
+        print("\nUse --apply para executar")
+        return
+
+    for doctor_id, source, target in moves:
+        copied = await move_doctor(doctor_id, target, args.grace)
+        print(f"✅ Médico {doctor_id} movido para o shard {target} ({copied:,} linhas)")
+
+    print()
+    _print_loads(await doctor_loads())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
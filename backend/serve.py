@@ -0,0 +1,288 @@
+"""
+Vita - Production Server
+Ponto de entrada de produção: vários workers uvicorn atrás do mesmo socket.
+
+- O número de workers segue os núcleos disponíveis para o processo
+  (afinidade de CPU e cota do cgroup), ou `WORKERS`.
+- A aplicação é importada e o banco é preparado (tabelas, preenchimentos
+  de inicialização, mapeamentos do ORM) uma única vez no processo
+  principal; as conexões são fechadas e só então os workers são criados
+  com `fork`, compartilhando (copy-on-write) tudo já carregado.
+- O aquecimento (`app/api/warmup.py`) roda no processo principal, que
+  deixa o SQL compilado e o esquema OpenAPI para os workers, e de novo em
+  cada worker, que abre o seu próprio pool antes de aceitar conexões.
+- O echo de SQL dos engines é desligado, independente de `DEBUG`.
+- uvloop e httptools são usados quando instalados.
+- O processo principal supervisiona os workers: reinicia os que caírem e
+  recicla os que passarem de `WORKER_MAX_MEMORY_MB` de memória privada
+  ou de `WORKER_MAX_LIFETIME_SECONDS` de vida (com variação aleatória,
+  para não reciclar todos juntos). O substituto sobe antes de o antigo
+  ser encerrado, e o antigo termina as requisições em andamento.
+- Tarefas de manutenção do processo (retenção de sinais vitais) rodam só
+  no worker 0.
+
+Sinais: SIGTERM/SIGINT encerram; SIGHUP recicla todos os workers.
+
+Uso:
+    python serve.py
+"""
+
+import asyncio
+import importlib.util
+import math
+import os
+import random
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+CHECK_INTERVAL_SECONDS = 1.0
+LIFETIME_JITTER = 0.1
+
+
+def available_cpus() -> int:
+    """Núcleos que o processo pode usar (afinidade e cota do cgroup v2)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        cpus = os.cpu_count() or 1
+
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cpus)
+
+
+def worker_memory_mb(pid: int) -> Optional[float]:
+    """
+    Memória privada do worker (Linux), sem as páginas ainda compartilhadas
+    com o processo principal; sem `smaps_rollup`, a memória residente.
+
+    Returns:
+        Optional[float]: Memória em MB, ou None se indisponível
+    """
+    try:
+        private_kb = sum(
+            int(line.split()[1])
+            for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()
+            if line.startswith(("Private_Clean:", "Private_Dirty:"))
+        )
+        return private_kb / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+
+    try:
+        resident_pages = int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+async def _warm_up(main) -> None:
+    from sqlalchemy.orm import configure_mappers
+
+    from app.api.warmup import StartupTimings, warm_up
+    from app.db.database import shard_router
+
+    timings = StartupTimings()
+    with timings.phase("mapeamentos"):
+        configure_mappers()
+    await main.prepare_database(timings)
+    # Compiled statements and the OpenAPI schema are inherited by the workers
+    if settings.STARTUP_WARMUP_ENABLED:
+        await warm_up(main.app, timings)
+    print(f"⏱️  Preparação no processo principal: {timings.report()}")
+
+    # Connections must not be shared with the forked workers
+    await shard_router.dispose()
+
+
+def preload():
+    """Importa a aplicação e prepara o banco no processo principal."""
+    import main
+    from app.db.database import id_allocator, shard_router
+
+    for shard_engine in shard_router.engines:
+        shard_engine.sync_engine.echo = False
+    if id_allocator is not None:
+        id_allocator.engine.sync_engine.echo = False
+    asyncio.run(_warm_up(main))
+    main.app.state.database_prepared = True
+    return main.app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+@dataclass
+class Worker:
+    slot: int
+    pid: int
+    started: float
+    lifetime: float
+    retire_deadline: Optional[float] = None
+
+
+class Supervisor:
+    """Cria, monitora e recicla os workers."""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.size = workers
+        self.workers: dict[int, Worker] = {}
+        self.stopping = False
+        self.reload_requested = False
+
+    def _lifetime(self) -> float:
+        base = settings.WORKER_MAX_LIFETIME_SECONDS
+        if base <= 0:
+            return math.inf
+        return base * random.uniform(1 - LIFETIME_JITTER, 1 + LIFETIME_JITTER)
+
+    def spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+            os._exit(0)
+
+        self.workers[pid] = Worker(slot, pid, time.monotonic(), self._lifetime())
+        print(f"👷 Worker {slot} iniciado (pid {pid})")
+
+    def _run_worker(self, slot: int) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed()
+
+        self.app.state.primary_worker = slot == 0
+        config = uvicorn.Config(
+            self.app,
+            loop=LOOP,
+            http=HTTP,
+            lifespan="on",
+            access_log=False,
+            timeout_graceful_shutdown=settings.WORKER_SHUTDOWN_TIMEOUT_SECONDS,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def retire(self, worker: Worker, reason: str) -> None:
+        """Sobe o substituto e pede ao worker que termine o que está fazendo."""
+        print(f"♻️  Reciclando worker {worker.slot} (pid {worker.pid}): {reason}")
+        worker.retire_deadline = time.monotonic() + settings.WORKER_SHUTDOWN_TIMEOUT_SECONDS
+        self.spawn(worker.slot)
+        os.kill(worker.pid, signal.SIGTERM)
+
+    def _check(self, worker: Worker) -> None:
+        now = time.monotonic()
+        if worker.retire_deadline is not None:
+            if now > worker.retire_deadline:
+                os.kill(worker.pid, signal.SIGKILL)
+            return
+
+        if self.reload_requested:
+            self.retire(worker, "SIGHUP")
+            return
+
+        if now - worker.started > worker.lifetime:
+            self.retire(worker, "tempo de vida atingido")
+            return
+
+        limit = settings.WORKER_MAX_MEMORY_MB
+        memory = worker_memory_mb(worker.pid) if limit > 0 else None
+        if memory is not None and memory > limit:
+            self.retire(worker, f"{memory:.0f} MB de memória")
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            worker = self.workers.pop(pid, None)
+            if worker is None or worker.retire_deadline is not None or self.stopping:
+                continue
+            print(f"⚠️  Worker {worker.slot} (pid {pid}) terminou inesperadamente "
+                  f"(status {status}); reiniciando")
+            self.spawn(worker.slot)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for slot in range(self.size):
+            self.spawn(slot)
+
+        while not self.stopping:
+            time.sleep(CHECK_INTERVAL_SECONDS)
+            self._reap()
+            for worker in list(self.workers.values()):
+                if not self.stopping:
+                    self._check(worker)
+            self.reload_requested = False
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        for worker in self.workers.values():
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + settings.WORKER_SHUTDOWN_TIMEOUT_SECONDS + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+
+        for worker in self.workers.values():
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _handle_reload(self, signum, frame) -> None:
+        self.reload_requested = True
+
+
+def main() -> None:
+    workers = settings.WORKERS or available_cpus()
+    print(f"🚀 Servidor de produção: {workers} workers em {settings.HOST}:{settings.PORT} "
+          f"(loop {LOOP}, http {HTTP})")
+
+    app = preload()
+    sock = bind_socket(settings.HOST, settings.PORT)
+    Supervisor(app, sock, workers).run()
+    print("👋 Servidor encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Vita - Quantile Sketches Tests
+Garantias de erro documentadas em `app.services.quantile_sketches`.
+
+Execute a partir de `backend/`:
+
+    python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from app.services import quantile_sketches as qs
+
+DAYS = 7
+READINGS_PER_DAY = 97
+
+INTEGER_METRICS = [m for m, (_, resolution, _) in qs.SKETCH_SPECS.items() if resolution == 1.0]
+FLOAT_METRICS = [m for m, (_, resolution, _) in qs.SKETCH_SPECS.items() if resolution != 1.0]
+
+
+def _bounds(metric: str) -> tuple[float, float]:
+    low, resolution, size = qs.SKETCH_SPECS[metric]
+    return low, low + (size - 1) * resolution
+
+
+def _daily_readings(metric: str, seed: int) -> list[np.ndarray]:
+    """Leituras de `DAYS` dias, com tamanhos diferentes por dia."""
+    rng = np.random.default_rng(seed)
+    low, high = _bounds(metric)
+    days = []
+    for day in range(DAYS):
+        size = READINGS_PER_DAY + day * 13
+        if metric in INTEGER_METRICS:
+            days.append(rng.integers(int(low), int(high), size, endpoint=True).astype(np.float64))
+        else:
+            # Continuous values: most fall between two bins
+            days.append(rng.uniform(low, high, size))
+    return days
+
+
+def _daily_sketch(metric: str, values: np.ndarray) -> bytes:
+    return qs.encode(*qs._merge([], qs.to_bins(metric, values)))
+
+
+def _nearest_rank(values: np.ndarray) -> dict[str, float]:
+    return {
+        f"p{p}": float(np.percentile(values, p, method="inverted_cdf"))
+        for p in qs.PERCENTILES
+    }
+
+
+def test_integer_metrics_are_covered():
+    assert {"heart_rate", "systolic_pressure", "oxygen_saturation"} <= set(INTEGER_METRICS)
+    assert set(FLOAT_METRICS) == set(qs.FLOAT_RESOLUTION)
+
+
+@pytest.mark.parametrize("metric", INTEGER_METRICS)
+def test_integer_metrics_are_exact(metric):
+    days = _daily_readings(metric, seed=len(metric))
+    merged = qs._merge([_daily_sketch(metric, values) for values in days])
+
+    result = qs.quantiles(metric, *merged)
+    readings = np.concatenate(days)
+
+    assert result["count"] == readings.size
+    for name, expected in _nearest_rank(readings).items():
+        assert result[name] == expected
+
+
+@pytest.mark.parametrize("metric", FLOAT_METRICS)
+def test_float_metrics_within_half_resolution(metric):
+    _, resolution, _ = qs.SKETCH_SPECS[metric]
+    days = _daily_readings(metric, seed=len(metric))
+    merged = qs._merge([_daily_sketch(metric, values) for values in days])
+
+    result = qs.quantiles(metric, *merged)
+    readings = np.concatenate(days)
+
+    assert result["count"] == readings.size
+    for name, expected in _nearest_rank(readings).items():
+        assert abs(result[name] - expected) <= resolution / 2 + 1e-9
+
+
+@pytest.mark.parametrize("metric", qs.METRICS)
+def test_merged_daily_sketches_match_single_sketch(metric):
+    days = _daily_readings(metric, seed=len(metric) + 1)
+
+    merged_bins, merged_counts = qs._merge([_daily_sketch(metric, values) for values in days])
+    single_bins, single_counts = qs._merge([], qs.to_bins(metric, np.concatenate(days)))
+
+    np.testing.assert_array_equal(merged_bins, single_bins)
+    np.testing.assert_array_equal(merged_counts, single_counts)
+    assert qs.quantiles(metric, merged_bins, merged_counts) == qs.quantiles(
+        metric, single_bins, single_counts
+    )
+
+
+@pytest.mark.parametrize("metric", ["heart_rate", "temperature"])
+def test_incremental_ingest_matches_single_sketch(metric):
+    """Leituras incorporadas aos poucos (como em `add_vitals`) dão o mesmo sketch."""
+    readings = np.concatenate(_daily_readings(metric, seed=3))
+
+    sketch = b""
+    for chunk in np.array_split(readings, 11):
+        sketch = qs.encode(*qs._merge([sketch] if sketch else [], qs.to_bins(metric, chunk)))
+
+    single = qs._merge([], qs.to_bins(metric, readings))
+    for incremental, expected in zip(qs.decode(sketch), single):
+        np.testing.assert_array_equal(incremental, expected)
+
+
+def test_out_of_range_values_are_clamped():
+    low, high = _bounds("heart_rate")
+    bins, counts = qs._merge([], qs.to_bins("heart_rate", np.array([low - 10, high + 10])))
+
+    result = qs.quantiles("heart_rate", bins, counts)
+
+    assert result == {"count": 2, "p5": low, "p50": low, "p95": high}
+
+
+def test_empty_sketch_has_no_percentiles():
+    assert qs.quantiles("heart_rate", *qs._merge([])) == {"count": 0}
@@ -245,7 +245,10 @@ export interface PaginatedResponse<T> {
 
 export interface ListResponse<T> {
   items: T[];
-  total: number;
+  total: number | null;
+  has_more: boolean;
+  next_before: string | null;
+  next_before_id: number | null;
 }
 
 // ============================================